@@ -2,6 +2,7 @@
 Interface to Pillow Image facilitating map annotation 
 """
 import os
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 from math import cos, sin, sqrt, asin, atan2, pi, ceil, radians, degrees
 from geographiclib.geodesic import Geodesic
@@ -11,11 +12,18 @@ from builtins import staticmethod
 ###from openpyxl.drawing.effect import Color
 ###from idlelib.colorizer import color_config
 ###from pandas._libs.tslibs.offsets import get_firstbday
-from GeoDrawMapState import GeoDrawMapState
+from GeoDrawMapState import GeoDrawMapState, apply_map_step
+from map_state_history import MapStateHistory
 
 from select_trace import SlTrace
 from survey_trail import SurveyTrail
+from trail_clean import clean_trail, TrailCleanRules, geo_distances
+from survey_trail_stats import spacing_buckets, SPACING_COLORS
 from compass_rose import CompassRose
+from density_overlay import DensityOverlay
+from plot_geometry import octagon_pixels, SAMPLE_DRAW_RADIUS
+from map_layers import MapLayers
+from rotation_cache import rotate_image, rotation_cache
 
 def get_bearing(p1, p2):
     """ Get bearing p1 to p2, given two points p1, p2
@@ -224,13 +232,25 @@ class GeoDraw:
         """
         self.in_pixelToLatLong = 0      # Debugging level count
         self.in_latLongToPixel = 0
+        self.max_dist_allowed = 150.    # Trail points further are questioned
+        self.trail_clean_rules = None   # TrailCleanRules, None - use defaults
+        self.trail_clean_stats = None   # Stats from most recent cleanTrail
+        self.density_overlay = None     # DensityOverlay, created when first used
+        self.layer_depth = 0            # > 0 while drawing onto a layer
+        self.draw = None                # Set, while drawing, to layer's ImageDraw
+        self.draw_image = None          # Layer image being drawn on
+        self.region_loader = None       # function(box) returning base map step,
+                                        # re-reading region at more detail, or None
+        self.rotate_source = None       # (unrotated base, its rotation, rotated base,
+                                        #  unrotated base recipe)
+        self.mapStates = MapStateHistory()  # Previous map states
         self.showSampleLL = showSampleLL
         self.forceSquare = forceSquare
         self.compass_rose = CompassRose().live_obj()    
         if image is None:
             image = Image.new("RGB", (100, 100))
         self.imageOriginal = image
-        self.setImage(image)
+        self.setImage(image)            # Base map with annotation layers (layers)
         self.mapRotate = mapRotate              # Current rotation
         self.mapRotateOriginal = mapRotate      # record original
         self.expandRotate = expandRotate
@@ -260,9 +280,79 @@ class GeoDraw:
         Setup image and associated data
         This should be called when ever the image is
         created.
+        The image is the new base map, without annotation layers
+        """
+        self.layers = MapLayers(base=image)
+        self.base_root = image          # Image base map is made from
+        self.base_recipe = ()           # Steps (crop, rotate) making base from root
+
+    @property
+    def image(self):
+        """ Map image - base map with annotation layers
+        composited only when a layer has changed
+        """
+        return self.layers.composite(self.renderLayerOp)
+
+    @image.setter
+    def image(self, image):
+        self.setImage(image)
+
+    def setBaseImage(self, image, rerender=True):
+        """ Replace base map, keeping annotation layers
+        e.g. after the map is rotated or expanded
+        :image: new base map image
+        :rerender: re-render annotation layers for the new map geometry
+                default: True
         """
-        self.image = image
-        self.draw = ImageDraw.Draw(self.image)      # Setup ImageDraw access
+        self.layers.set_base(image)
+        if rerender:
+            self.layers.mark_dirty()
+
+    def onLayer(self, name, fun, *args, layer_key=None, **kwargs):
+        """ Draw on layer, keeping the drawing op for re-rendering
+        :name: layer name (MapLayers)
+        :fun: drawing function, called with args, kwargs
+        :layer_key: if present, replaces layer's previous op with this key
+                e.g. redrawing the same trail
+        :returns: fun's return, None if layer is awaiting re-render
+        """
+        ret = []
+        def render(layer_image, fun, args, kwargs):
+            ret.append(self.renderLayerOp(layer_image, fun, args, kwargs))
+        self.layers.add_op(name, fun, args=args, kwargs=kwargs, render=render,
+                           key=layer_key)
+        return ret[0] if ret else None
+
+    def renderLayerOp(self, layer_image, fun, args, kwargs):
+        """ Do drawing op onto layer image
+        :layer_image: RGBA layer image
+        :fun, args, kwargs: drawing op
+        :returns: fun's return
+        """
+        prev_draw = self.draw
+        prev_image = self.draw_image
+        self.draw_image = layer_image
+        self.draw = ImageDraw.Draw(layer_image)
+        self.layer_depth += 1
+        try:
+            return fun(*args, **kwargs)
+        finally:
+            self.layer_depth -= 1
+            self.draw = prev_draw
+            self.draw_image = prev_image
+
+    def clearLayer(self, name):
+        """ Remove layer's content e.g. before redrawing trail
+        :name: layer name e.g. trail, sample, annotation, overlay, scale
+        """
+        self.layers.clear_layer(name)
+
+    def showLayer(self, name, show=True):
+        """ Show / hide layer
+        :name: layer name
+        :show: True - show layer default: show
+        """
+        self.layers.set_visible(name, show)
         
 
     def setLatLong(self, ulLat=None, ulLong=None,
@@ -541,6 +631,9 @@ class GeoDraw:
         """
         Add orientation marker
         """
+        if self.layer_depth == 0:
+            return self.onLayer("annotation", self.addCompassRose, compassRose=compassRose,
+                                layer_key="compass_rose")
         SlTrace.lg("addCompassRose")
         self.compass_rose = CompassRose(placement=compassRose).live_obj()
         if self.compass_rose is None:
@@ -590,16 +683,21 @@ class GeoDraw:
                 False: skip points outside region
                 default: keep
         """
+        if self.layer_depth == 0:
+            return self.onLayer("trail", self.addTrail, trail_in, title=title,
+                                color_code=color_code, color=color,
+                                keep_outside=keep_outside, width=width,
+                                layer_key=("trail", id(trail_in)))
         if title is not None:
             self.title = os.path.basename(title)
             title_xy = (self.getWidth()*.5, self.getHeight()*.05)
             self.addTitle(self.title, xY=title_xy)
-        self.max_dist_allowed = 150.
         trail = self.cleanTrail(trail_in, keep_outside=keep_outside)
         for track in trail.get_segments():
             points = track.get_points()
             if color_code:
-                return self.addTrail_color_code(points)
+                self.addTrail_color_code(points, stats=track.get_stats())
+                continue
             
             line_width = int(self.meterToPixel(width))
             line_points = []
@@ -611,45 +709,50 @@ class GeoDraw:
                         fill=color)
         return True
             
-    def addTrail_color_code(self, points):
+    def addTrail_color_code(self, points, stats=None):
         """ Do map with color coded line segments
-        :points:
-        :title:
-        """
-        prev_point = None
-        for i, point in enumerate(points):
-            if prev_point is not None:
-                line_len = abs(self.geoDist(prev_point.latLong(), point.latLong()))
-                line_color = None
-                if line_len > 100:
-                    line_color = "red"
-                    SlTrace.lg(f"point {i+1}: {point} is at a distance {line_len:.1f}m")
-                elif line_len > 20:
-                    line_color = "blue"
-                elif line_len > 10:
-                    line_color = "green"
-                elif line_len > 5:
-                    line_color = "yellow"
-                if line_len > self.max_dist_allowed:
-                    SlTrace.lg(f"Ignoring Suspicious line {i+1}:"
-                               f" {prev_point} to {point} as being too long: {line_len:.1f}m")
-                    line_color = "red"
-                else:
-                    self.addTrailLine(prev_point, point, color=line_color)
-            prev_point = point
+        :points: trail segment points
+        :stats: segment statistics (SegmentStats) for these points, if known
+                default: calculate distances
+        """
+        if stats is not None:
+            dists = stats.get_dists()
+        else:
+            npts = len(points)
+            dists = geo_distances(
+                    np.fromiter((pt.lat for pt in points), dtype=np.float64, count=npts),
+                    np.fromiter((pt.long for pt in points), dtype=np.float64, count=npts))
+        buckets = spacing_buckets(dists)
+        for i in range(1, len(points)):
+            prev_point = points[i-1]
+            point = points[i]
+            line_len = dists[i-1]
+            line_color = SPACING_COLORS[buckets[i-1]]
+            if line_color == "red":
+                SlTrace.lg(f"point {i+1}: {point} is at a distance {line_len:.1f}m")
+            if line_len > self.max_dist_allowed:
+                SlTrace.lg(f"Ignoring Suspicious line {i+1}:"
+                           f" {prev_point} to {point} as being too long: {line_len:.1f}m")
+            else:
+                self.addTrailLine(prev_point, point, color=line_color)
         return True
 
     
     def addSample(self, point, color="red",
-                  show_LL=True):
+                  show_LL=True, draw_plot=True):
         """
         Add sample to current image
         :point: SamplePoint
         :color: sample label color
         :show_LL: show Latitude, Longitude
                 default: True - show LL
+        :draw_plot: draw plot octagon
+                default: True - False if already drawn e.g. by addSamplePlots
     
         """
+        if self.layer_depth == 0:
+            return self.onLayer("sample", self.addSample, point, color=color,
+                                show_LL=show_LL, draw_plot=draw_plot)
         label_color = (255,0,0)
         label_size = 30
         label_font = ImageFont.truetype("arial.ttf", size=label_size)
@@ -663,8 +766,7 @@ class GeoDraw:
         plot_id = plot_key
         xY = self.getXY(latLong=(lat,long))
         plot_color = (0,255,0, 128)
-        plot_radius = 10.
-        plot_radius_pixel = self.meterToPixel(plot_radius)
+        plot_radius = SAMPLE_DRAW_RADIUS
         if plot_key == "TBM":
             radius_pixel = self.meterToPixel(plot_radius*.25)
             self.circle(xY=xY, radius=radius_pixel, fill="#adf0f5")
@@ -672,7 +774,9 @@ class GeoDraw:
             label_xy = self.addToPoint(xY=xY, leng=1.5*label_size, deg=75)
             self.text(plot_id, xY=label_xy,  font=label_font, fill=label_color)
         else:    
-            self.circle(xY=xY, radius=plot_radius_pixel, fill=plot_color)
+            if draw_plot:
+                xs, ys = octagon_pixels(self, [lat], [long], radius=plot_radius)
+                self.drawPolygon(*zip(xs[0], ys[0]), color=plot_color)
             label_xy = self.addToPoint(xY=xY, leng=1.5*label_size, deg=75)
             self.text(plot_id, xY=label_xy,  font=label_font, fill=label_color)
         
@@ -701,12 +805,79 @@ class GeoDraw:
         :color: color for sample
         :show_LL: show Latitude, longitude
         """
+        if self.layer_depth == 0:
+            return self.onLayer("sample", self.addSamples, points, title=title, color=color,
+                                show_LL=show_LL)
         if title is not None:
             self.title = os.path.basename(title)
             title_xy = (self.getWidth()*.5, self.getHeight()*.1)
             self.addTitle(self.title, xY=title_xy)
+        self.addSamplePlots(points)
         for point in points:
-            self.addSample(point, color=color, show_LL=show_LL)
+            self.addSample(point, color=color, show_LL=show_LL, draw_plot=False)
+        return True
+
+
+    def addSamplePlots(self, points, radius=None, color=None):
+        """ Draw sample plot octagons, all plots at once
+        Octagons are drawn on the transparent sample layer, which is
+        alpha-composited onto the map with the other layers
+        :points: sample points (SamplePoint)
+        :radius: plot center to vertex distance, in meters
+                default: SAMPLE_DRAW_RADIUS
+        :color: plot fill color default: translucent green
+        """
+        if self.layer_depth == 0:
+            return self.onLayer("sample", self.addSamplePlots, points, radius=radius, color=color)
+        if radius is None:
+            radius = SAMPLE_DRAW_RADIUS
+        if color is None:
+            color = (0,255,0, 128)
+        lats = []
+        longs = []
+        for point in points:
+            if isinstance(point, dict):
+                plot_key = point["plot"]                    # Older
+                lat, long = point["lat"], point["long"]
+            else:
+                plot_key = point.get_plot_key()
+                lat, long = point.latLong()
+            if plot_key == "TBM":
+                continue                # Not a plot
+            lats.append(lat)
+            longs.append(long)
+        if len(lats) == 0:
+            return False
+
+        xs, ys = octagon_pixels(self, lats, longs, radius=radius)
+        for i in range(len(lats)):
+            self.draw.polygon(list(zip(xs[i].tolist(), ys[i].tolist())), fill=color)
+        return True
+
+
+    def addDensityOverlay(self, species_density, species=None,
+                          measure="shrub_count", overlay=None):
+        """ Add density heatmap of sample plot values
+        :species_density: SpeciesDensity, joined to sample points
+        :species: species name, scientific or common e.g. Norway Maple
+                default: all species
+        :measure: SpeciesDensity measure default: shrub_count
+        :overlay: DensityOverlay (method, parameters, cache)
+                default: our DensityOverlay with default parameters
+        """
+        if self.layer_depth == 0:
+            return self.onLayer("density", self.addDensityOverlay, species_density,
+                                species=species, measure=measure, overlay=overlay,
+                                layer_key="density_overlay")
+        if overlay is None:
+            if self.density_overlay is None:
+                self.density_overlay = DensityOverlay()
+            overlay = self.density_overlay
+        lats, longs, values, _ = species_density.get_symbology(species=species,
+                                                               measure=measure)
+        image = overlay.get_overlay(self, lats, longs, values,
+                                    key=(species, measure))
+        self.draw_image.alpha_composite(image)
         return True
 
             
@@ -715,79 +886,38 @@ class GeoDraw:
         :p1: First point GPXPoint
         :p2: Second point GPXPoint    
         """
+        if self.layer_depth == 0:
+            return self.onLayer("trail", self.addTrailLine, p1, p2, color=color)
         if color is None:
             color = "orange"
         line_width = self.meterToPixel(self.trail_width)
         self.lineSeg(latLong=(p1.lat,p1.long), latLong2=(p2.lat,p2.long), width=int(line_width),
                      fill=color)
 
-    def cleanTrail(self, trail_in, keep_outside=True):
+    def cleanTrail(self, trail_in, keep_outside=True, rules=None):
         """ Adjust initial points to most likely to be valid measurements
             Assemble trail stats
-            1. Throw any points outside border
+            Points outside the map border, further than self.max_dist_allowed
+            from their neighbors, or (if times are known) reached too fast
+            are questioned
             :trail_in: raw trail info (SurveyTrail)
             :keep_outside: Keep points even if outside region
                 or further back than self.max_dist_allowed
                 False: skip points outside region
                 default: keep
-        """
-        return trail_in  # For now - no changes
-        '''
-        trail = SurveyTrail()
-        n_diff = 0              # Number of distances (n good pts - 1)
-        n_outside = 0
-        dist_sum = 0.
-        max_dist = None
-        min_dist = None
-        points_len = len(points_in)
-        for i, point in enumerate(points_in):
-            if not self.is_inside(latLong=point.latLong()):
-                n_outside += 1
-                SlTrace.lg(f"Questioning point {i+1}: {point} as outside border", "clean_trail")
-                if not keep_outside:
-                    continue    # Skip point outside border
-            if i == 0 and len(points_in) > 1:
-                p1_ll = points_in[i].latLong()
-                p2_ll = points_in[i+1].latLong()
-                dist = abs(self.geoDist(p1_ll, p2_ll))
-                if dist > self.max_dist_allowed:
-                    n_outside += 1
-                    SlTrace.lg(f"Questioning point {i+1}: {point} as too far")
-                    if not keep_outside:
-                        continue
-            point_prev = points[-1] if len(points) > 0 else None
-            check_prev = True if point_prev is not None else False
-            if i >= points_len-1:
-                check_next = False
-            else:
-                check_next = True
-                point_next = points_in[i+1]
-            if check_prev:
-                dist_prev = abs(self.geoDist(point_prev.latLong(), point.latLong()))
-                dist = dist_prev
-            if check_next:
-                dist_next = abs(self.geoDist(point.latLong(), point_next.latLong()))
-                dist = dist_next
-            if check_prev and check_next:
-                dist = max(dist_prev, dist_next)
-            points.append(point)
-            if check_prev:
-                n_diff += 1
-            if min_dist is None or dist < min_dist:
-                min_dist = dist
-            if max_dist is None or dist > max_dist:
-                max_dist = dist
-            dist_sum += dist            
-        SlTrace.lg("Trail Statistics")
-        SlTrace.lg(f"Number of points: {len(points_in)}")
-        SlTrace.lg(f"Number of displayed points: {len(points)}")
-        avg_dist = 0 if n_diff == 0 else dist_sum/n_diff
-        if len(points) > 0:
-            SlTrace.lg(f"minimum distance: {min_dist:.1f}m maximum distance: {max_dist:.1f}m average: {avg_dist:.2f}m")
-            SlTrace.lg(f"Total path distance: {dist_sum:.1f}m") 
-
+            :rules: cleaning rules (TrailCleanRules)
+                default: self.trail_clean_rules, if set, else
+                    from max_dist_allowed, keep_outside
+            :returns: cleaned trail (CleanedTrail) - get_stats() for statistics
+        """
+        if rules is None:
+            rules = self.trail_clean_rules
+        if rules is None:
+            rules = TrailCleanRules(max_dist_allowed=self.max_dist_allowed,
+                                    keep_outside=keep_outside)
+        trail = clean_trail(trail_in, inside_fun=self.are_inside, rules=rules)
+        self.trail_clean_stats = trail.get_stats()
         return trail
-        '''
    
     def addScale(self,
                 xY=None, pos=None, latLong=None,
@@ -828,6 +958,11 @@ class GeoDraw:
         :returns: NA
         Raises: NA
         """
+        if self.layer_depth == 0:
+            return self.onLayer("scale", self.addScale, xY=xY, pos=pos, latLong=latLong,
+                                xYEnd=xYEnd, posEnd=posEnd, latLongEnd=latLongEnd,
+                                deg=deg, leng=leng, unitName=unitName, tic_dir=tic_dir,
+                                marks=marks, bigMarks=bigMarks, color=color)
         np1_spec = 0
         if xY is not None:
             np1_spec += 1
@@ -947,6 +1082,9 @@ class GeoDraw:
 
 
     def addTitle(self, title, xY=None, size=None, color=None, **kwargs):
+        if self.layer_depth == 0:
+            return self.onLayer("annotation", self.addTitle, title, xY=xY, size=size,
+                                color=color, **kwargs)
         if xY is None:
             title_xy = (self.getWidth()*.1, self.getHeight()*.05)
         if size is None:
@@ -1053,7 +1191,7 @@ class GeoDraw:
         if box is None:
             raise SelectError("crop: box is required")
         print("before crop")
-        i_width, i_height = self.image.size
+        i_width, i_height = self.layers.size()
         print("x width=%.2f y height=%.2f" %
               (i_width, i_height))
         """
@@ -1071,12 +1209,12 @@ class GeoDraw:
         """
         ### if self.mapPoints is not None:
         ###    self.markPoints(self.mapPoints)
-        crop_image = self.image.crop(box=box)
-        crop_image.load()
+        self.layers.transform(lambda im: im.crop(box=box), self.renderLayerOp)
+        self.base_recipe += (("crop", box),)
+        crop_image = self.image
         self.dbShow("after crop", 
                     "image width=%d height=%d" % (crop_image.width, crop_image.height),
                     image=crop_image)
-        self.setImage(crop_image)               # break connection with image
     
     def addToPointLL(self, leng=None, xY=None, pos=None, latLong=None, theta=None, deg=None, unit=None):
         """
@@ -1104,15 +1242,16 @@ class GeoDraw:
     def getHeight(self):
         """
         Get image height in pixels
+        From the base map, so it doesn't composite the layers
         """
-        return self.image.height
+        return self.layers.size()[1]
 
 
     def getWidth(self):
         """
         Get image width in pixels
         """
-        return self.image.width
+        return self.layers.size()[0]
 
     def getXFract(self, x_image):
         """ fraction of width
@@ -1236,6 +1375,26 @@ class GeoDraw:
         return True 
 
 
+    def are_inside(self, lats, longs):
+        """ Test if points are within map borders
+        :lats, longs: arrays of latitude, longitude
+        :returns: boolean array, True if inside
+        """
+        mx, my = self.latLongsToPixels(lats, longs)
+        return ((mx >= 0) & (my >= 0)
+                & (mx <= self.getWidth()) & (my <= self.getHeight()))
+
+    def latLongsToPixels(self, lats, longs):
+        """ Array version of latLongToPixel
+        :lats, longs: arrays of latitude, longitude
+        :returns: x array, y array of pixels
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        longs = np.asarray(longs, dtype=np.float64)
+        mx = (longs - self.ulLong)/self.long_width*self.getWidth()
+        my = (self.ulLat - lats)/self.lat_height*self.getHeight()
+        return mx, my
+
     def latLongToPixel(self, latLong):
         """
         Convert latitude, longitude to pixel location on image (unrotated)
@@ -1490,29 +1649,47 @@ class GeoDraw:
         ulLat, ulLong = self.pixelToLatLong(ul_xy)
         lrLat, lrLong = self.pixelToLatLong(lr_xy)
         self.prev_image = self.image
-        new_im = self.image.crop(box=(ul_x, ul_y, lr_x, lr_y))
+        box = (ul_x, ul_y, lr_x, lr_y)
         SlTrace.lg(f"expandRegion: ul_x={ul_x} ul_y={ul_y} lr_x={lr_x} lr_y={lr_y}")
-        SlTrace.lg(f"new_im: {new_im}")
-        self.setImage(new_im)
+        self.cropBase(box)
         
         self.setLatLong(ulLat=ulLat, ulLong=ulLong,
                         lrLat=lrLat, lrLong=lrLong)
-        return new_im           # Just for immediate use, already stored
+        return self.image       # Just for immediate use, already stored
+
+    def cropBase(self, box):
+        """ Replace base map by region of it
+        The region is re-read at more detail, if the map has a full
+        resolution source (region_loader), else cropped
+        Annotation layers are re-rendered for the new region
+        :box: base map pixel box
+        """
+        step = None
+        if self.region_loader is not None:
+            step = self.region_loader(box)
+        if step is None:
+            step = ("crop", box)
+        new_im = apply_map_step(self.layers.base, step)
+        SlTrace.lg(f"new_im: {new_im}")
+        self.setBaseImage(new_im)
+        self.base_recipe += (step,)
 
     def popMapState(self):
         """ pop (restore) previous map state
+        :returns: True if restored, False if no previous state
         """
-        if len(self.mapStates) <= 0:
-            return
-        
         map_state = self.mapStates.pop()
+        if map_state is None:
+            return False
+        
         self.setMapState(map_state)
+        return True
             
     def pushMapState(self):
-        """ push current map state, recovered via popMap
+        """ push current map state, recovered via popMapState
         """
         map_state = self.collectMapState()
-        self.mapStates.append(map_state)
+        self.mapStates.push(map_state)
 
     def collectMapState(self):
         """ save map state and return it
@@ -1534,37 +1711,64 @@ class GeoDraw:
         """
 
         self.prev_image = self.image
-        new_im = self.image.crop(box=(min_x, min_y, max_x, max_y))
+        box = (min_x, min_y, max_x, max_y)
         SlTrace.lg(f"expandRegion: min_x={min_x} min_y={min_y} max_x={max_x} max_y={max_y}")
-        SlTrace.lg(f"new_im: {new_im}")
-        self.setImage(new_im)
         ulLat, ulLong = self.pixelToLatLong((min_x,min_y))
         lrLat, lrLong = self.pixelToLatLong((max_x,max_y))
+        self.cropBase(box)
         self.setLatLong(ulLat=ulLat, ulLong=ulLong,
                         lrLat=lrLat, lrLong=lrLong)
-        return new_im           # Just for immediate use, already stored
+        return self.image       # Just for immediate use, already stored
 
     def rotateMap(self, deg, incr=True, expand=None):
         """
         Rotate map, updating image, and mapRotate
-        Using original image to avoid pixel loss
+        Only the base map is rotated, annotation layers are
+        re-rendered for the new rotation
+        The base is rotated from the map as it was before the first
+        of a series of rotations (not compounding rotations), via the
+        rotation cache
         :deg: number of degrees to rotate
         :incr: incremental rotation False = absolute
             default: True - rotate from current
         :expand: expand image (defined) by PIL image
         """
-        map_current = mapRotate = self.get_mapRotate()
+        map_current = self.get_mapRotate()
+        to_deg = self.getRotateTo(deg, incr=incr)
+        self.mapRotate = to_deg
+        if (self.rotate_source is None
+                or self.rotate_source[2] is not self.layers.base):
+            self.rotate_source = (self.layers.base, map_current, self.layers.base,
+                                  self.base_recipe)
+        source, source_deg, _, source_recipe = self.rotate_source
+        im = rotate_image(source, to_deg - source_deg, expand=expand)
+        self.setBaseImage(im)
+        self.rotate_source = (source, source_deg, im, source_recipe)
+        self.base_recipe = source_recipe + (("rotate", to_deg - source_deg, expand),)
+        return self.image   # Just for immediate use, already stored
+
+    def getRotateTo(self, deg, incr=True):
+        """ Map rotation after rotating
+        :deg: number of degrees to rotate
+        :incr: incremental rotation False = absolute
+        :returns: rotation, normalized 0 <= deg < 360
+        """
+        if deg is None:
+            return self.get_mapRotate()
         if incr:
-            to_deg = mapRotate + deg
+            to_deg = self.get_mapRotate() + deg
         else:
             to_deg = deg
-        self.mapRotate = to_deg
-        to_deg = self.get_mapRotate()   # Normalize
-        self.mapRotate = to_deg         # Store normaized
-        from_current_deg = to_deg - map_current
-        im = self.image.rotate(from_current_deg, expand=expand)
-        self.setImage(im)
-        return im           # Just for immediate use, already stored
+        return to_deg % 360
+
+    def rotatePreview(self, deg, incr=True, expand=None):
+        """ Low resolution preview of rotateMap - map is unchanged
+        :deg, incr, expand: as in rotateMap
+        :returns: rotated low resolution map image
+        """
+        to_deg = self.getRotateTo(deg, incr=incr)
+        return rotation_cache.preview(self.image, to_deg - self.get_mapRotate(),
+                                      expand=expand)
 
     def mark_image(self):
         """ Mark image for diagnostics
@@ -1675,6 +1879,8 @@ class GeoDraw:
         return rot_pts
                 
     def ellipse(self, elp_cent, **kwargs):
+        if self.layer_depth == 0:
+            return self.onLayer("annotation", self.ellipse, elp_cent, **kwargs)
         ###elp_cent = self.points_to_image(elp_cent)[0]
         self.draw.ellipse(elp_cent, **kwargs)
 
@@ -1685,6 +1891,8 @@ class GeoDraw:
         Current pen position is unchanged.
         Non used args are passed to Image.draw.line 
         """
+        if self.layer_depth == 0:
+            return self.onLayer("annotation", self.line, points, **kwargs)
         if len(points) == 1:
             pts = [self.curXY, points[0]]
         else:
@@ -1696,6 +1904,9 @@ class GeoDraw:
     def drawLine(self, *points, color=None, width=None, **kwargs):
         """ drawText (ImageOverDraw image part
         """
+        if self.layer_depth == 0:
+            return self.onLayer("annotation", self.drawLine, *points, color=color,
+                                width=width, **kwargs)
         if color is not None:
             kwargs['fill'] = color
         if width is not None:
@@ -1715,6 +1926,9 @@ class GeoDraw:
     def drawPolygon(self, *points, color=None, width=None, **kwargs):
         """ drawText (ImageOverDraw image part
         """
+        if self.layer_depth == 0:
+            return self.onLayer("annotation", self.drawPolygon, *points, color=color,
+                                width=width, **kwargs)
         if color is not None:
             kwargs['fill'] = color
         if width is not None:
@@ -1732,6 +1946,9 @@ class GeoDraw:
         :xY: x,y pixel location
         :**kwargs: unused args passed on
         """
+        if self.layer_depth == 0:
+            return self.onLayer("annotation", self.drawText, xY, text, color=color,
+                                font=font, **kwargs)
         if color is not None:
             kwargs['fill'] = color
         if font is not None:
@@ -1742,6 +1959,9 @@ class GeoDraw:
         """
         Draw text, at position, defaulting to current pen position
         """
+        if self.layer_depth == 0:
+            return self.onLayer("annotation", self.text, text, xY=xY, pos=pos,
+                                latLong=latLong, **kwargs)
         xY = self.getXY(xY=xY, pos=pos, latLong=latLong)
         xY = self.points_to_image(xY)[0]
         self.draw.text(xY, text, **kwargs)
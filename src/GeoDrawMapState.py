@@ -2,50 +2,85 @@
 
 """
 Displayed map control/restoration
+
+A map state holds the map's georeference parameters and its base map
+raster.  The raster may be dropped (e.g. by MapStateHistory, to stay
+within a memory budget) - it is then rebuilt, when the state is
+restored, from the map's root image and the steps (crop, rotate)
+which made the state's base map from it.
 """
-from wx.lib.masked.maskededit import control
-from _testcapi import instancemethod
-from docutils.statemachine import State
+from rotation_cache import rotate_image
+
+
+def apply_map_step(image, step):
+    """ Apply base map step to image
+    :image: image
+    :step: ("crop", box) or ("rotate", deg, expand)
+            or ("tiles", TiledMapFile, box, size) - region read from
+            tiled map file, in place of image
+    :returns: resulting image
+    """
+    if step[0] == "crop":
+        return image.crop(box=step[1])
+    if step[0] == "tiles":
+        return step[1].read_region(box=step[2], out_size=step[3])
+    if step[0] == "rotate":
+        return rotate_image(image, step[1], expand=step[2])
+    raise ValueError(f"unrecognized map step {step}")
+
+
 class GeoDrawMapState:
-    
+    # GeoDraw georeference attributes saved / restored
+    GEO_ATTRS = ("ulLat", "ulLong", "lrLat", "lrLong",
+                 "ulmx", "ulmy", "lrmx", "lrmy",
+                 "long_width", "lat_height",
+                 "ulX", "ulY", "lrX", "lrY",
+                 "mapRotate")
+
     def __init__(self, geoDraw):
         """ map state control
-        :geoDraw: geoDraw instancemethod
+        :geoDraw: GeoDraw instance
         """
         gD = self.geoDraw = geoDraw
-        self.image  = self.image.copy()
-        self.ulLat  = self.ulLat
-        self.ulLong  = self.ulLong
-        self.lrLat  = self.lrLat
-        self.lrLong  = self.lrLong
-        self.ulmx  = self.ulmx
-        self.ulmy  = self.ulmy
-        self.lrmx  = self.lrmx
-        self.lrmy  = self.lrmy
-        self.long_width  = self.long_width
-        self.lat_height  = self.long_width
-        self.ulX  = self.ulX
-        self.ulY  = self.ulY
-        self.lrX  = self.lrX
-        self.lrY  = self.lrY
-        
+        self.geo = {}
+        for name in self.GEO_ATTRS:
+            self.geo[name] = getattr(gD, name, None)
+        self.base = gD.layers.base          # Base maps are replaced, not changed
+        self.size = self.base.size
+        self.mode = self.base.mode
+        self.root = gD.base_root            # Image base was made from
+        self.recipe = gD.base_recipe        # Steps making base from root
+
+    def raster_bytes(self):
+        """ Memory held by raster
+        """
+        if self.base is None:
+            return 0
+        return self.size[0]*self.size[1]*len(self.mode)
+
+    def drop_raster(self):
+        """ Drop raster, to be rebuilt if needed
+        """
+        self.base = None
+
+    def get_base(self):
+        """ Base map, rebuilt if dropped
+        """
+        if self.base is None:
+            image = self.root
+            for step in self.recipe:
+                image = apply_map_step(image, step)
+            self.base = image
+        return self.base
+
     def setState(self):
         """ set / reset map State
+        The annotation layers are kept, re-rendered for the restored map
         """
         gD = self.geoDraw
-        gD.image = self.image
-        gD.ulLat = self.ulLat
-        gD.ulLong = self.ulLong
-        gD.lrLat = self.lrLat
-        gD.lrLong = self.lrLong
-        gD.ulmx = self.ulmx
-        gD.ulmy = self.ulmy
-        gD.lrmx = self.lrmx
-        gD.lrmy = self.lrmy
-        gD.long_width = self.long_width
-        gD.lat_height = self.long_width
-        gD.ulX = self.ulX
-        gD.ulY = self.ulY
-        gD.lrX = self.lrX
-        gD.lrY = self.lrY
-        
\ No newline at end of file
+        gD.setBaseImage(self.get_base())
+        for name in self.GEO_ATTRS:
+            setattr(gD, name, self.geo[name])
+        gD.base_root = self.root
+        gD.base_recipe = self.recipe
+        gD.rotate_source = None
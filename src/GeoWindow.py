@@ -58,7 +58,8 @@ class GeoWindow(Frame):
         self.title = title
         
         if mapFile is not None or infoFile is not None:
-            mapImage, mapInfo = LoadImageFile(mapFile, infoFile)
+            view_size = None if width is None or height is None else (width, height)
+            mapImage, mapInfo = LoadImageFile(mapFile, infoFile, view_size=view_size)
             self.mapImage = mapImage
             self.mapInfo = mapInfo
         else:
@@ -7,6 +7,7 @@ Checking on scale
 from math import log, sqrt, cos, exp, tan, atan, pi, ceil
 import re
 import os
+import hashlib
 import time
 import datetime
 import sys
@@ -21,6 +22,9 @@ from GeoDraw import GeoDraw, geoDistance
 from GeoDraw import geoMove, geoUnitLen, minMaxLatLong
 from APIkey import APIKey
 from compass_rose import CompassRose
+from map_tile_plan import MapTilePlan, rotation_envelope
+from image_export import ImageExport
+from tiled_map_file import is_tiled_map_name, fit_size, TiledMapFile
 from numpy import square
 
 
@@ -71,7 +75,8 @@ Standalone utility functions
 I failed to discover a way of making these class/static member functions
 """
 
-def LoadImageFile(mapFileName=None, imageName=None, infoName=None):
+def LoadImageFile(mapFileName=None, imageName=None, infoName=None,
+                  view_box=None, view_size=None):
     """
     Load image, info file pair
     either mapFileName or one or both of imageName and infoName
@@ -88,7 +93,30 @@ def LoadImageFile(mapFileName=None, imageName=None, infoName=None):
     :imageName - image file name if present, else infer from info
     :infoName - info file name if present, else infer from image
     If neither is present, raise SelectError
+    For a tiled map file (.maptiles) the info is embedded, and only
+    the tiles, and overview level, needed for the view are read
+    :view_box: tiled map: full resolution pixel box (left, upper, right, lower)
+                default: whole map
+    :view_size: tiled map: (width, height) of view, e.g. canvas size
+                the image fits in it, keeping its aspect, but is never
+                above full resolution
+                default: full resolution
     """
+    if is_tiled_map_name(mapFileName) or is_tiled_map_name(imageName):
+        tiledName = mapFileName if mapFileName is not None else imageName
+        SlTrace.lg("Loading image from tiled map file %s" % tiledName)
+        tiled = TiledMapFile(tiledName)
+        out_size = None
+        if view_size is not None:
+            box = view_box
+            if box is None:
+                box = (0, 0, tiled.width, tiled.height)
+            out_size = fit_size((box[2] - box[0], box[3] - box[1]), view_size)
+        image = tiled.read_region(box=view_box, out_size=out_size)
+        info = DefaultImageInfo()
+        info.update(tiled.get_region_info(box=view_box))
+        return image, info
+        
     if mapFileName is not None:
         if infoName is not None or imageName is not None:
             raise SelectError("Can't include infoName or imageName with mapFileName")
@@ -115,30 +143,40 @@ def LoadImageFile(mapFileName=None, imageName=None, infoName=None):
 
 
 
-def LoadImageInfo(infoName):
+# info types - default: str
+IMAGE_INFO_TYPES = { 'mapType' : str,
+                     'ulLat' : float,
+                     'ulLong' : float,
+                     'lrLat' : float,
+                     'lrLong' : float,
+                     'mapRotate' : float,
+                     'isAugmented' : bool,
+                     }
+
+
+def DefaultImageInfo():
     """
-    Get info dictionary, if one, else return None
-    :infoName - image info file name
+    Info dictionary with default values
     """
-    # info types - default: str
-    info_type_d = { 'mapType' : str,
-                    'ulLat' : float,
-                    'ulLong' : float,
-                    'lrLat' : float,
-                    'lrLong' : float,
-                    'mapRotate' : float,
-                    'isAugmented' : bool,
-                    }
     info = {}
-    SlTrace.lg("Loading info from info file %s" % infoName)
-    # Set default values
-    for key, type in info_type_d.items():
+    for key, type in IMAGE_INFO_TYPES.items():
         if type is float:
             info[key] = 0
         elif type is bool:
             info[key] = False
         else:
             info[key] = None
+    return info
+
+
+def LoadImageInfo(infoName):
+    """
+    Get info dictionary, if one, else return None
+    :infoName - image info file name
+    """
+    info_type_d = IMAGE_INFO_TYPES
+    SlTrace.lg("Loading info from info file %s" % infoName)
+    info = DefaultImageInfo()
 
     # Give defaults if not specified or not found    
     if infoName is None or not os.path.exists(infoName):
@@ -264,6 +302,9 @@ class GoogleMapImage:
                  ySize=None,
                  maxSize = None,
                  file=None,
+                 clipPoints=None,
+                 view_box=None,
+                 view_size=None,
                  unit='m'):
         """ Generate map image, given latitute, longitude of upper left
         and lower right corners
@@ -320,6 +361,11 @@ class GoogleMapImage:
         :maxSize: maximum raw image x,y size in pixels
                 INSTEAD of xSize,ySize
                 default: use xSize, ySize
+        :clipPoints: region boundary points (each with .lat, .long),
+                if present only map tiles overlapping this region
+                (and the part of the image visible after rotation)
+                are fetched
+                default: fetch all tiles
         :file: image file name
                 default: construct name from image attributes
                         e.g.:
@@ -328,6 +374,11 @@ class GoogleMapImage:
                                     _640x640_sc1z19
                                     _h_mr45.png
                             info:  gmi_uLA-20..._png.imageinfo
+        :view_box: tiled map file: full resolution pixel box loaded
+                default: whole map
+        :view_size: tiled map file: (width, height) of view, e.g. canvas
+                size - only the overview level needed is read
+                default: full resolution
         :unit: distance unit m,y,f,s default: m(eter)
         """
         self.compass_rose = CompassRose(compassRose).live_obj()
@@ -340,8 +391,14 @@ class GoogleMapImage:
         self.forceNew = forceNew
         self.useOldFile = useOldFile
         self.expandRotate = expandRotate
+        self.view_box = view_box
+        self.view_size = view_size
+        self.view_source = None     # (TiledMapFile, file box, view image) if
+                                    # the map was loaded below full resolution
         self.enlargeForRotate = enlargeForRotate
         self.initial_mapRotate = mapRotate
+        self.clipPoints = clipPoints
+        self.tiles_skipped = 0          # Tiles not fetched, for most recent fetch
         if (ulLat is not None or ulLong is not None
                 or lrLat is not None or lrLong is not None) and mapPoints is not None:
             raise SelectError("Use only one of ullat... or mapPoints")
@@ -364,8 +421,14 @@ class GoogleMapImage:
         self.xOffset = xOffset
         self.yOffset = yOffset
         if file is not None and mapPoints is None and ulLat is None:
-            image, info = LoadImageFile(file)
+            image, info = LoadImageFile(file, view_box=view_box, view_size=view_size)
             SlTrace.lg(f"info:{info}")
+            self.imageInfo = info
+            if is_tiled_map_name(file):
+                tiled = TiledMapFile(file)
+                box = (0, 0, tiled.width, tiled.height) if view_box is None else tuple(view_box)
+                if image.size != (box[2] - box[0], box[3] - box[1]):
+                    self.view_source = (tiled, box, image)
             self._ulLat = info["ulLat"]
             self._ulLong = info["ulLong"]
             self._lrLat = info["lrLat"]
@@ -520,6 +583,8 @@ class GoogleMapImage:
                                mapRotate=mapRotate,
                                expandRotate=self.expandRotate,
                                unit=unit)
+        if self.view_source is not None:
+            self.geoDraw.region_loader = self.get_region_step
 
         if self.compass_rose is not None:
             cr = self.compass_rose
@@ -550,6 +615,9 @@ class GoogleMapImage:
                                                             self.maptype[0])
         if self.get_mapRotate() != 0:
             base_name += "_mr%.0f" % self.get_mapRotate()
+        if self.clipPoints is not None:
+            clip_str = ",".join(["%.6f,%.6f" % (pt.lat, pt.long) for pt in self.clipPoints])
+            base_name += "_cl" + hashlib.md5(clip_str.encode()).hexdigest()[:8]
         base_name = base_name.replace('.', "_")
         base_name += ".png"                     # Default image file extension
         rel_path = os.path.join("..", "out", base_name)
@@ -597,12 +665,18 @@ class GoogleMapImage:
         load image file, and info file, and return image, info pair
         """
         image_name = self.makeFileName()
-        return LoadImageFile(imageName=image_name)
+        return LoadImageFile(imageName=image_name, view_box=self.view_box,
+                             view_size=self.view_size)
 
 
     def addTitle(self, title, xY=None, size=None, color=None, **kwargs):
         self.geoDraw.addTitle(title, xY=xY, size=size, color=color, **kwargs)
 
+    def addDensityOverlay(self, species_density, species=None,
+                          measure="shrub_count", overlay=None):
+        return self.geoDraw.addDensityOverlay(species_density, species=species,
+                                              measure=measure, overlay=overlay)
+
     def getCenter(self, ctype='LL', unit=None, ref_latLong=None):
         """ Get center of plot
         :type: type of center 'll' - long,lat, 'pos' - physical location relative to ref,
@@ -763,6 +837,85 @@ class GoogleMapImage:
         """ Get image from geoDraw
         """
         return self.geoDraw.image
+
+    def get_full_box(self, box=None):
+        """ Full resolution source of base map region, for a map loaded
+        from a tiled map file below full resolution (view_source)
+        Supported for base maps made from the loaded view by crops
+        and tiled map reads (GeoDraw.cropBase), not rotations
+        :box: base map pixel box default: whole base map
+        :returns: (TiledMapFile, box in file's full resolution pixels),
+                None if no full resolution source
+        """
+        if self.view_source is None:
+            return None
+        
+        tiled, (x0, y0, x1, y1), view_image = self.view_source
+        gd = self.geoDraw
+        if gd.base_root is not view_image:
+            return None             # Base replaced
+        
+        fx, fy = (x1 - x0)/view_image.width, (y1 - y0)/view_image.height
+        steps = gd.base_recipe
+        if box is not None:
+            steps = steps + (("crop", box),)
+        for step in steps:
+            if step[0] == "crop":
+                cx0, cy0, cx1, cy1 = step[1]
+                x0, y0, x1, y1 = x0 + cx0*fx, y0 + cy0*fy, x0 + cx1*fx, y0 + cy1*fy
+            elif step[0] == "tiles":
+                x0, y0, x1, y1 = step[2]
+                fx, fy = (x1 - x0)/step[3][0], (y1 - y0)/step[3][1]
+            else:
+                return None         # Rotated
+        
+        return tiled, (int(round(x0)), int(round(y0)),
+                       max(int(round(x1)), int(round(x0)) + 1),
+                       max(int(round(y1)), int(round(y0)) + 1))
+
+    def get_region_step(self, box):
+        """ Base map step making region, re-read at view size from the
+        full resolution tiled map file, in place of a crop of the
+        lower resolution base map (GeoDraw.region_loader)
+        :box: base map pixel box
+        :returns: ("tiles", TiledMapFile, file box, size), None if
+                no full resolution source
+        """
+        full = self.get_full_box(box)
+        if full is None or self.view_size is None:
+            return None
+        
+        tiled, file_box = full
+        size = fit_size((file_box[2] - file_box[0], file_box[3] - file_box[1]),
+                        self.view_size)
+        return ("tiles", tiled, file_box, size)
+
+    def get_full_image(self):
+        """ Map image at full resolution e.g. for saving
+        For a map loaded below full resolution, the base map is read
+        from the tiled map file, with the annotation layers scaled over it
+        :returns: image, None if loaded below full resolution, without
+                a full resolution source (e.g. rotated since)
+        """
+        if self.view_source is None:
+            return self.get_image()
+        
+        full = self.get_full_box()
+        if full is None:
+            return None
+        
+        tiled, file_box = full
+        image = tiled.read_region(box=file_box)
+        gd = self.geoDraw
+        gd.image                            # Render layers
+        merged = gd.layers.get_merged()
+        if merged is None:
+            return image
+        
+        mode = image.mode
+        image = Image.alpha_composite(image.convert("RGBA"),
+                                      merged.resize(image.size, Image.BILINEAR))
+        return image if mode == "RGBA" else image.convert(mode)
         
     def getImage(self, mapRotate=None):
         """
@@ -812,7 +965,7 @@ class GoogleMapImage:
             ###self.displayRotateChange = True     # TFD
             if self.displayRotateChange:
                 self.dbShow("before rotate")
-            image = image.rotate(self.get_mapRotate(), expand=self.expandRotate)
+            image = image.rotate(self.get_mapRotate(), expand=self.expandRotate)    # Fresh image - not cached
             if self.displayRotateChange:
                 image.load()
                 SlTrace.lg("Rotated image(%.0f) width=%.2f height=%.2f expand=%s" %
@@ -905,15 +1058,20 @@ class GoogleMapImage:
 
     def save(self, image=None, name=None, hasInfo=True):
         """
-        Save image to file
+        Save image to file, waiting till written
         If image file saved, then save as <filename_no_ext>_AUG.ext
         iff name is None - also save info fle
+        Written, atomically, as by saveAsync
         :image: image to save
             default: geoDraw.image
         :name: image file name
         """
         if image is None:
-            image = self.get_image()
+            image = self.get_full_image()
+            if image is None:
+                SlTrace.lg("Can't save map loaded below full resolution"
+                           " without its full resolution source")
+                return
         if name is None:
             name = self.makeFileName()
         ext_pat = re.compile(r'(.*)\.([^.]+)$')
@@ -921,48 +1079,59 @@ class GoogleMapImage:
             name += ".png"     # Default extension
         if not os.path.abspath(name):
             name = os.path.join("out", name)
-                
-        try:
-            f = open(name, "wb")
-        except (IOError) as e:
-            SlTrace.lg("Can't open image save name %s %s" % (name, repr(e)))
-            return
-        
-        try:
-            image.save(f)
-            
-        except IOError as e:
-            SlTrace.lg("Problem saving image name %s %s" % (name, e.get_message()))
-            return
-        
-        SlTrace.lg("Image file saved in %s" % os.path.abspath(name))
-
         """
-        Save info file
+        Info file is saved too, unless georeference is embedded (tiled)
         Note Image.info structure does not seem to be preserved over all image operations
         """
-        if hasInfo:        
+        export = self.saveAsync(image, name, hasInfo=hasInfo,
+                                progress=lambda percent, message: None)
+        export.wait()                   # Error, if any, logged by export
+
+    def getInfoText(self, info_name):
+        """ Contents of image info file
+        :info_name: info file name, for header
+        """
+        now = datetime.datetime.now().strftime("%b %d %Y %H:%M:%S")
+        text = "# %s\n# %s\n\n" % (info_name, now)
+        for key in self.imageInfo:
+            value = self.imageInfo[key]
+            text += "%s=%s\n" % (key, value)
+        return text
+
+    def saveAsync(self, image=None, name=None, hasInfo=True,
+                  format=None, compress_level=None, quality=None,
+                  progress=None, done_call=None, tk_widget=None):
+        """
+        Save image, and info file, to file in the background
+        The image is snapshotted now, then encoded and written
+        (atomically) on a worker thread - see ImageExport
+        :image: image to save
+            default: geoDraw.image
+        :name: image file name default: makeFileName()
+        :hasInfo: also save info file default: True
+        :format, compress_level, quality, progress, done_call, tk_widget:
+                    see ImageExport
+        :returns: ImageExport, started
+        """
+        if image is None:
+            image = self.get_full_image()
+            if image is None:
+                raise SelectError("Can't save map loaded below full resolution"
+                                  " without its full resolution source")
+        if name is None:
+            name = self.makeFileName()
+        if re.search(r'\.[^.]+$', name) is None:
+            name += ".png"     # Default extension
+        info_name = info_text = None
+        if hasInfo and not is_tiled_map_name(name):  # tiled: info embedded
             info_name = self.makeInfoName(name)
-            try:
-                f = open(info_name, "w")
-            except (IOError) as e:
-                SlTrace.lg("Can't open image info name %s %s" % (info_name, repr(e)))
-                return
-            
-            try:
-                now = datetime.datetime.now().strftime("%b %d %Y %H:%M:%S")
-                line = "# %s\n# %s\n\n" % (info_name, now)
-                f.write(line)
-                for key in self.imageInfo:
-                    value = self.imageInfo[key]
-                    f.write("%s=%s\n" % (key, value))
-                f.close()
-                
-            except IOError as e:
-                SlTrace.lg("Problem saving image info name %s %s" % (name, e.get_message()))
-                return
-            
-            SlTrace.lg("Info file saved in %s" % os.path.abspath(info_name))
+            info_text = self.getInfoText(info_name)
+        export = ImageExport(image, name, info_text=info_text, info_name=info_name,
+                             info=dict(self.imageInfo),
+                             format=format, compress_level=compress_level,
+                             quality=quality, progress=progress,
+                             done_call=done_call, tk_widget=tk_widget)
+        return export.start()
 
 
 
@@ -991,9 +1160,15 @@ class GoogleMapImage:
         comp_image = Image.new("RGB", (int(dx), int(dy)))
         comp_image.info['ulLatLong'] = ulLatLong
         comp_image.info['lrLatLong'] = lrLatLong
+        tile_plan = self.getTilePlan(cols=cols, rows=rows,
+                                     tile_width=largura, tile_height=altura,
+                                     ulx=ulx, uly=uly, width=dx, height=dy)
         for x in range(cols):
             SlTrace.lg("x=%d" % x)
             for y in range(rows):
+                if not tile_plan.is_needed(x, y):
+                    SlTrace.lg("y=%d skipped - not visible" % y)
+                    continue
                 SlTrace.lg("y=%d" % y)
                 dxn = largura * (0.5 + x)
                 dyn = altura * (0.5 + y)
@@ -1034,13 +1209,43 @@ class GoogleMapImage:
                 tf.close()
                 im=Image.open(tfname)
                 comp_image.paste(im, (int(x*largura), int(y*altura)))
+        self.tiles_skipped = tile_plan.n_skipped()
+        tile_plan.report()
         return comp_image
+
+    def getTilePlan(self, cols, rows, tile_width, tile_height,
+                    ulx, uly, width, height):
+        """ Determine which tiles of raw image are to be fetched
+        Tiles are skipped if they are outside the clip region (clipPoints)
+        or outside the part of the image remaining after rotation
+        (unless rotation expands the image)
+        :cols, rows: number of tiles
+        :tile_width, tile_height: tile spacing in pixels
+        :ulx, uly: upper left corner, in zoom pixels (geo_latlontopixels)
+        :width, height: raw image size in pixels
+        :returns: MapTilePlan
+        """
+        clip_polygons = []
+        if self.clipPoints is not None and len(self.clipPoints) >= 3:
+            poly = []
+            for pt in self.clipPoints:
+                px, py = geo_latlontopixels(pt.lat, pt.long, self.zoom)
+                poly.append((px-ulx, uly-py))   # y increases downward
+            clip_polygons.append(poly)
+        rotate = self.get_mapRotate()
+        if rotate is not None and rotate % 360 != 0 and not self.expandRotate:
+            clip_polygons.append(rotation_envelope(width, height, rotate))
+        return MapTilePlan(cols, rows, tile_width, tile_height,
+                           clip_polygons=clip_polygons)
     
 
-    def saveAugmented(self, name=None):
+    def saveAugmented(self, name=None, wait=True, tk_widget=None):
         """
-        Save augmented image file
+        Save augmented image file, via saveAsync
         default name is <std name>_AUG.<std name ext>
+        :wait: wait till written e.g. to read the file
+                default: True
+        :tk_widget: see ImageExport, if not waiting
         Returns augmented name
         """
         
@@ -1060,7 +1265,10 @@ class GoogleMapImage:
             name = base + "_AUG" + "." + ext    
             
         SlTrace.lg("Saving augmented image name %s" % name)
-        self.save(self.get_image(), name, hasInfo=False)
+        export = self.saveAsync(self.get_image(), name, hasInfo=False,
+                                tk_widget=None if wait else tk_widget)
+        if wait:
+            export.wait()
         return name
         
     def show(self, image=None):
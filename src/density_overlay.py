@@ -0,0 +1,270 @@
+# density_overlay.py    19Oct2026  crs
+"""
+Density heatmap overlay - IDW interpolation or kernel density of
+sample plot values, rendered as a translucent RGBA image over the map
+
+The surface is computed with numpy over a raster grid of cells, in
+map image pixels, so it is aligned with the map's georeference
+(GeoDraw.latLongsToPixels).  The grid is coarser than the image (cell
+pixels on a side) and is resized (bilinear) to the image size.
+Rendered overlays are cached by (key, parameters, extent, values) so
+redrawing an unchanged map does not recompute the surface.
+"""
+from collections import OrderedDict
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+from select_trace import SlTrace
+from select_error import SelectError
+
+IDW_METHOD = "idw"
+KDE_METHOD = "kde"
+
+# Color ramp - (fraction, (r,g,b)) - low to high
+DENSITY_RAMP = (
+    (0.00, (  0,   0, 255)),
+    (0.25, (  0, 255, 255)),
+    (0.50, (  0, 255,   0)),
+    (0.75, (255, 255,   0)),
+    (1.00, (255,   0,   0)),
+    )
+
+
+def grid_centers(width, height, cell):
+    """ Pixel coordinates of grid cell centers
+    :width, height: image size in pixels
+    :cell: cell size in pixels
+    :returns: x array (ncols), y array (nrows)
+    """
+    ncols = max(1, int(np.ceil(width/cell)))
+    nrows = max(1, int(np.ceil(height/cell)))
+    gx = (np.arange(ncols) + .5)*width/ncols
+    gy = (np.arange(nrows) + .5)*height/nrows
+    return gx, gy
+
+
+def idw_grid(xs, ys, values, gx, gy, power=2., max_dist=None, chunk=4096):
+    """ Inverse distance weighted interpolation over grid
+    :xs, ys: sample point locations (pixels)
+    :values: sample values
+    :gx, gy: grid cell center x (columns), y (rows)
+    :power: distance power default: 2
+    :max_dist: ignore samples further than this (pixels)
+            default: all samples used
+    :chunk: grid cells computed at a time (limits memory)
+    :returns: array (nrows x ncols), nan where no sample is in range
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    cx, cy = np.meshgrid(gx, gy)
+    cx = cx.ravel()
+    cy = cy.ravel()
+    result = np.full(len(cx), np.nan)
+    if len(xs) == 0:
+        return result.reshape(len(gy), len(gx))
+
+    for start in range(0, len(cx), chunk):
+        end = start + chunk
+        d2 = ((cx[start:end, None] - xs[None, :])**2
+              + (cy[start:end, None] - ys[None, :])**2)
+        exact = d2 == 0.
+        with np.errstate(divide="ignore"):
+            weights = 1./d2**(power/2.)
+        if max_dist is not None:
+            weights[d2 > max_dist**2] = 0.
+        weights[exact] = 0.
+        wsum = weights.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            part = (weights @ values)/wsum
+        part[wsum == 0.] = np.nan
+        hit = exact.any(axis=1)             # Cell center on a sample
+        if hit.any():
+            part[hit] = values[exact[hit].argmax(axis=1)]
+        result[start:end] = part
+    return result.reshape(len(gy), len(gx))
+
+
+def kernel_density_grid(xs, ys, weights, gx, gy, bandwidth, chunk=4096):
+    """ Gaussian kernel density over grid
+    :xs, ys: sample point locations (pixels)
+    :weights: sample weights e.g. counts
+    :gx, gy: grid cell center x (columns), y (rows)
+    :bandwidth: kernel standard deviation (pixels)
+    :chunk: grid cells computed at a time (limits memory)
+    :returns: array (nrows x ncols) of density (weight per square pixel)
+    """
+    if bandwidth <= 0:
+        raise SelectError(f"kernel bandwidth must be positive: {bandwidth}")
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    cx, cy = np.meshgrid(gx, gy)
+    cx = cx.ravel()
+    cy = cy.ravel()
+    result = np.zeros(len(cx))
+    if len(xs) == 0:
+        return result.reshape(len(gy), len(gx))
+
+    norm = 1./(2*np.pi*bandwidth**2)
+    for start in range(0, len(cx), chunk):
+        end = start + chunk
+        d2 = ((cx[start:end, None] - xs[None, :])**2
+              + (cy[start:end, None] - ys[None, :])**2)
+        result[start:end] = np.exp(-d2/(2*bandwidth**2)) @ weights * norm
+    return result.reshape(len(gy), len(gx))
+
+
+def ramp_colors(fracts, ramp=None):
+    """ Colors for values in 0..1
+    :fracts: array of fractions
+    :ramp: color ramp default: DENSITY_RAMP
+    :returns: uint8 array (... x 3) of r,g,b
+    """
+    if ramp is None:
+        ramp = DENSITY_RAMP
+    stops = np.array([stop for stop, _ in ramp])
+    colors = np.array([color for _, color in ramp], dtype=np.float64)
+    fracts = np.clip(np.nan_to_num(fracts), 0., 1.)
+    rgb = np.empty(fracts.shape + (3,))
+    for i in range(3):
+        rgb[..., i] = np.interp(fracts, stops, colors[:, i])
+    return rgb.astype(np.uint8)
+
+
+class DensityOverlay:
+    """ Heatmap overlay generator with a cache of rendered overlays
+    """
+    def __init__(self, method=IDW_METHOD, power=2., max_dist=None,
+                 bandwidth=20., cell=8, alpha=.5, min_value=0.,
+                 max_cached=8):
+        """ Setup overlay parameters
+        :method: IDW_METHOD or KDE_METHOD default: IDW_METHOD
+        :power: IDW distance power default: 2
+        :max_dist: IDW sample range, in meters default: unlimited
+        :bandwidth: kernel standard deviation, in meters default: 20
+        :cell: raster grid cell size, in pixels default: 8
+        :alpha: maximum overlay opacity (0-1) default: .5
+        :min_value: values at or below are transparent default: 0
+        :max_cached: maximum number of cached overlays default: 8
+        """
+        if method not in (IDW_METHOD, KDE_METHOD):
+            raise SelectError(f"Unrecognized density method: {method}")
+        self.method = method
+        self.power = power
+        self.max_dist = max_dist
+        self.bandwidth = bandwidth
+        self.cell = cell
+        self.alpha = alpha
+        self.min_value = min_value
+        self.max_cached = max_cached
+        self.cache = OrderedDict()
+        self.n_computed = 0
+        self.n_cache_hits = 0
+
+    def get_params(self):
+        return (self.method, self.power, self.max_dist, self.bandwidth,
+                self.cell, self.alpha, self.min_value)
+
+    @staticmethod
+    def get_extent(geo_draw):
+        """ Map extent - georeference and image size
+        """
+        return (geo_draw.ulLat, geo_draw.ulLong,
+                geo_draw.lrLat, geo_draw.lrLong,
+                geo_draw.getWidth(), geo_draw.getHeight())
+
+    def clear_cache(self):
+        self.cache = OrderedDict()
+
+    def get_overlay(self, geo_draw, lats, longs, values, key=None):
+        """ Get overlay image, from cache if possible
+        :geo_draw: GeoDraw giving the map georeference
+        :lats, longs: sample locations
+        :values: sample values
+        :key: caller's name for data e.g. species, measure
+        :returns: RGBA image, the size of the map image
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        longs = np.asarray(longs, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        data_hash = hashlib.sha1()
+        for array in (lats, longs, values):
+            data_hash.update(array.tobytes())
+        cache_key = (key, self.get_params(), self.get_extent(geo_draw),
+                     data_hash.hexdigest())
+        overlay = self.cache.get(cache_key)
+        if overlay is not None:
+            self.cache.move_to_end(cache_key)
+            self.n_cache_hits += 1
+            SlTrace.lg(f"DensityOverlay: cached {key}", "density_overlay")
+            return overlay
+
+        overlay = self.make_overlay(geo_draw, lats, longs, values)
+        self.cache[cache_key] = overlay
+        while len(self.cache) > self.max_cached:
+            self.cache.popitem(last=False)
+        return overlay
+
+    def make_surface(self, geo_draw, lats, longs, values):
+        """ Compute surface over raster grid
+        :returns: array (nrows x ncols) of values
+        """
+        width = geo_draw.getWidth()
+        height = geo_draw.getHeight()
+        xs, ys = geo_draw.latLongsToPixels(lats, longs)
+        gx, gy = grid_centers(width, height, self.cell)
+        pixel_per_meter = geo_draw.meterToPixel(1.)
+        if self.method == IDW_METHOD:
+            max_dist = None
+            if self.max_dist is not None:
+                max_dist = self.max_dist*pixel_per_meter
+            return idw_grid(xs, ys, values, gx, gy,
+                            power=self.power, max_dist=max_dist)
+
+        return kernel_density_grid(xs, ys, values, gx, gy,
+                                   bandwidth=self.bandwidth*pixel_per_meter)
+
+    def make_overlay(self, geo_draw, lats, longs, values):
+        """ Compute overlay image
+        :returns: RGBA image
+        """
+        width = geo_draw.getWidth()
+        height = geo_draw.getHeight()
+        keep = ~(np.isnan(lats) | np.isnan(longs) | np.isnan(values))
+        surface = self.make_surface(geo_draw, lats[keep], longs[keep], values[keep])
+        self.n_computed += 1
+        vmax = np.nanmax(surface) if np.any(~np.isnan(surface)) else 0.
+        if vmax > self.min_value:
+            fracts = (surface - self.min_value)/(vmax - self.min_value)
+        else:
+            fracts = np.zeros(surface.shape)
+        rgba = np.zeros(surface.shape + (4,), dtype=np.uint8)
+        rgba[..., :3] = ramp_colors(fracts)
+        opaque = ~np.isnan(surface) & (surface > self.min_value)
+        rgba[..., 3] = np.where(opaque,
+                                np.clip(np.nan_to_num(fracts), 0., 1.)*self.alpha*255,
+                                0).astype(np.uint8)
+        overlay = Image.fromarray(rgba, "RGBA")
+        if overlay.size != (width, height):
+            overlay = overlay.resize((width, height), Image.BILINEAR)
+        SlTrace.lg(f"DensityOverlay: {self.method} grid {surface.shape[1]}"
+                   f"x{surface.shape[0]} from {int(keep.sum())} samples",
+                   "density_overlay")
+        return overlay
+
+    @staticmethod
+    def composite(image, overlay):
+        """ Alpha composite overlay onto image
+        :image: map image (any mode)
+        :overlay: RGBA overlay, same size
+        :returns: composited image, in image's mode
+        """
+        mode = image.mode
+        base = image if mode == "RGBA" else image.convert("RGBA")
+        result = Image.alpha_composite(base, overlay)
+        if mode != "RGBA":
+            result = result.convert(mode)
+        return result
@@ -0,0 +1,122 @@
+# display_list.py    19Oct2026  crs
+"""
+Retained display list - overlay drawing items (lines, circles,
+polygons, text) with their attributes, in canvas coordinates
+
+Items are recorded as they are drawn on the canvas, keyed by the canvas
+tag returned to the drawer, and removed when the tag is deleted.  The
+list can be replayed, in drawing order, onto any backend with the
+drawLine / drawCircle / drawPolygon / drawText calls (ScrolledCanvas,
+GeoDraw) e.g. to put the overlays into the map image for saving,
+without recomputing their geometry from the points / trails.
+"""
+from select_trace import SlTrace
+
+# Drawing attributes understood by the PIL (GeoDraw) backend
+IMAGE_ATTRS = ("fill", "outline", "width")
+
+
+class DisplayItem:
+    __slots__ = ("kind", "coords", "color", "width", "radius", "text",
+                 "font", "attrs", "canvas_tag")
+
+    def __init__(self, kind, coords, color=None, width=None, radius=None,
+                 text=None, font=None, attrs=None, canvas_tag=None):
+        """ Display item
+        :kind: "line", "circle", "polygon", "text"
+        :coords: list of canvas x,y
+        :color: item color
+        :width: line width, in canvas pixels
+        :radius: circle radius, in canvas pixels
+        :text: text string
+        :font: canvas font e.g. ("tahoma", 16)
+        :attrs: other drawing attributes
+        :canvas_tag: current canvas tag(s), if drawn on canvas
+        """
+        self.kind = kind
+        self.coords = coords
+        self.color = color
+        self.width = width
+        self.radius = radius
+        self.text = text
+        self.font = font
+        self.attrs = attrs if attrs is not None else {}
+        self.canvas_tag = canvas_tag
+
+
+class DisplayList:
+    def __init__(self):
+        self.items = {}         # by key, in drawing order
+
+    def __len__(self):
+        return len(self.items)
+
+    @staticmethod
+    def tag_key(tag):
+        """ Key for canvas tag (a tag or list of tags)
+        """
+        if isinstance(tag, list):
+            return tuple(tag)
+        return tag
+
+    def add(self, tag, kind, coords, **kwargs):
+        """ Record item drawn
+        :tag: canvas tag(s) returned to the drawer
+        :kind, coords, kwargs: as in DisplayItem
+        :returns: item
+        """
+        if tag is None:
+            return None
+        item = DisplayItem(kind, [tuple(xy) for xy in coords],
+                           canvas_tag=tag, **kwargs)
+        self.items[self.tag_key(tag)] = item
+        return item
+
+    def remove(self, tag):
+        """ Remove item, if recorded
+        :tag: tag returned when item was drawn
+        :returns: removed item, None if not recorded
+        """
+        return self.items.pop(self.tag_key(tag), None)
+
+    def clear(self):
+        self.items = {}
+
+    def replay(self, backend, xform=None, scale=1., font_fun=None,
+               attrs_ok=None):
+        """ Draw items, in order, onto backend
+        :backend: object with drawLine, drawCircle, drawPolygon, drawText
+                e.g. ScrolledCanvas, GeoDraw
+        :xform: function(list of canvas x,y) returning backend x,y list
+                default: unchanged
+        :scale: backend pixels per canvas pixel, for widths / radii
+        :font_fun: function(canvas font) returning backend font
+                default: unchanged
+        :attrs_ok: attribute names passed to backend default: all
+        :returns: list of (item, backend return e.g. canvas tag)
+        """
+        drawn = []
+        for item in list(self.items.values()):
+            coords = item.coords if xform is None else xform(item.coords)
+            attrs = item.attrs
+            if attrs_ok is not None:
+                attrs = {k: v for k, v in attrs.items() if k in attrs_ok}
+            width = item.width
+            if width is not None:
+                width = max(width*scale, 1)
+            if item.kind == "line":
+                ret = backend.drawLine(*coords, color=item.color, width=width, **attrs)
+            elif item.kind == "circle":
+                ret = backend.drawCircle(coords[0], radius=item.radius*scale,
+                                         color=item.color, **attrs)
+            elif item.kind == "polygon":
+                ret = backend.drawPolygon(*coords, color=item.color, **attrs)
+            elif item.kind == "text":
+                font = item.font if font_fun is None else font_fun(item.font)
+                ret = backend.drawText(coords[0], item.text, font=font,
+                                       color=item.color, **attrs)
+            else:
+                SlTrace.lg(f"DisplayList: unrecognized item kind {item.kind}")
+                continue
+            drawn.append((item, ret))
+        return drawn
@@ -0,0 +1,299 @@
+# edit_history.py    19Oct2026  crs
+"""
+Undo / redo of point, trail and region edits
+
+Each edit is recorded as a small delta record (the point / segment /
+region affected and the change), not a snapshot, so memory per edit is
+constant and the history can be unlimited.  Records made between
+begin_group and end_group, or in a grouped() with statement (e.g. the
+points of one "Delete Trail Points" selection) are undone / redone as
+one step.  A point drag is recorded
+once, at mouse up, from its mouse down location.
+"""
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from select_trace import SlTrace
+
+
+class PointEdit(ABC):
+    """ Edit record base
+    """
+    __slots__ = ()
+
+    @abstractmethod
+    def undo(self, mgr):
+        """ Reverse the edit
+        :mgr: point manager
+        """
+
+    @abstractmethod
+    def redo(self, mgr):
+        """ Make the edit again, after undo
+        :mgr: point manager
+        """
+
+
+class MovePointEdit(PointEdit):
+    __slots__ = ("point", "from_ll", "to_ll")
+
+    def __init__(self, point, from_ll, to_ll):
+        """
+        :point: point moved
+        :from_ll: (lat, long) before move
+        :to_ll: (lat, long) after move
+        """
+        self.point = point
+        self.from_ll = from_ll
+        self.to_ll = to_ll
+
+    def undo(self, mgr):
+        self.point.move(lat=self.from_ll[0], long=self.from_ll[1])
+        mgr.point_moved(self.point, self.to_ll)
+
+    def redo(self, mgr):
+        self.point.move(lat=self.to_ll[0], long=self.to_ll[1])
+        mgr.point_moved(self.point, self.from_ll)
+
+
+class AddPointEdit(PointEdit):
+    __slots__ = ("point", "index")
+
+    def __init__(self, point, index):
+        """
+        :point: point added to manager
+        :index: index in manager's point list
+        """
+        self.point = point
+        self.index = index
+
+    def undo(self, mgr):
+        mgr.remove_point(self.point)
+
+    def redo(self, mgr):
+        mgr.restore_point(self.point, self.index)
+
+
+class RemovePointEdit(AddPointEdit):
+    __slots__ = ()
+
+    def undo(self, mgr):
+        AddPointEdit.redo(self, mgr)
+
+    def redo(self, mgr):
+        AddPointEdit.undo(self, mgr)
+
+
+class TrailInsertEdit(PointEdit):
+    __slots__ = ("segment", "index", "point", "time")
+
+    def __init__(self, segment, index, point, time=None):
+        """
+        :segment: trail segment (SurveyTrailSegment)
+        :index: index of point in segment
+        :point: point inserted
+        :time: point time, if known
+        """
+        self.segment = segment
+        self.index = index
+        self.point = point
+        self.time = time
+
+    def undo(self, mgr):
+        self.segment.delete_points(self.point)
+
+    def redo(self, mgr):
+        self.segment.insert_point(self.index, self.point, time=self.time)
+        mgr.tr_ctl.track_trail_point(self.segment, self.point)
+
+
+class TrailDeleteEdit(TrailInsertEdit):
+    __slots__ = ()
+
+    def undo(self, mgr):
+        TrailInsertEdit.redo(self, mgr)
+
+    def redo(self, mgr):
+        TrailInsertEdit.undo(self, mgr)
+
+
+class RegionAddEdit(PointEdit):
+    __slots__ = ("region", "point", "ntracked", "is_start")
+
+    def __init__(self, region, point, ntracked, is_start):
+        """
+        :region: region (SurveyRegion) point was added to
+        :point: point added
+        :ntracked: number of region tracked items before the add
+        :is_start: point started the region
+        """
+        self.region = region
+        self.point = point
+        self.ntracked = ntracked
+        self.is_start = is_start
+
+    def undo(self, mgr):
+        region = self.region
+        if len(region.points) > 0 and region.points[-1] is self.point:
+            region.points.pop()
+        del region.tracked[self.ntracked:]  # Lines go with the point
+        region.changed()
+        if self.is_start:
+            mgr.tr_ctl.current_region = None
+
+    def redo(self, mgr):
+        tr_ctl = mgr.tr_ctl
+        tr_ctl.current_region = self.region
+        self.region.add_points(self.point)
+        if tr_ctl.auto_tracking == "adjacent_pairs":
+            tr_ctl.augment_region()
+
+
+class RegionCompleteEdit(PointEdit):
+    __slots__ = ("region", "nedges")
+
+    def __init__(self, region, nedges):
+        """
+        :region: region completed
+        :nedges: number of region edges before completion
+        """
+        self.region = region
+        self.nedges = nedges
+
+    def undo(self, mgr):
+        tr_ctl = mgr.tr_ctl
+        region = self.region
+        if len(region.tracked) > 0:
+            closing = region.tracked.pop()
+            closing.destroy()
+            if closing in tr_ctl.tracked_items:
+                tr_ctl.tracked_items.remove(closing)
+        del region.edges[self.nedges:]
+        region.completed = False
+        region.changed()
+        if region in tr_ctl.regions:
+            tr_ctl.regions.remove(region)
+        tr_ctl.current_region = region
+
+    def redo(self, mgr):
+        mgr.tr_ctl.current_region = self.region
+        mgr.tr_ctl.complete_region()
+
+
+class EditGroup(PointEdit):
+    __slots__ = ("edits",)
+
+    def __init__(self, edits):
+        self.edits = edits
+
+    def undo(self, mgr):
+        for edit in reversed(self.edits):
+            edit.undo(mgr)
+
+    def redo(self, mgr):
+        for edit in self.edits:
+            edit.redo(mgr)
+
+
+class EditHistory:
+    def __init__(self, mgr):
+        """ Setup empty history
+        :mgr: point manager
+        """
+        self.mgr = mgr
+        self.undo_list = []
+        self.redo_list = []
+        self.group = None           # Edits of open group, if any
+        self.group_depth = 0
+        self.applying = False       # Set during undo / redo - not recorded
+
+    def record(self, edit):
+        """ Record edit, just made
+        :edit: edit record (PointEdit)
+        """
+        if self.applying:
+            return
+        if self.group is not None:
+            self.group.append(edit)
+            return
+        self.undo_list.append(edit)
+        self.redo_list = []         # New edit ends redo possibilities
+
+    def begin_group(self):
+        """ Start group of edits, undone as one step
+        Groups may be nested, the outermost group is the step
+        """
+        if self.group_depth == 0:
+            self.group = []
+        self.group_depth += 1
+
+    def end_group(self):
+        """ End group of edits
+        """
+        if self.group_depth == 0:
+            return
+        self.group_depth -= 1
+        if self.group_depth > 0:
+            return
+        edits = self.group
+        self.group = None
+        if len(edits) == 1:
+            self.record(edits[0])
+        elif len(edits) > 1:
+            self.record(EditGroup(edits))
+
+    @contextmanager
+    def grouped(self):
+        """ Group of edits, as a with statement
+        The group is ended even if an edit raises
+        """
+        self.begin_group()
+        try:
+            yield self
+        finally:
+            self.end_group()
+
+    def can_undo(self):
+        return len(self.undo_list) > 0
+
+    def can_redo(self):
+        return len(self.redo_list) > 0
+
+    def undo(self):
+        """ Undo most recent edit (step)
+        :returns: True if an edit was undone
+        """
+        if not self.can_undo():
+            SlTrace.lg("Nothing to undo")
+            return False
+        edit = self.undo_list.pop()
+        self.apply(edit.undo)
+        self.redo_list.append(edit)
+        return True
+
+    def redo(self):
+        """ Redo most recently undone edit (step)
+        :returns: True if an edit was redone
+        """
+        if not self.can_redo():
+            SlTrace.lg("Nothing to redo")
+            return False
+        edit = self.redo_list.pop()
+        self.apply(edit.redo)
+        self.undo_list.append(edit)
+        return True
+
+    def apply(self, fun):
+        self.applying = True
+        try:
+            fun(self.mgr)
+        finally:
+            self.applying = False
+
+    def clear(self):
+        """ Forget all edits e.g. when the trail is replaced
+        """
+        self.undo_list = []
+        self.redo_list = []
+        self.group = None
+        self.group_depth = 0
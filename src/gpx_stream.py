@@ -0,0 +1,142 @@
+# gpx_stream.py    19Oct2026  crs
+"""
+Streaming GPX track reader
+
+Reads track segments (<trkseg>/<trkpt>) with ElementTree.iterparse,
+clearing each element as soon as it is consumed, so very large
+track files are read in bounded memory.  Each segment is returned
+as numpy arrays rather than per-point objects.
+"""
+import datetime
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from select_trace import SlTrace
+from select_error import SelectError
+
+
+class GPXSegmentArrays:
+    """ One track segment as arrays
+    """
+    def __init__(self, lat, long, elev=None, time=None):
+        """ Segment data
+        :lat: array of latitudes
+        :long: array of longitudes
+        :elev: array of elevations, nan where missing
+                default: all missing
+        :time: array of times (seconds since epoch), nan where missing
+                default: all missing
+        """
+        self.lat = lat
+        self.long = long
+        if elev is None:
+            elev = np.full(len(lat), np.nan)
+        self.elev = elev
+        if time is None:
+            time = np.full(len(lat), np.nan)
+        self.time = time
+
+    def __len__(self):
+        return len(self.lat)
+
+
+def _local_name(tag):
+    """ Tag without namespace e.g. "{http://www.topografix.com/GPX/1/1}trkpt"
+    => "trkpt"
+    """
+    if tag[0] == "{":
+        return tag.rsplit("}", 1)[1]
+    return tag
+
+
+def _parse_time(text):
+    """ GPX (ISO 8601) time to seconds since epoch
+    :returns: float seconds, nan if unparsable
+    """
+    if text is None:
+        return np.nan
+    text = text.strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return np.nan
+
+
+class GPXStreamReader:
+    """ Iterate over GPX file track segments
+    """
+    def __init__(self, file_name):
+        """ Setup reader
+        :file_name: GPX file name
+        """
+        if file_name is None:
+            raise SelectError("GPXStreamReader: file_name is required")
+        self.file_name = file_name
+        self.npoints = 0            # Points read so far
+        self.nsegments = 0          # Segments read so far
+
+    def iter_segments(self):
+        """ Generate segments, in file order
+        :returns: generator of GPXSegmentArrays
+        """
+        lats = []
+        longs = []
+        elevs = []
+        times = []
+        in_seg = False
+        elev = np.nan
+        time = np.nan
+        try:
+            for event, elem in ET.iterparse(self.file_name,
+                                            events=("start", "end")):
+                name = _local_name(elem.tag)
+                if event == "start":
+                    if name == "trkseg":
+                        in_seg = True
+                        lats, longs, elevs, times = [], [], [], []
+                    elif name == "trkpt":
+                        elev = time = np.nan
+                    continue
+
+                if not in_seg:
+                    if name == "trk":
+                        elem.clear()
+                    continue
+
+                if name == "ele":
+                    try:
+                        elev = float(elem.text)
+                    except (TypeError, ValueError):
+                        elev = np.nan
+                elif name == "time":
+                    time = _parse_time(elem.text)
+                elif name == "trkpt":
+                    lats.append(float(elem.get("lat")))
+                    longs.append(float(elem.get("lon")))
+                    elevs.append(elev)
+                    times.append(time)
+                    elem.clear()        # Release point subtree
+                elif name == "trkseg":
+                    in_seg = False
+                    elem.clear()
+                    self.nsegments += 1
+                    self.npoints += len(lats)
+                    yield GPXSegmentArrays(np.array(lats, dtype=np.float64),
+                                           np.array(longs, dtype=np.float64),
+                                           np.array(elevs, dtype=np.float64),
+                                           np.array(times, dtype=np.float64))
+        except ET.ParseError as e:
+            raise SelectError(f"GPX parse error in {self.file_name}: {e}")
+
+        SlTrace.lg(f"GPXStreamReader: {self.file_name}"
+                   f" {self.nsegments} segments {self.npoints} points",
+                   "gpx_stream")
+
+    def get_segments(self):
+        """ Read all segments
+        :returns: list of GPXSegmentArrays
+        """
+        return list(self.iter_segments())
@@ -0,0 +1,232 @@
+# image_export.py    19Oct2026  crs
+"""
+Background map image export
+
+The map image is snapshotted on the calling (Tk) thread, then encoded
+and written on a worker thread, so saving a large map doesn't freeze
+the display.  PIL's encoders (zlib for PNG) release the GIL while
+compressing, so a thread is sufficient.  The image, and its .imageinfo
+file if one, are written to temporary files in the destination
+directory, then renamed into place, so a reader never sees a partial
+file.
+
+Progress (percent, message) is reported via the progress call, by
+default a terminal progressbar.ProgressBar.  If a Tk widget is given,
+the worker queues its progress and the widget polls the queue, so the
+progress and done calls run on the Tk thread.
+"""
+import os
+import queue
+import threading
+
+from select_trace import SlTrace
+from progressbar import ProgressBar
+from tiled_map_file import TILED_MAP_EXT, TiledMapWriter
+
+# Format by file extension
+EXPORT_FORMATS = {
+    ".png": "PNG",
+    ".jpg": "JPEG",
+    ".jpeg": "JPEG",
+    ".tif": "TIFF",
+    ".tiff": "TIFF",
+    ".webp": "WEBP",
+    TILED_MAP_EXT: "MAPTILES",      # Tiled, with overviews and georeference
+    }
+
+
+def write_atomic(name, write):
+    """ Write file via temporary file, renamed into place
+    so a reader never sees a partial file
+    :name: file name
+    :write: function(binary file) writing contents
+    """
+    tmp_name = os.path.join(os.path.dirname(os.path.abspath(name)),
+                            f".{os.path.basename(name)}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_name, "wb") as fout:
+            write(fout)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_name, name)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+class ProgressWriter:
+    """ Binary file wrapper, reporting bytes written
+    """
+    def __init__(self, fout, report, report_every=1<<20):
+        """
+        :fout: binary file
+        :report: function(nbytes written)
+        :report_every: bytes between reports default: 1MB
+        """
+        self.fout = fout
+        self.report = report
+        self.report_every = report_every
+        self.nbytes = 0
+        self.reported = 0
+
+    def write(self, data):
+        n = self.fout.write(data)
+        self.nbytes += len(data)
+        if self.nbytes - self.reported >= self.report_every:
+            self.reported = self.nbytes
+            self.report(self.nbytes)
+        return n
+
+    def __getattr__(self, name):
+        return getattr(self.fout, name)    # tell, seek, flush, ...
+
+
+class ImageExport:
+    POLL_MS = 100               # Tk progress queue poll interval
+
+    def __init__(self, image, name, info_text=None, info_name=None, info=None,
+                 format=None, compress_level=None, quality=None,
+                 progress=None, done_call=None, tk_widget=None):
+        """ Setup export
+        :image: image to save - snapshotted (copied) here
+        :name: image file name
+        :info_text: contents of info file, if one
+        :info_name: info file name, required if info_text
+        :info: georeference info, embedded in MAPTILES format
+        :format: PIL format e.g. "PNG", "JPEG"
+                default: from name's extension, else PNG
+        :compress_level: PNG (and MAPTILES tile) zlib level
+                    0 (none, fastest) - 9 (smallest)
+                default: 6
+        :quality: JPEG / WEBP quality default: PIL's
+        :progress: function(percent, message) default: ProgressBar
+        :done_call: function(export) called when finished, export.error
+                    set if failed
+        :tk_widget: if present, progress and done_call are called
+                    on the Tk thread, via this widget's after
+        """
+        self.image = image.copy()
+        self.name = name
+        self.info_text = info_text
+        self.info_name = info_name
+        self.info = info
+        if format is None:
+            ext = os.path.splitext(name)[1].lower()
+            format = EXPORT_FORMATS.get(ext, "PNG")
+        self.format = format.upper()
+        if compress_level is None:
+            compress_level = 6
+        self.compress_level = compress_level
+        self.quality = quality
+        if progress is None:
+            progress = ProgressBar().render
+        self.progress = progress
+        self.done_call = done_call
+        self.tk_widget = tk_widget
+        self.queue = queue.Queue() if tk_widget is not None else None
+        self.thread = None
+        self.done = False
+        self.error = None
+
+    def start(self):
+        """ Start export on worker thread
+        :returns: self
+        """
+        SlTrace.lg(f"Exporting {self.format} {self.image.size} to {self.name}", "export")
+        self.thread = threading.Thread(target=self.run, daemon=True,
+                                       name="ImageExport")
+        self.thread.start()
+        if self.tk_widget is not None:
+            self.tk_widget.after(self.POLL_MS, self.poll)
+        return self
+
+    def wait(self, timeout=None):
+        """ Wait for worker to finish
+        :returns: True if finished
+        """
+        if self.thread is not None:
+            self.thread.join(timeout)
+        return self.done
+
+    def report(self, percent, message):
+        if self.queue is not None:
+            self.queue.put(("progress", percent, message))
+        else:
+            self.progress(percent, message)
+
+    def finish(self):
+        if self.queue is not None:
+            self.queue.put(("done", None, None))
+        else:
+            self.report_done()
+
+    def report_done(self):
+        if self.error is not None:
+            SlTrace.lg(f"Export of {self.name} failed: {self.error}")
+        else:
+            SlTrace.lg(f"Image file saved in {os.path.abspath(self.name)}")
+        if self.done_call is not None:
+            self.done_call(self)
+
+    def poll(self):
+        """ Pass queued progress to progress / done calls, on Tk thread
+        """
+        while True:
+            try:
+                kind, percent, message = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "done":
+                self.report_done()
+                return
+            self.progress(percent, message)
+        self.tk_widget.after(self.POLL_MS, self.poll)
+
+    def get_save_params(self):
+        """ PIL save parameters, for format
+        """
+        params = {}
+        if self.format == "PNG":
+            params["compress_level"] = self.compress_level
+        elif self.format in ("JPEG", "WEBP") and self.quality is not None:
+            params["quality"] = self.quality
+        return params
+
+    def run(self):
+        """ Encode and write files - worker thread
+        """
+        try:
+            image = self.image
+            if self.format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            raw_bytes = image.width*image.height*len(image.getbands())
+            base_name = os.path.basename(self.name)
+            self.report(0, f"{base_name}: encoding")
+
+            def report_bytes(nbytes):
+                # Compressed size unknown - estimate from raw size
+                percent = min(int(100*nbytes/max(raw_bytes/2, 1)), 95)
+                self.report(percent, f"{base_name}: {nbytes/(1<<20):.1f} MB")
+
+            def write_image(fout):
+                if self.format == "MAPTILES":
+                    TiledMapWriter(image, info=self.info,
+                                   compress_level=self.compress_level,
+                                   progress=lambda percent, message:
+                                       self.report(percent, f"{base_name}: {message}")
+                                   ).write(fout)
+                    return
+                image.save(ProgressWriter(fout, report_bytes),
+                           format=self.format, **self.get_save_params())
+
+            write_atomic(self.name, write_image)
+            if self.info_text is not None:
+                write_atomic(self.info_name,
+                             lambda fout: fout.write(self.info_text.encode()))
+            self.report(100, f"{base_name}: saved")
+        except Exception as e:
+            self.error = e
+        self.image = None           # Release snapshot
+        self.done = True
+        self.finish()
@@ -6,12 +6,16 @@ transfer of these overlays to the image for saving
 """
 from math import ceil, sqrt
 import os
+import numpy as np
 from PIL import ImageFont
 
 from select_trace import SlTrace
 from select_error import SelectError
 from compass_rose import CompassRose
 from GeoDraw import GeoDraw, geoUnitLen
+from trail_clean import TrailCleanRules, geo_distances
+from survey_trail_stats import spacing_buckets, SPACING_COLORS
+from display_list import DisplayList, IMAGE_ATTRS
 
 class ImageOverDraw:
     
@@ -27,6 +31,8 @@ class ImageOverDraw:
         self.to_image = to_image
         self.trail_title_tag = None     # trail display tags
         self.trail_tags = []            # trail display tags
+        self.display_list = DisplayList()   # Canvas overlay items, for replay
+        self.image_fonts = {}           # Image fonts by size
         
     def get_geoDraw(self):
         """ access to geoDraw
@@ -98,6 +104,38 @@ class ImageOverDraw:
     def set_to_image(self, to_image=True):
         self.to_image = to_image
 
+    def image_font(self, font):
+        """ Image font, for canvas font
+        :font: canvas font e.g. ("tahoma", 16), None - default
+        :returns: ImageFont, sized for the image
+        """
+        size = 10
+        if isinstance(font, tuple) and len(font) > 1:
+            size = abs(int(font[1]))
+        size = max(int(self.image_line_width(size)), 1)
+        if size not in self.image_fonts:
+            try:
+                self.image_fonts[size] = ImageFont.truetype("arial.ttf", size=size)
+            except OSError:
+                self.image_fonts[size] = ImageFont.load_default()
+        return self.image_fonts[size]
+
+    def replay_to_image(self):
+        """ Put canvas overlays into the map image e.g. for saving
+        The display list is replayed, as recorded, onto the GeoDraw
+        overlay layer - no overlay geometry is recomputed
+        The layer is cleared first, so it holds only the current overlays
+        """
+        gD = self.get_geoDraw()
+        sc = self.get_sc()
+        def xform(coords):
+            return [sc.canvas_to_image(xY) for xY in coords]
+        SlTrace.lg(f"replay_to_image: {len(self.display_list)} items", "iodraw")
+        gD.clearLayer("overlay")
+        gD.onLayer("overlay", self.display_list.replay, gD, xform=xform,
+                   scale=self.image_line_width(1), font_fun=self.image_font,
+                   attrs_ok=IMAGE_ATTRS)
+
     def addTrail(self, trail_in, title=None, color_code=False,color="orange",
                  keep_outside=True,
                  width=3.):
@@ -121,7 +159,8 @@ class ImageOverDraw:
         for track in trail.get_segments():
             points = track.get_points()
             if color_code:
-                return self.addTrail_color_code(points)
+                self.addTrail_color_code(points, stats=track.get_stats())
+                continue
             
             line_width = int(self.meterToPixel(width))
             line_points = []
@@ -133,32 +172,32 @@ class ImageOverDraw:
                         fill=color)
         return True
             
-    def addTrail_color_code(self, points):
+    def addTrail_color_code(self, points, stats=None):
         """ Do map with color coded line segments
-        :points:
-        :title:
-        """
-        prev_point = None
-        for i, point in enumerate(points):
-            if prev_point is not None:
-                line_len = abs(self.geoDist(prev_point.latLong(), point.latLong()))
-                line_color = None
-                if line_len > 100:
-                    line_color = "red"
-                    SlTrace.lg(f"point {i+1}: {point} is at a distance {line_len:.1f}m")
-                elif line_len > 20:
-                    line_color = "blue"
-                elif line_len > 10:
-                    line_color = "green"
-                elif line_len > 5:
-                    line_color = "yellow"
-                if line_len > self.max_dist_allowed:
-                    SlTrace.lg(f"Ignoring Suspicious line {i+1}:"
-                               f" {prev_point} to {point} as being too long: {line_len:.1f}m")
-                    line_color = "red"
-                else:
-                    self.addTrailLine(prev_point, point, color=line_color)
-            prev_point = point
+        :points: trail segment points
+        :stats: segment statistics (SegmentStats) for these points, if known
+                default: calculate distances
+        """
+        if stats is not None:
+            dists = stats.get_dists()
+        else:
+            npts = len(points)
+            dists = geo_distances(
+                    np.fromiter((pt.lat for pt in points), dtype=np.float64, count=npts),
+                    np.fromiter((pt.long for pt in points), dtype=np.float64, count=npts))
+        buckets = spacing_buckets(dists)
+        for i in range(1, len(points)):
+            prev_point = points[i-1]
+            point = points[i]
+            line_len = dists[i-1]
+            line_color = SPACING_COLORS[buckets[i-1]]
+            if line_color == "red":
+                SlTrace.lg(f"point {i+1}: {point} is at a distance {line_len:.1f}m")
+            if line_len > self.max_dist_allowed:
+                SlTrace.lg(f"Ignoring Suspicious line {i+1}:"
+                           f" {prev_point} to {point} as being too long: {line_len:.1f}m")
+            else:
+                self.addTrailLine(prev_point, point, color=line_color)
         return True
 
     
@@ -260,73 +299,23 @@ class ImageOverDraw:
         self.lineSeg(latLong=(p1.lat,p1.long), latLong2=(p2.lat,p2.long), width=int(line_width),
                      fill=color)
 
-    def cleanTrail(self, trail_in, keep_outside=True):
+    def cleanTrail(self, trail_in, keep_outside=True, rules=None):
         """ Adjust initial points to most likely to be valid measurements
             Assemble trail stats
-            1. Throw any points outside border
+            Done by geoDraw, whose image gives the map border
             :trail_in: raw trail info (SurveyTrail)
             :keep_outside: Keep points even if outside region
                 or further back than self.max_dist_allowed
                 False: skip points outside region
                 default: keep
-        """
-        return trail_in  # For now - no changes
-        '''
-        trail = SurveyTrail()
-        n_diff = 0              # Number of distances (n good pts - 1)
-        n_outside = 0
-        dist_sum = 0.
-        max_dist = None
-        min_dist = None
-        points_len = len(points_in)
-        for i, point in enumerate(points_in):
-            if not self.is_inside(latLong=point.latLong()):
-                n_outside += 1
-                SlTrace.lg(f"Questioning point {i+1}: {point} as outside border", "clean_trail")
-                if not keep_outside:
-                    continue    # Skip point outside border
-            if i == 0 and len(points_in) > 1:
-                p1_ll = points_in[i].latLong()
-                p2_ll = points_in[i+1].latLong()
-                dist = abs(self.geoDist(p1_ll, p2_ll))
-                if dist > self.max_dist_allowed:
-                    n_outside += 1
-                    SlTrace.lg(f"Questioning point {i+1}: {point} as too far")
-                    if not keep_outside:
-                        continue
-            point_prev = points[-1] if len(points) > 0 else None
-            check_prev = True if point_prev is not None else False
-            if i >= points_len-1:
-                check_next = False
-            else:
-                check_next = True
-                point_next = points_in[i+1]
-            if check_prev:
-                dist_prev = abs(self.geoDist(point_prev.latLong(), point.latLong()))
-                dist = dist_prev
-            if check_next:
-                dist_next = abs(self.geoDist(point.latLong(), point_next.latLong()))
-                dist = dist_next
-            if check_prev and check_next:
-                dist = max(dist_prev, dist_next)
-            points.append(point)
-            if check_prev:
-                n_diff += 1
-            if min_dist is None or dist < min_dist:
-                min_dist = dist
-            if max_dist is None or dist > max_dist:
-                max_dist = dist
-            dist_sum += dist            
-        SlTrace.lg("Trail Statistics")
-        SlTrace.lg(f"Number of points: {len(points_in)}")
-        SlTrace.lg(f"Number of displayed points: {len(points)}")
-        avg_dist = 0 if n_diff == 0 else dist_sum/n_diff
-        if len(points) > 0:
-            SlTrace.lg(f"minimum distance: {min_dist:.1f}m maximum distance: {max_dist:.1f}m average: {avg_dist:.2f}m")
-            SlTrace.lg(f"Total path distance: {dist_sum:.1f}m") 
-
-        return trail
-        '''
+            :rules: cleaning rules (TrailCleanRules)
+                default: from max_dist_allowed, keep_outside
+            :returns: cleaned trail (CleanedTrail)
+        """
+        if rules is None:
+            rules = TrailCleanRules(max_dist_allowed=self.max_dist_allowed,
+                                    keep_outside=keep_outside)
+        return self.get_geoDraw().cleanTrail(trail_in, rules=rules)
  
     def drawLineSeg(self, xY=None, xYFract=None, pos=None, latLong=None,
                 xY2=None, xYFract2=None, pos2=None, latLong2=None,
@@ -373,7 +362,7 @@ class ImageOverDraw:
         """ 
         """
         if self.trail_title_tag is not None:
-            self.get_sc().delete_tag(self.trail_title_tag)
+            self.delete_tag(self.trail_title_tag)
             self.trail_title_tag = None
         if xY is None:
             xY = (self.getWidth()*.1, self.getHeight()*.05)
@@ -395,8 +384,11 @@ class ImageOverDraw:
                                      **kwargs)
 
     def delete_tag(self, tag):
-        """ delete canvas tag
+        """ delete canvas tag, and its display list item
         """
+        item = self.display_list.remove(tag)
+        if item is not None:
+            tag = item.canvas_tag       # Current canvas item(s)
         self.get_sc().delete_tag(tag)
 
 
@@ -445,7 +437,10 @@ class ImageOverDraw:
             return geoDraw.drawCircle(xY=xY, radius=radius, color=color, **kwargs)
         else:
             sc = self.get_sc()
-            return sc.drawCircle(xY=xY, radius=radius, color=color, **kwargs)
+            tag = sc.drawCircle(xY=xY, radius=radius, color=color, **kwargs)
+            self.display_list.add(tag, "circle", [xY], radius=radius,
+                                  color=color, attrs=kwargs)
+            return tag
 
 
             
@@ -585,6 +580,8 @@ class ImageOverDraw:
         sc = self.get_sc()
         tag = sc.drawLine(*apoints,
             color=color, width=width, **kwargs)
+        self.display_list.add(tag, "line", apoints, color=color, width=width,
+                              attrs=kwargs)
         return tag
 
 
@@ -607,6 +604,9 @@ class ImageOverDraw:
         sc = self.get_sc()
         tag = sc.drawPolygon(*apoints,
             color=color, **kwargs)
+        kwargs.pop('fill', None)            # color is recorded
+        self.display_list.add(tag, "polygon", apoints, color=color,
+                              attrs=kwargs)
         return tag
 
         
@@ -633,7 +633,8 @@ class ImageOverDraw:
             text_tag = sc.drawText(xY, text,
                                    font=font,
                                    color=color, **kwargs)
-            
+            self.display_list.add(text_tag, "text", [xY], text=text, font=font,
+                                  color=color, attrs=kwargs)
             return text_tag
         
         
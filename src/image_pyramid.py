@@ -0,0 +1,76 @@
+# image_pyramid.py    19Oct2026  crs
+"""
+Downsample pyramid of an image, for fast display resizing
+
+Level 0 is the image, each further level half the size of the one
+before, made on first use with Image.reduce(2).  A display size is
+resized from the smallest level still at least that size, so a window
+resize touches a few hundred thousand pixels rather than the full
+resolution map.  The most recent sized image is kept, so repeated
+requests for the same size cost nothing.
+"""
+from PIL import Image
+
+from select_trace import SlTrace
+
+
+class ImagePyramid:
+    def __init__(self, image, min_size=64, resample=None):
+        """ Setup pyramid
+        :image: full resolution image
+        :min_size: no level is made smaller than this, in either dimension
+                default: 64 pixels
+        :resample: resize filter default: Image.BILINEAR
+        """
+        if resample is None:
+            resample = Image.BILINEAR
+        self.image = image
+        self.min_size = min_size
+        self.resample = resample
+        base = image
+        if base.mode not in ("L", "RGB", "RGBA"):
+            base = base.convert("RGBA")     # e.g. "P" - reduce averages pixels
+        self.levels = [base]
+        self.sized = None           # Most recent sized image
+        self.sized_size = None
+
+    def is_for(self, image):
+        """ Check if pyramid is of this image (same object)
+        """
+        return self.image is image
+
+    def get_level(self, size):
+        """ Smallest level at least size, making levels as needed
+        :size: (width, height)
+        :returns: level image
+        """
+        width, height = size
+        level = self.levels[0]
+        for lev in self.levels[1:]:
+            if lev.width < width or lev.height < height:
+                return level
+            level = lev
+        while (level.width//2 >= max(width, self.min_size)
+               and level.height//2 >= max(height, self.min_size)):
+            level = level.reduce(2)
+            self.levels.append(level)
+            SlTrace.lg(f"ImagePyramid: level {len(self.levels)-1}"
+                       f" {level.width}x{level.height}", "resize")
+        return level
+
+    def get_sized(self, size):
+        """ Image resized for display
+        :size: (width, height)
+        :returns: image of size
+        """
+        size = (max(int(size[0]), 1), max(int(size[1]), 1))
+        if self.sized is not None and self.sized_size == size:
+            return self.sized
+        level = self.get_level(size)
+        if level.size == size:
+            sized = level
+        else:
+            sized = level.resize(size, self.resample)
+        self.sized = sized
+        self.sized_size = size
+        return sized
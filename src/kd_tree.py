@@ -0,0 +1,208 @@
+# kd_tree.py    19Oct2026  crs
+"""
+Static 2-d KD-tree, with queries for many points at once
+
+The tree is kept in arrays: per node bounding box and children, with
+leaf buckets of up to leaf_size points.  Queries are run for all query
+points together: each query first descends to the leaf containing it,
+giving an initial bound, then the (query, node) pairs still able to
+hold a closer point are expanded a tree level at a time, as numpy
+array operations.
+"""
+import numpy as np
+
+from select_error import SelectError
+
+
+class KDTree:
+    def __init__(self, points, leaf_size=16):
+        """ Build tree
+        :points: array (n x 2) of x,y
+        :leaf_size: maximum points in a leaf default: 16
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if leaf_size < 1:
+            raise SelectError(f"KDTree leaf_size must be positive: {leaf_size}")
+        self.points = points
+        self.leaf_size = leaf_size
+        self.perm = np.arange(len(points))
+        self.lo = []            # Node bounding box
+        self.hi = []
+        self.left = []          # Children, -1 for leaf
+        self.right = []
+        self.split_dim = []
+        self.split_val = []
+        self.start = []         # Leaf points: perm[start:end]
+        self.end = []
+        if len(points) > 0:
+            self._build(0, len(points))
+        self.lo = np.array(self.lo).reshape(-1, 2)
+        self.hi = np.array(self.hi).reshape(-1, 2)
+        self.left = np.array(self.left, dtype=np.int64)
+        self.right = np.array(self.right, dtype=np.int64)
+        self.split_dim = np.array(self.split_dim, dtype=np.int64)
+        self.split_val = np.array(self.split_val)
+        self.start = np.array(self.start, dtype=np.int64)
+        self.end = np.array(self.end, dtype=np.int64)
+        self.is_leaf = self.left < 0
+        # Leaf buckets, padded with -1
+        nnodes = len(self.left)
+        self.bucket = np.full((nnodes, leaf_size), -1, dtype=np.int64)
+        for node in np.nonzero(self.is_leaf)[0]:
+            idxs = self.perm[self.start[node]:self.end[node]]
+            self.bucket[node, :len(idxs)] = idxs
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, start, end):
+        """ Build node for perm[start:end]
+        :returns: node number
+        """
+        node = len(self.left)
+        pts = self.points[self.perm[start:end]]
+        self.lo.append(pts.min(axis=0))
+        self.hi.append(pts.max(axis=0))
+        self.left.append(-1)
+        self.right.append(-1)
+        self.split_dim.append(0)
+        self.split_val.append(0.)
+        self.start.append(start)
+        self.end.append(end)
+        if end - start <= self.leaf_size:
+            return node
+
+        dim = int(np.argmax(self.hi[node] - self.lo[node]))
+        mid = (end - start)//2
+        order = np.argpartition(pts[:, dim], mid)
+        self.perm[start:end] = self.perm[start:end][order]
+        self.split_dim[node] = dim
+        self.split_val[node] = self.points[self.perm[start+mid], dim]
+        self.left[node] = self._build(start, start+mid)
+        self.right[node] = self._build(start+mid, end)
+        return node
+
+    def _bbox_dist2(self, qpts, nodes):
+        """ Squared distance from query points to node bounding boxes
+        """
+        d = np.maximum(self.lo[nodes] - qpts, 0.) + np.maximum(qpts - self.hi[nodes], 0.)
+        return (d*d).sum(axis=1)
+
+    def _leaf_of(self, qpts):
+        """ Leaf containing (or nearest by splits) each query point
+        """
+        nodes = np.zeros(len(qpts), dtype=np.int64)
+        active = ~self.is_leaf[nodes]
+        while active.any():
+            an = nodes[active]
+            go_left = qpts[active, self.split_dim[an]] < self.split_val[an]
+            nodes[active] = np.where(go_left, self.left[an], self.right[an])
+            active = ~self.is_leaf[nodes]
+        return nodes
+
+    def _leaf_candidates(self, qidx, qpts, nodes):
+        """ All (query, point, dist2) for points in leaves
+        """
+        cand = self.bucket[nodes]                       # (npairs x leaf_size)
+        qq = np.repeat(qidx, self.leaf_size)
+        ii = cand.ravel()
+        valid = ii >= 0
+        qq = qq[valid]
+        ii = ii[valid]
+        diff = self.points[ii] - qpts[qq]
+        return qq, ii, (diff*diff).sum(axis=1)
+
+    @staticmethod
+    def _merge_best(best_d2, best_i, qq, ii, dd):
+        """ Merge candidates into per query k best lists
+        """
+        k = best_d2.shape[1]
+        uq = np.unique(qq)
+        qq = np.concatenate([qq, np.repeat(uq, k)])
+        ii = np.concatenate([ii, best_i[uq].ravel()])
+        dd = np.concatenate([dd, best_d2[uq].ravel()])
+        order = np.lexsort((dd, qq))
+        qq, ii, dd = qq[order], ii[order], dd[order]
+        first = np.searchsorted(qq, qq, side="left")
+        rank = np.arange(len(qq)) - first
+        keep = rank < k
+        best_d2[qq[keep], rank[keep]] = dd[keep]
+        best_i[qq[keep], rank[keep]] = ii[keep]
+
+    def query(self, qpts, k=1):
+        """ k nearest points
+        :qpts: array (m x 2) of query x,y
+        :k: number of neighbors default: 1
+        :returns: dists (m x k), idxs (m x k) sorted nearest first,
+                inf / -1 where fewer than k points
+        """
+        qpts = np.asarray(qpts, dtype=np.float64).reshape(-1, 2)
+        m = len(qpts)
+        best_d2 = np.full((m, k), np.inf)
+        best_i = np.full((m, k), -1, dtype=np.int64)
+        if m == 0 or len(self.points) == 0:
+            return np.sqrt(best_d2), best_i
+
+        qidx = np.arange(m)
+        home = self._leaf_of(qpts)
+        qq, ii, dd = self._leaf_candidates(qidx, qpts, home)
+        self._merge_best(best_d2, best_i, qq, ii, dd)
+
+        fq = qidx
+        fn = np.zeros(m, dtype=np.int64)
+        while len(fq) > 0:
+            keep = self._bbox_dist2(qpts[fq], fn) < best_d2[fq, -1]
+            fq = fq[keep]
+            fn = fn[keep]
+            leaf = self.is_leaf[fn]
+            lq = fq[leaf]
+            ln = fn[leaf]
+            not_home = ln != home[lq]           # Already done
+            if not_home.any():
+                qq, ii, dd = self._leaf_candidates(lq[not_home], qpts, ln[not_home])
+                self._merge_best(best_d2, best_i, qq, ii, dd)
+            iq = fq[~leaf]
+            inn = fn[~leaf]
+            fq = np.concatenate([iq, iq])
+            fn = np.concatenate([self.left[inn], self.right[inn]])
+        return np.sqrt(best_d2), best_i
+
+    def query_radius(self, qpts, radius):
+        """ All points within radius
+        :qpts: array (m x 2) of query x,y
+        :radius: distance, or array of m distances
+        :returns: (query index, point index, distance) arrays
+                of all pairs within radius, ordered by query then distance
+        """
+        qpts = np.asarray(qpts, dtype=np.float64).reshape(-1, 2)
+        m = len(qpts)
+        r2 = np.broadcast_to(np.asarray(radius, dtype=np.float64), (m,))**2
+        res_q = []
+        res_i = []
+        res_d = []
+        fq = np.arange(m) if len(self.points) > 0 else np.zeros(0, dtype=np.int64)
+        fn = np.zeros(len(fq), dtype=np.int64)
+        while len(fq) > 0:
+            keep = self._bbox_dist2(qpts[fq], fn) <= r2[fq]
+            fq = fq[keep]
+            fn = fn[keep]
+            leaf = self.is_leaf[fn]
+            if leaf.any():
+                qq, ii, dd = self._leaf_candidates(fq[leaf], qpts, fn[leaf])
+                inside = dd <= r2[qq]
+                res_q.append(qq[inside])
+                res_i.append(ii[inside])
+                res_d.append(dd[inside])
+            iq = fq[~leaf]
+            inn = fn[~leaf]
+            fq = np.concatenate([iq, iq])
+            fn = np.concatenate([self.left[inn], self.right[inn]])
+        if len(res_q) == 0:
+            return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                    np.zeros(0))
+
+        qq = np.concatenate(res_q)
+        ii = np.concatenate(res_i)
+        dd = np.concatenate(res_d)
+        order = np.lexsort((dd, qq))
+        return qq[order], ii[order], np.sqrt(dd[order])
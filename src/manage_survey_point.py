@@ -14,9 +14,11 @@ from tkinter.filedialog import asksaveasfilename
 from select_trace import SlTrace
 from select_error import SelectError
 from survey_trail import SurveyTrail
+from edit_history import EditHistory, MovePointEdit, RemovePointEdit
 from survey_scale import SurveyMapScale
 from point_place import PointPlace
 from survey_point import SurveyPoint                
+from survey_point_store import PointStore
 from tracking_control import TrackingControl
 from canvas_coords import CanvasCoords
 from GoogleMapImage import GoogleMapImage
@@ -34,6 +36,7 @@ class PointSelection:
         self.selected_points = []   # selected points if any
     
 class SurveyPointManager:
+    ROTATE_SETTLE = 300         # msec, after last rotation request, full rotate
     """ Manipulate a list of points (SurveyPoint)
     """
     def __init__(self, scanvas,
@@ -67,6 +70,9 @@ class SurveyPointManager:
         self.trail_segment = None           # Currently processed trail segment
         self.mapped_regions = []            # canvases of regions displayed
         self.mapped_regions.append(scanvas) # [0] base region
+        self.rotate_after = None            # Pending full rotation, if any
+        self.rotate_to = None               # Pending rotation, deg
+        self.rotate_expand = None
         if label is None:
             label = "P" 
         self.label = label
@@ -94,6 +100,7 @@ class SurveyPointManager:
         if point_id is None:
             point_id = 0
         self.point_id = point_id
+        self.point_store = PointStore()     # Columnar point attributes
         self.reset_points()
         self.track_sc = False           # Set True if tracking
         if track_sc:
@@ -101,8 +108,10 @@ class SurveyPointManager:
         self.in_point = None            # Set to point we're in, if any
         self.in_point_start = None      # Set to starting x,y
         self.in_point_is_down = False   # Set True while mouse is down
+        self.in_point_orig = None       # Set to point's lat, long at mouse down
         self.doing_mouse_motion = False # Suppress multiple concurrent moves
         self.unit = unit
+        self.history = EditHistory(self)    # Undo / redo of edits
         self.tr_ctl = TrackingControl(self)
         self.point_lists = {}           # Dictionary of point list e.g. SampleFile, GPXFile
         self.scales = {}
@@ -246,6 +255,7 @@ class SurveyPointManager:
         region_gmi = GoogleMapImage(ulLat=max_lat, ulLong=min_long,
                            lrLat=min_lat, lrLong=max_long,
                            mapRotate=region_bearing,
+                           clipPoints=region_pts,
                            zoom=zoom)
         region_sc = scrolled_canvas.ScrolledCanvas(title=title,
                             pt_mgr=self,          # All with common pt_mgr
@@ -263,7 +273,8 @@ class SurveyPointManager:
             gpx = trail_selection.point_list
             title = trail_selection.title
             trail_points = gpx.get_points()
-            inside_points = region.get_inside_points(trail_points)
+            inside_points = region.get_layer_points("trails", trail_points,
+                                                    version=gpx.get_version())
             trail_selection.inside_points = inside_points
             region_sc.gmi.addTrail(gpx, title=None)
         SlTrace.lg(f"Region bearing: {region_bearing:.2f}")
@@ -276,9 +287,34 @@ class SurveyPointManager:
 
     def rotate_map(self, deg=None, incr=False, expand=None):
         """ Interactively rotate map in main display
+        A low resolution preview is shown at once, the full map
+        is rotated after requests stop for ROTATE_SETTLE msec
         """
+        gD = self.get_geoDraw()
+        if self.rotate_after is not None:
+            self.sc.after_cancel(self.rotate_after)
+            from_deg = self.rotate_to
+        else:
+            from_deg = gD.get_mapRotate()
+        if deg is None:
+            to_deg = from_deg
+        elif incr:
+            to_deg = from_deg + deg
+        else:
+            to_deg = deg
+        self.rotate_to = to_deg % 360
+        self.rotate_expand = expand
+        self.sc.show_preview(gD.rotatePreview(self.rotate_to, incr=False,
+                                              expand=expand))
+        self.rotate_after = self.sc.after(self.ROTATE_SETTLE, self.rotate_map_settled)
+
+    def rotate_map_settled(self):
+        """ Do full quality rotation, to the most recently requested angle
+        """
+        self.rotate_after = None
         gmi = self.get_gmi()
-        image = gmi.rotateMap(deg=deg, incr=incr, expand=expand)
+        image = gmi.rotateMap(deg=self.rotate_to, incr=False,
+                              expand=self.rotate_expand)
         self.sc.update_image(image)
         self.sc.size_image_to_canvas()
         self.sc.mark_canvas()
@@ -288,7 +324,15 @@ class SurveyPointManager:
         """ Put up previous map state
         """
         gD = self.get_geoDraw()
-        gD.popMap()
+        if not gD.popMapState():
+            SlTrace.report("No previous map")
+            return False
+        
+        self.sc.update_image(gD.image)
+        self.sc.size_image_to_canvas()
+        self.sc.mark_canvas()
+        self.redisplay()
+        return True
                     
     def expand_region(self):
         """ expand most recently created region, if one, to
@@ -325,6 +369,7 @@ class SurveyPointManager:
         if not SlTrace.trace("keep_enlarge_region"):
             self.remove_points(region.get_points()) # Of no use and clutter drawing
         self.tr_ctl.restart_region()
+        gD.pushMapState()           # For previous_map
         new_image = gD.expandRegion(ul_xy, lr_xy)
         self.sc.update_image(new_image)
         self.sc.size_image_to_canvas()
@@ -373,7 +418,8 @@ class SurveyPointManager:
             gpx = trail_selection.point_list
             title = trail_selection.title
             trail_points = gpx.get_points()
-            inside_points = region.get_inside_points(trail_points)
+            inside_points = region.get_layer_points("trails", trail_points,
+                                                    version=gpx.get_version())
             trail_selection.inside_points = inside_points
             region_sc.gmi.addTrail(gpx, title=None)
         SlTrace.lg(f"Region bearing: {region_bearing:.2f}")
@@ -408,6 +454,7 @@ class SurveyPointManager:
             self.in_point_is_down = True
             self.in_point = point
             self.in_point_start = (pc_lat, pc_long)  # ref for movement
+            self.in_point_orig = (point.lat, point.long)
         else:
             point = self.make_point(lat=pc_lat, long=pc_long)
  
@@ -439,8 +486,39 @@ class SurveyPointManager:
         """
         _ = canvas_x            # uused
         _ = canvas_y            # unused
+        point = self.in_point
+        if (point is not None and self.in_point_orig is not None
+                and (point.lat, point.long) != self.in_point_orig):
+            self.point_moved(point, self.in_point_orig)
         self.in_point = None
         self.in_point_is_down = False
+        self.in_point_orig = None
+
+    def point_moved(self, point, orig):
+        """ Record completed point move (end of drag)
+        One undo step for the whole drag
+        :point: point moved
+        :orig: (lat, long) before move
+        """
+        self.record_edit(MovePointEdit(point, orig, (point.lat, point.long)))
+        if self.trail is not None:
+            self.trail.journal_move(point)
+
+    def record_edit(self, edit):
+        """ Record edit for undo / redo
+        :edit: edit record (PointEdit)
+        """
+        self.history.record(edit)
+
+    def undo(self):
+        """ Undo most recent edit
+        """
+        self.history.undo()
+
+    def redo(self):
+        """ Redo most recently undone edit
+        """
+        self.history.redo()
         
     def mouse_motion(self, canvas_x, canvas_y):
         """ Capture/process mouse move in canvas
@@ -503,6 +581,8 @@ class SurveyPointManager:
         for pt in self.points:
             pt.delete()
         self.reset_points()
+        self.history.clear()
+        self.compact_point_store()
 
     def canvas_create_circle(self, xY, radius=None, **kwargs):
         """ create circle on canvas
@@ -584,6 +664,8 @@ class SurveyPointManager:
         if self.trail is not None:    
             self.trail.delete()
             self.trail = None
+            self.history.clear()        # Edits refer to removed trail
+            self.compact_point_store()
             self.trail_segment = None
             self.tr_ctl.trail = None        # Synchronize with tracking
             self.tr_ctl.trail_segment = None
@@ -614,6 +696,7 @@ class SurveyPointManager:
                 initialfile=initialfile,
                 title = "New Map File",
                 filetypes= (("Map files", "*.png"),
+                            ("Tiled map files", "*.maptiles"),
                             ("all files", "*.*"))
                            )
             if mapfile is None:
@@ -624,7 +707,7 @@ class SurveyPointManager:
 
         SlTrace.lg(f"Saving mapfile: {mapfile}")
         
-        gmi.save(name=mapfile)
+        gmi.saveAsync(name=mapfile, tk_widget=self.sc)  # Encoded in background
         
     def save_trail_file(self, trailfile=None):
         """ Save updated trail file (From get_point_list("trails")
@@ -658,14 +741,12 @@ class SurveyPointManager:
         """ Set image, in preparation to save completed graphics file
         In genera, copy objects like trails which are canvas based objects to
         the image
+        The overlays' display list is replayed onto the image, no
+        points / trails are re-walked
         """
-        self.iodraw.set_to_image(True)
-        
-        self.redisplay()
+        self.iodraw.replay_to_image()
         self.get_sc().raise_image()
         
-        self.iodraw.set_to_image(False)
-        
     def get_canvas(self):
         """ Get Canvas type object
         """
@@ -683,6 +764,36 @@ class SurveyPointManager:
             
         return None
     
+    def get_point_store(self):
+        """ Get columnar point storage (PointStore)
+        """
+        return self.point_store
+
+    def compact_point_store(self):
+        """ Replace point store with one holding just our points and
+        trail points, dropping released and deleted points' slots
+        e.g. after the points are cleared or the trail is replaced,
+        when edit history, the only user of released slots, is cleared.
+        Other points (e.g. temporary points) keep the old store, freed
+        with them.
+        """
+        old_store = self.point_store
+        store = PointStore(capacity=len(self.points))
+        points = list(self.points)
+        if self.trail is not None:
+            points.extend(self.trail.get_points())
+        for point in points:
+            if point.store is old_store and not old_store.is_released(point.idx):
+                point.idx = store.copy_point(old_store, point.idx)
+                point.store = store
+        self.point_store = store
+        if self.trail is not None:
+            for segment in self.trail.get_segments():
+                for point in segment.get_points():
+                    segment.track_point(point)      # Group in new store
+        SlTrace.lg(f"compact_point_store: {len(old_store)} to {len(store)} points",
+                   "point_store")
+        
     def get_points(self):
         """ Get our points
         :returns: our point list
@@ -697,6 +808,9 @@ class SurveyPointManager:
     def get_mapRotate(self):
         """ Get current map rotation 0<= deg < 360
         """
+        if self.rotate_after is not None:
+            return self.rotate_to           # Rotation in progress
+        
         gmi = self.get_gmi()
         if gmi is None:
             return 0
@@ -1073,10 +1187,23 @@ class SurveyPointManager:
                     self.remove_point_tracking(pt)
                     del self.points[idx]
                     pt.delete()
-                    break
-            return pt
+                    pt.store.release(pt.idx)
+                    self.record_edit(RemovePointEdit(pt, idx))
+                    return pt
             
         return None
+
+    def restore_point(self, point, index=None):
+        """ Restore removed point e.g. undoing remove_point
+        :point: point removed
+        :index: index in point list default: end
+        """
+        if index is None or index > len(self.points):
+            index = len(self.points)
+        self.points.insert(index, point)
+        self.points_by_label[point.label.lower()] = point
+        point.store.restore(point.idx)
+        point.display()
     
     def remove_points(self, points):
         """ Remove given points
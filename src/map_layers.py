@@ -0,0 +1,249 @@
+# map_layers.py    19Oct2026  crs
+"""
+Layer stack for map annotation - each layer a cached RGBA raster
+
+The base map is kept unchanged, below a stack of transparent RGBA
+layers (density, trail, sample, annotation, overlay, scale by default).  Each
+layer keeps the drawing operations (ops) which made it, so a layer can
+be cleared, or re-rendered (e.g. when the map geometry changes) without
+touching the others.  New ops are drawn onto a clean layer's raster as
+they are added; only dirty layers are re-rendered from their ops.
+The overlay layers are merged into one cached raster, rebuilt only when
+a layer changes, so the final map image is a single alpha_composite of
+the base and the merged layers.
+
+Op lists are bounded.  An op added with a key replaces the layer's op
+with that key (e.g. redrawing a trail, or a new density overlay), rather
+than adding to it.  When a layer holds more than max_ops ops, its
+rendered raster is kept (baked) and its ops dropped, as for a
+transform, so ops, and the arguments they hold, don't pile up.
+"""
+from PIL import Image
+
+from select_trace import SlTrace
+from select_error import SelectError
+
+LAYER_NAMES = ("density", "trail", "sample", "annotation", "overlay", "scale")
+
+
+class MapLayer:
+    def __init__(self, name):
+        """ Layer
+        :name: layer name
+        """
+        self.name = name
+        self.image = None       # Rendered RGBA raster, None if empty
+        self.baked = None       # Raster kept from a transform (e.g. crop)
+        self.ops = []           # (fun, args, kwargs, key) drawing the layer
+        self.dirty = False      # Set if image must be re-rendered from ops
+        self.visible = True
+
+    def is_empty(self):
+        return self.baked is None and len(self.ops) == 0
+
+    def clear(self):
+        self.image = None
+        self.baked = None
+        self.ops = []
+        self.dirty = False
+
+
+class MapLayers:
+    def __init__(self, base=None, names=None, max_ops=None):
+        """ Setup layer stack
+        :base: base map image
+        :names: overlay layer names, bottom to top default: LAYER_NAMES
+        :max_ops: maximum ops kept per layer, before baking
+                default: 1000
+        """
+        if names is None:
+            names = LAYER_NAMES
+        if max_ops is None:
+            max_ops = 1000
+        self.max_ops = max_ops
+        self.layers = {}
+        self.names = list(names)
+        for name in self.names:
+            self.layers[name] = MapLayer(name)
+        self.base = None
+        self.base_rgba = None       # Base converted for compositing
+        self.merged = None          # Merged overlay layers, None if stale
+        self.image = None           # Composite, None if stale
+        if base is not None:
+            self.set_base(base)
+
+    def get_layer(self, name):
+        layer = self.layers.get(name)
+        if layer is None:
+            raise SelectError(f"MapLayers: no layer {name}")
+        return layer
+
+    def size(self):
+        return self.base.size
+
+    def set_base(self, base):
+        """ Set base map, layers are unchanged
+        :base: base map image
+        """
+        self.base = base
+        self.base_rgba = None
+        self.image = None
+
+    def changed(self, name=None):
+        """ Note layer change, invalidating merged / composite images
+        """
+        if name is not None:
+            self.merged = None
+        self.image = None
+
+    def layer_raster(self, name):
+        """ Layer raster, for drawing on, rendered if needed
+        :returns: layer's RGBA image
+        """
+        layer = self.get_layer(name)
+        if layer.image is None and not layer.dirty:
+            layer.image = Image.new("RGBA", self.size(), (0,0,0,0))
+        return layer.image
+
+    def add_op(self, name, fun, args=(), kwargs=None, render=None, key=None):
+        """ Add drawing op to layer
+        :name: layer name
+        :fun: drawing function, called as fun(*args, **kwargs)
+                with render's drawing target set to the layer
+        :render: function(layer_image, fun, args, kwargs) drawing op
+                onto a layer raster, None - just record (layer made dirty)
+        :key: if present, op replaces the layer's op with this key,
+                the layer is then re-rendered
+        """
+        if kwargs is None:
+            kwargs = {}
+        layer = self.get_layer(name)
+        if key is not None:
+            nops = len(layer.ops)
+            layer.ops = [op for op in layer.ops if op[3] != key]
+            if len(layer.ops) != nops:
+                layer.dirty = True      # Replaced op is in raster
+                layer.image = None
+        layer.ops.append((fun, args, kwargs, key))
+        if render is None or layer.dirty:
+            layer.dirty = True
+        else:
+            render(self.layer_raster(name), fun, args, kwargs)
+        self.changed(name)
+        if len(layer.ops) > self.max_ops and render is not None:
+            self.bake_layer(name, render)
+
+    def bake_layer(self, name, render):
+        """ Keep layer's rendered raster, dropping its ops
+        Content drawn by the ops is kept, but is no longer re-rendered
+        (or replaced by key)
+        :render: layer render function, as in add_op, if layer is dirty
+        """
+        layer = self.get_layer(name)
+        self.render(render)
+        SlTrace.lg(f"MapLayers: baked {name} {len(layer.ops)} ops", "map_layers")
+        layer.baked = None if layer.image is None else layer.image.copy()
+        layer.ops = []
+
+    def clear_layer(self, name):
+        """ Remove layer content
+        """
+        self.get_layer(name).clear()
+        self.changed(name)
+
+    def set_visible(self, name, visible=True):
+        layer = self.get_layer(name)
+        if layer.visible != visible:
+            layer.visible = visible
+            self.changed(name)
+
+    def mark_dirty(self, name=None):
+        """ Mark layer(s) for re-rendering e.g. after map geometry changes
+        Layers with content kept from a transform (baked) keep it
+        :name: layer name default: all layers
+        """
+        names = self.names if name is None else [name]
+        for nm in names:
+            layer = self.layers[nm]
+            if not layer.is_empty():
+                layer.dirty = True
+                layer.image = None
+        self.changed(names[0] if names else None)
+
+    def render(self, render):
+        """ Re-render dirty layers from their ops
+        :render: function(layer_image, fun, args, kwargs) as in add_op
+        """
+        for name in self.names:
+            layer = self.layers[name]
+            if not layer.dirty:
+                continue
+            if layer.baked is not None and layer.baked.size == self.size():
+                layer.image = layer.baked.copy()
+            else:
+                layer.image = Image.new("RGBA", self.size(), (0,0,0,0))
+            layer.dirty = False
+            for fun, args, kwargs, _ in layer.ops:
+                render(layer.image, fun, args, kwargs)
+            SlTrace.lg(f"MapLayers: rendered {name} {len(layer.ops)} ops", "map_layers")
+            self.merged = None
+
+    def transform(self, fun, render):
+        """ Apply raster transform (e.g. crop) to base and all layers
+        Layer content becomes baked, its ops, in old image
+        coordinates, no longer replayable
+        :fun: function(image) returning transformed image
+        :render: layer render function, as in add_op, for dirty layers
+        """
+        self.render(render)
+        self.set_base(fun(self.base))
+        for name in self.names:
+            layer = self.layers[name]
+            if layer.image is None:
+                continue
+            layer.image = fun(layer.image)
+            layer.baked = layer.image
+            layer.ops = []
+        self.merged = None
+
+    def get_merged(self):
+        """ Merged visible overlay layers
+        :returns: RGBA image, None if no visible content
+        """
+        if self.merged is not None:
+            return self.merged
+        merged = None
+        for name in self.names:
+            layer = self.layers[name]
+            if not layer.visible or layer.image is None:
+                continue
+            if merged is None:
+                merged = layer.image.copy()
+            else:
+                merged.alpha_composite(layer.image)
+        self.merged = merged
+        return merged
+
+    def composite(self, render):
+        """ Map image - base with visible layers
+        Never the base image itself, so a caller changing the
+        composite can't change the base map
+        :render: layer render function, as in add_op, for dirty layers
+        :returns: image, in the base image's mode
+        """
+        if self.image is not None:
+            return self.image
+        self.render(render)
+        merged = self.get_merged()
+        if merged is None:
+            self.image = self.base.copy()
+            return self.image
+
+        if self.base_rgba is None:
+            self.base_rgba = (self.base if self.base.mode == "RGBA"
+                              else self.base.convert("RGBA"))
+        image = Image.alpha_composite(self.base_rgba, merged)
+        if self.base.mode != "RGBA":
+            image = image.convert(self.base.mode)
+        self.image = image
+        return image
@@ -0,0 +1,73 @@
+# map_state_history.py    19Oct2026  crs
+"""
+Bounded history of map states, for previous_map
+
+Every pushed state keeps its georeference parameters, but full base
+map rasters are kept only within a memory budget (max_bytes), least
+recently used dropped first.  A state whose raster was dropped rebuilds
+it, when popped, from the map's root image and the crop / rotate steps
+which made it (GeoDrawMapState.get_base).
+"""
+from select_trace import SlTrace
+
+
+class MapStateHistory:
+    def __init__(self, max_bytes=None):
+        """ Setup empty history
+        :max_bytes: memory budget for kept rasters
+                default: 256 MB
+        """
+        if max_bytes is None:
+            max_bytes = 256*1024*1024
+        self.max_bytes = max_bytes
+        self.states = []            # Pushed states, oldest first
+        self.lru = []               # States holding rasters, least recent first
+
+    def __len__(self):
+        return len(self.states)
+
+    def raster_bytes(self):
+        return sum(state.raster_bytes() for state in self.lru)
+
+    def push(self, state):
+        """ Add state, dropping rasters as needed for the budget
+        :state: GeoDrawMapState
+        """
+        self.states.append(state)
+        self.touch(state)
+        self.enforce_budget()
+
+    def pop(self):
+        """ Remove most recent state
+        :returns: state, None if none
+        """
+        if len(self.states) == 0:
+            return None
+
+        state = self.states.pop()
+        if state in self.lru:
+            self.lru.remove(state)
+        return state
+
+    def touch(self, state):
+        """ Note state's raster as most recently used
+        """
+        if state in self.lru:
+            self.lru.remove(state)
+        if state.base is not None:
+            self.lru.append(state)
+
+    def enforce_budget(self):
+        """ Drop least recently used rasters while over budget
+        """
+        nbytes = self.raster_bytes()
+        while nbytes > self.max_bytes and len(self.lru) > 0:
+            state = self.lru.pop(0)
+            nbytes -= state.raster_bytes()
+            state.drop_raster()
+            SlTrace.lg(f"MapStateHistory: dropped raster {state.size}"
+                       f" now {nbytes} bytes", "map_state")
+
+    def clear(self):
+        self.states = []
+        self.lru = []
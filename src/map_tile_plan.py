@@ -0,0 +1,139 @@
+# map_tile_plan.py    19Oct2026  crs
+"""
+Plan which map tiles are needed to build a composite map image
+
+A composite image is pasted together from cols x rows fetched tiles.
+When only part of the image will be seen - the inside of a region
+polygon and/or the part of the image remaining after rotation - tiles
+which do not overlap any of the clip polygons are not fetched.
+All coordinates are composite image pixels (x right, y down).
+"""
+from math import cos, sin, radians
+
+from select_trace import SlTrace
+
+
+def point_in_polygon(pt, poly):
+    """ Test if point is inside polygon (even-odd rule)
+    :pt: (x,y)
+    :poly: list of (x,y) vertices, implicitly closed
+    :returns: True if inside
+    """
+    x, y = pt
+    inside = False
+    npts = len(poly)
+    for i in range(npts):
+        x1, y1 = poly[i-1]
+        x2, y2 = poly[i]
+        if (y1 > y) != (y2 > y):
+            x_cross = x1 + (y - y1)*(x2 - x1)/(y2 - y1)
+            if x_cross > x:
+                inside = not inside
+    return inside
+
+
+def _orient(p, q, r):
+    val = (q[0]-p[0])*(r[1]-p[1]) - (q[1]-p[1])*(r[0]-p[0])
+    if val > 0:
+        return 1
+    if val < 0:
+        return -1
+    return 0
+
+
+def segments_intersect(p1, p2, q1, q2):
+    """ Test if line segments p1-p2, q1-q2 intersect (proper crossing)
+    """
+    return (_orient(p1, p2, q1) != _orient(p1, p2, q2)
+            and _orient(q1, q2, p1) != _orient(q1, q2, p2))
+
+
+def polygon_intersects_rect(poly, rect):
+    """ Test if polygon and axis aligned rectangle overlap
+    :poly: list of (x,y) vertices
+    :rect: (x_min, y_min, x_max, y_max)
+    :returns: True if they overlap
+    """
+    x_min, y_min, x_max, y_max = rect
+    for x, y in poly:
+        if x_min <= x <= x_max and y_min <= y <= y_max:
+            return True         # Polygon vertex in rectangle
+
+    corners = [(x_min,y_min), (x_max,y_min), (x_max,y_max), (x_min,y_max)]
+    for corner in corners:
+        if point_in_polygon(corner, poly):
+            return True         # Rectangle in polygon
+
+    for i in range(len(poly)):
+        p1 = poly[i-1]
+        p2 = poly[i]
+        for j in range(4):
+            if segments_intersect(p1, p2, corners[j-1], corners[j]):
+                return True
+    return False
+
+
+def rotation_envelope(width, height, deg):
+    """ Part of an image still visible after it is rotated deg degrees
+    (counter clockwise, as Image.rotate) about its center without expansion
+    :width, height: image size
+    :deg: rotation in degrees
+    :returns: polygon (list of 4 (x,y) corners)
+    """
+    theta = radians(deg)
+    cx, cy = width/2., height/2.
+    envelope = []
+    for x, y in [(0,0), (width,0), (width,height), (0,height)]:
+        dx, dy = x - cx, y - cy
+        envelope.append((cx + cos(theta)*dx - sin(theta)*dy,
+                         cy + sin(theta)*dx + cos(theta)*dy))
+    return envelope
+
+
+class MapTilePlan:
+    """ Tiles needed to compose map image
+    """
+    def __init__(self, cols, rows, tile_width, tile_height, clip_polygons=None):
+        """ Setup plan
+        :cols, rows: number of tile columns, rows
+        :tile_width, tile_height: tile placement spacing in pixels
+        :clip_polygons: list of polygons, each a list of (x,y) pixels.
+                A tile is needed only if it overlaps every polygon
+                default: all tiles needed
+        """
+        if clip_polygons is None:
+            clip_polygons = []
+        self.cols = cols
+        self.rows = rows
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.clip_polygons = clip_polygons
+        self.needed = {}
+        for col in range(cols):
+            for row in range(rows):
+                rect = (col*tile_width, row*tile_height,
+                        (col+1)*tile_width, (row+1)*tile_height)
+                needed = True
+                for poly in clip_polygons:
+                    if not polygon_intersects_rect(poly, rect):
+                        needed = False
+                        break
+                self.needed[(col,row)] = needed
+
+    def is_needed(self, col, row):
+        return self.needed[(col,row)]
+
+    def n_tiles(self):
+        return self.cols*self.rows
+
+    def n_needed(self):
+        return sum(1 for needed in self.needed.values() if needed)
+
+    def n_skipped(self):
+        return self.n_tiles() - self.n_needed()
+
+    def report(self):
+        """ Log plan summary
+        """
+        SlTrace.lg(f"Map tiles: {self.n_tiles()} fetching: {self.n_needed()}"
+                   f" saved: {self.n_skipped()}")
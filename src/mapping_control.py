@@ -298,6 +298,7 @@ class MappingControl(SelectControlWindow):
         self.set_radio_button(frame=map_frame, field="maptype", label="satellite", command=self.change_maptype)
         self.set_radio_button(frame=map_frame, field="maptype", label="hybrid", command=self.change_maptype)
         self.set_radio_button(frame=map_frame, field="maptype", label="terrain", command=self.change_maptype)
+        self.set_button(field="full_size", label="Full Size", command=self.show_full_size)
         map_rotation_frame = Frame(location_frame)
         map_rotation_frame.pack()
         self.set_fields(map_rotation_frame, "map", title="Map Rotation")
@@ -413,6 +414,12 @@ class MappingControl(SelectControlWindow):
             self.maptype = maptype
         if self.mgr is not None:
             self.mgr.change_maptype(maptype)
+
+    def show_full_size(self):
+        """ View map at native resolution (tiled viewer)
+        """
+        if self.mgr is not None:
+            self.mgr.sc.show_full_size()
         
     def change_unit(self, unit=None):
         self.set_vals()
@@ -0,0 +1,278 @@
+# plot_geometry.py    19Oct2026  crs
+"""
+Octagonal sample plot geometry and rasterized plot coverage statistics
+
+A sample plot is a regular octagon about the plot center, with vertices
+at the eight compass directions N, NE, E, ... NW.  Its eight sectors,
+center to adjacent vertices, are named as in the density workbooks,
+clockwise from north: NNE, NE, SE, SSE, SSW, SW, NW, NNW.
+
+Plots are 5 m radius (center to vertex) octagons, as in the density
+workbooks.  They are drawn, by default, at SAMPLE_DRAW_RADIUS, keeping
+the map's original look.
+
+PlotCoverage rasterizes all plot sectors into one label image (label =
+plot index * 8 + sector + 1, 0 outside all plots), covering just the
+plots' bounding box, then gathers per plot / per sector pixel
+statistics of a map image with a single pass of numpy bincounts over
+the labelled pixels.
+"""
+from math import sqrt
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from select_trace import SlTrace
+from select_error import SelectError
+
+N_SECTORS = 8
+SECTOR_NAMES = ("NNE", "NE", "SE", "SSE", "SSW", "SW", "NW", "NNW")
+SAMPLE_PLOT_RADIUS = 5.         # meters, plot center to vertex
+SAMPLE_DRAW_RADIUS = 10.        # meters, as drawn by GeoDraw.addSample
+EARTH_MEAN_RADIUS = 6371e3      # meters, as in geoMove
+
+
+def octagon_area(radius):
+    """ Area of regular octagon
+    :radius: center to vertex distance
+    :returns: area, in units of radius squared
+    """
+    return 2*sqrt(2)*radius**2
+
+
+def octagon_lat_longs(lats, longs, radius=SAMPLE_PLOT_RADIUS):
+    """ Octagon vertices for plot centers
+    Offsets are applied as in geoMove
+    :lats, longs: arrays of plot center latitude, longitude
+    :radius: center to vertex distance, in meters
+    :returns: vertex lats, longs arrays (nplots x 8),
+            vertices clockwise from north
+    """
+    lats = np.asarray(lats, dtype=np.float64).reshape(-1, 1)
+    longs = np.asarray(longs, dtype=np.float64).reshape(-1, 1)
+    bearings = np.radians(np.arange(N_SECTORS)*360./N_SECTORS)
+    north = radius*np.cos(bearings)
+    east = radius*np.sin(bearings)
+    phi1 = np.radians(lats)
+    phi2 = phi1 + north/EARTH_MEAN_RADIUS
+    v_lats = np.degrees(phi2)
+    r2 = EARTH_MEAN_RADIUS*np.cos((phi1+phi2)/2)
+    v_longs = longs + np.degrees(east/r2)
+    return v_lats, v_longs
+
+
+def octagon_pixels(geo_draw, lats, longs, radius=SAMPLE_PLOT_RADIUS):
+    """ Octagon vertices, in map image pixels
+    :geo_draw: GeoDraw giving map georeference
+    :lats, longs: arrays of plot center latitude, longitude
+    :radius: center to vertex distance, in meters
+    :returns: xs, ys arrays (nplots x 8)
+    """
+    v_lats, v_longs = octagon_lat_longs(lats, longs, radius=radius)
+    return geo_draw.latLongsToPixels(v_lats, v_longs)
+
+
+def excess_green(r, g, b):
+    return 2*g - r - b
+
+
+# Default pixel classes - name, test on r,g,b (float arrays)
+VEGETATION_CLASSES = (
+    ("green", lambda r, g, b: excess_green(r, g, b) > 20),
+    ("dark", lambda r, g, b: (r + g + b) < 150),
+    ("bright", lambda r, g, b: (r + g + b) > 600),
+    )
+
+
+class PlotCoverage:
+    """ Per plot pixel statistics of a map image
+    """
+    def __init__(self, geo_draw, lats, longs, plot_keys=None,
+                 radius=SAMPLE_PLOT_RADIUS, classes=None):
+        """ Setup plots
+        :geo_draw: GeoDraw giving map georeference and image size
+        :lats, longs: arrays of plot center latitude, longitude
+        :plot_keys: plot keys default: plot index as string
+        :radius: plot center to vertex distance, in meters
+        :classes: pixel classes, list of (name, fun(r,g,b) returning mask)
+                Classes are tested in order, a pixel counts in the first
+                class it matches
+                default: VEGETATION_CLASSES
+        """
+        if classes is None:
+            classes = VEGETATION_CLASSES
+        self.geo_draw = geo_draw
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.longs = np.asarray(longs, dtype=np.float64)
+        if plot_keys is None:
+            plot_keys = [str(i) for i in range(len(self.lats))]
+        self.plot_keys = list(plot_keys)
+        self.plot_index = {key : i for i, key in enumerate(self.plot_keys)}
+        self.radius = radius
+        self.classes = classes
+        self.labels = None              # Label raster, of labels_box
+        self.labels_box = None          # Map pixel box (x0,y0,x1,y1) of labels
+        self.labels_extent = None       # Map extent of label raster
+        self.sector_pixels = None       # (nplots x 8) pixel counts
+        self.sector_rgb = None          # (nplots x 8 x 3) rgb sums
+        self.sector_classes = None      # (nplots x 8 x nclasses) pixel counts
+
+    @classmethod
+    def from_points(cls, geo_draw, points, **kwargs):
+        """ Setup from sample points (SamplePoint)
+        """
+        points = [point for point in points if point.get_plot_key() != "TBM"]
+        lats = [point.lat for point in points]
+        longs = [point.long for point in points]
+        plot_keys = [point.get_plot_key() for point in points]
+        return cls(geo_draw, lats, longs, plot_keys=plot_keys, **kwargs)
+
+    def nplots(self):
+        return len(self.plot_keys)
+
+    def get_extent(self):
+        geo_draw = self.geo_draw
+        return (geo_draw.ulLat, geo_draw.ulLong,
+                geo_draw.lrLat, geo_draw.lrLong,
+                geo_draw.getWidth(), geo_draw.getHeight())
+
+    def get_labels(self):
+        """ Label raster, rebuilt only if the map extent changed
+        The raster covers just the plots' bounding box (see labels_box)
+        within the map
+        :returns: int32 array (box height x box width)
+        """
+        extent = self.get_extent()
+        if self.labels is not None and self.labels_extent == extent:
+            return self.labels
+
+        width, height = extent[4], extent[5]
+        xs, ys = octagon_pixels(self.geo_draw, self.lats, self.longs,
+                                radius=self.radius)
+        if self.nplots() == 0:
+            box = (0, 0, 0, 0)
+        else:
+            x0 = min(max(int(np.floor(xs.min())), 0), width)
+            y0 = min(max(int(np.floor(ys.min())), 0), height)
+            x1 = max(min(int(np.ceil(xs.max()))+1, width), x0)
+            y1 = max(min(int(np.ceil(ys.max()))+1, height), y0)
+            box = (x0, y0, x1, y1)
+        x0, y0, x1, y1 = box
+        label_image = Image.new("I", (x1-x0, y1-y0), 0)
+        draw = ImageDraw.Draw(label_image)
+        cxs, cys = self.geo_draw.latLongsToPixels(self.lats, self.longs)
+        xs = xs - x0
+        ys = ys - y0
+        for plot_idx in range(self.nplots()):
+            center = (float(cxs[plot_idx]-x0), float(cys[plot_idx]-y0))
+            for si in range(N_SECTORS):
+                vi2 = (si+1) % N_SECTORS
+                draw.polygon([center,
+                              (float(xs[plot_idx, si]), float(ys[plot_idx, si])),
+                              (float(xs[plot_idx, vi2]), float(ys[plot_idx, vi2]))],
+                             fill=plot_idx*N_SECTORS + si + 1)
+        self.labels = np.asarray(label_image, dtype=np.int32)
+        self.labels_box = box
+        self.labels_extent = extent
+        SlTrace.lg(f"PlotCoverage: label raster {x1-x0}x{y1-y0}"
+                   f" of {width}x{height} {self.nplots()} plots", "plot_coverage")
+        return self.labels
+
+    def compute(self, image=None):
+        """ Gather statistics over image, in one pass over plot pixels
+        :image: map image default: geo_draw's image
+        """
+        if image is None:
+            image = self.geo_draw.image
+        labels = self.get_labels()
+        width, height = self.labels_extent[4], self.labels_extent[5]
+        if image.size != (width, height):
+            raise SelectError(f"PlotCoverage: image size {image.size}"
+                              f" != map size {width}x{height}")
+
+        rgb = np.asarray(image.crop(self.labels_box).convert("RGB"))
+        sel = labels > 0
+        lab = labels[sel]
+        pix = rgb[sel].astype(np.float64)
+        r, g, b = pix[:, 0], pix[:, 1], pix[:, 2]
+        nlabels = self.nplots()*N_SECTORS + 1
+        counts = np.bincount(lab, minlength=nlabels)
+        rgb_sums = np.stack([np.bincount(lab, weights=pix[:, i], minlength=nlabels)
+                             for i in range(3)], axis=-1)
+        unclassed = np.ones(len(lab), dtype=bool)
+        class_counts = []
+        for _, test in self.classes:
+            mask = test(r, g, b) & unclassed
+            unclassed &= ~mask
+            class_counts.append(np.bincount(lab[mask], minlength=nlabels))
+        shape = (self.nplots(), N_SECTORS)
+        self.sector_pixels = counts[1:].reshape(shape)
+        self.sector_rgb = rgb_sums[1:].reshape(shape + (3,))
+        if len(class_counts) > 0:
+            self.sector_classes = np.stack(class_counts, axis=-1)[1:].reshape(
+                                                shape + (len(class_counts),))
+        else:
+            self.sector_classes = np.zeros(shape + (0,))
+        SlTrace.lg(f"PlotCoverage: {len(lab)} plot pixels", "plot_coverage")
+
+    def _check_computed(self):
+        if self.sector_pixels is None:
+            self.compute()
+
+    def get_class_names(self):
+        return [name for name, _ in self.classes]
+
+    def get_pixel_counts(self):
+        """ Pixels per plot
+        """
+        self._check_computed()
+        return self.sector_pixels.sum(axis=1)
+
+    def get_mean_rgb(self):
+        """ Mean color per plot
+        :returns: array (nplots x 3), nan for plots with no pixels
+        """
+        self._check_computed()
+        counts = self.get_pixel_counts()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.sector_rgb.sum(axis=1)/counts[:, None]
+
+    def get_fractions(self, class_name, by_sector=False):
+        """ Fraction of plot pixels in class
+        :class_name: pixel class name e.g. green
+        :by_sector: True - per sector (nplots x 8)
+                default: per plot
+        :returns: array of fractions, nan where no pixels
+        """
+        self._check_computed()
+        names = self.get_class_names()
+        if class_name not in names:
+            raise SelectError(f"Unrecognized pixel class: {class_name}")
+        ci = names.index(class_name)
+        if by_sector:
+            nclass = self.sector_classes[:, :, ci]
+            npix = self.sector_pixels
+        else:
+            nclass = self.sector_classes[:, :, ci].sum(axis=1)
+            npix = self.get_pixel_counts()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return nclass/npix
+
+    def get_plot_stats(self, plot_key):
+        """ Statistics for one plot
+        :returns: dictionary, None if plot not found
+        """
+        plot_idx = self.plot_index.get(plot_key)
+        if plot_idx is None:
+            return None
+
+        self._check_computed()
+        npix = int(self.sector_pixels[plot_idx].sum())
+        stats = {"plot_key" : plot_key,
+                 "pixels" : npix,
+                 "area" : octagon_area(self.radius),
+                 "mean_rgb" : tuple(self.get_mean_rgb()[plot_idx])}
+        for ci, name in enumerate(self.get_class_names()):
+            nclass = int(self.sector_classes[plot_idx, :, ci].sum())
+            stats[name] = nclass/npix if npix > 0 else None
+        return stats
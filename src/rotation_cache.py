@@ -0,0 +1,158 @@
+# rotation_cache.py    19Oct2026  crs
+"""
+Cache of rotated rasters, with low resolution rotation previews
+
+Rotated images are kept, within a memory budget (max_bytes), least
+recently used dropped first, keyed by (image id, angle, expand,
+resample).  The source image is kept with its entries, so its id can't
+be reused while they are cached, and is counted, once, in the budget
+with them.  An image too large to cache with its source is returned
+but not kept.  Rotating back to an angle already
+seen (e.g. stepping the map rotation back and forth) is then a lookup
+rather than a full resolution rotate.
+
+Returned images are shared - the cached image, or for a 0 degree,
+unexpanded rotation the source image itself - so callers must not
+change them in place (draw on a copy()).  Base maps, the users here,
+are replaced, never changed.
+
+For interactive rotation, preview() rotates a small proxy of the
+image (at most preview_size pixels on a side), so each step of a spin
+is immediate; the full quality rotation is done once the angle settles.
+"""
+from collections import OrderedDict
+
+from PIL import Image
+
+from select_trace import SlTrace
+
+
+class RotationCache:
+    def __init__(self, max_entries=8, max_bytes=None, preview_size=512):
+        """ Setup cache
+        :max_entries: maximum rotated images kept default: 8
+        :max_bytes: memory budget for rotated images and their sources
+                default: 256 MB
+        :preview_size: maximum preview proxy width / height default: 512
+        """
+        if max_bytes is None:
+            max_bytes = 256*1024*1024
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0                 # Held by rotated images, sources
+        self.preview_size = preview_size
+        self.entries = OrderedDict()    # (source, rotated) by key
+        self.sources = {}               # Number of entries, by source id
+        self.proxies = OrderedDict()    # (source, proxy) by image id
+        self.n_hits = 0
+        self.n_misses = 0
+
+    @staticmethod
+    def get_key(image, angle, expand=False, resample=None):
+        return (id(image), round(angle % 360, 6), bool(expand), resample)
+
+    @staticmethod
+    def image_bytes(image):
+        return image.width*image.height*len(image.getbands())
+
+    def rotate(self, image, angle, expand=False, resample=None):
+        """ Rotated image, from cache if present
+        :image: image to rotate
+        :angle: rotation, degrees counter clockwise
+        :expand: expand image to hold the whole rotated image
+        :resample: PIL resample filter default: Image.NEAREST, as Image.rotate
+        :returns: rotated image, shared - not to be changed in place
+                image itself for no rotation
+        """
+        if angle % 360 == 0 and not expand:
+            return image            # Nothing to rotate, or cache
+
+        if resample is None:
+            resample = Image.NEAREST
+        key = self.get_key(image, angle, expand, resample)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is image:
+            self.entries.move_to_end(key)
+            self.n_hits += 1
+            return entry[1]
+
+        self.n_misses += 1
+        rotated = image.rotate(angle, resample=resample, expand=expand)
+        if key in self.entries:             # Stale - id reused
+            self.drop_entry(key)
+        if self.image_bytes(rotated) + self.image_bytes(image) <= self.max_bytes:
+            self.add_entry(key, image, rotated)
+            while len(self.entries) > 1 and (len(self.entries) > self.max_entries
+                                             or self.nbytes > self.max_bytes):
+                self.drop_entry(next(iter(self.entries)))
+        SlTrace.lg(f"RotationCache: rotate {angle:.1f} expand={expand}"
+                   f" hits: {self.n_hits} misses: {self.n_misses}", "rotation_cache")
+        return rotated
+
+    def add_entry(self, key, image, rotated):
+        """ Add rotated image, counting its source if not yet held
+        """
+        self.entries[key] = (image, rotated)
+        self.nbytes += self.image_bytes(rotated)
+        nsrc = self.sources.get(id(image), 0)
+        if nsrc == 0:
+            self.nbytes += self.image_bytes(image)
+        self.sources[id(image)] = nsrc + 1
+
+    def drop_entry(self, key):
+        """ Drop entry, and its source's count if no longer held
+        """
+        image, rotated = self.entries.pop(key)
+        self.nbytes -= self.image_bytes(rotated)
+        nsrc = self.sources[id(image)] - 1
+        if nsrc == 0:
+            del self.sources[id(image)]
+            self.nbytes -= self.image_bytes(image)
+        else:
+            self.sources[id(image)] = nsrc
+
+    def get_proxy(self, image):
+        """ Low resolution proxy of image, for previews
+        """
+        entry = self.proxies.get(id(image))
+        if entry is not None and entry[0] is image:
+            return entry[1]
+
+        scale = self.preview_size/max(image.width, image.height)
+        if scale >= 1:
+            proxy = image
+        else:
+            proxy = image.resize((max(int(image.width*scale), 1),
+                                  max(int(image.height*scale), 1)),
+                                 Image.BILINEAR)
+        self.proxies[id(image)] = (image, proxy)
+        while len(self.proxies) > 2:
+            self.proxies.popitem(last=False)
+        return proxy
+
+    def preview(self, image, angle, expand=False):
+        """ Low resolution rotated image, for display while rotating
+        :image: full resolution image
+        :angle: rotation, degrees counter clockwise
+        :expand: as in rotate
+        :returns: rotated proxy, about preview_size
+        Previews are not cached, so a spin doesn't flush the full
+        resolution rotations
+        """
+        return self.get_proxy(image).rotate(angle, expand=bool(expand))
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.sources = {}
+        self.proxies = OrderedDict()
+        self.nbytes = 0
+
+
+rotation_cache = RotationCache()        # Shared cache
+
+
+def rotate_image(image, angle, expand=False, resample=None):
+    """ Rotate image, via the shared cache
+    The result is shared, not to be changed in place
+    """
+    return rotation_cache.rotate(image, angle, expand=expand, resample=resample)
@@ -6,7 +6,6 @@ import sys
 import os
 import re
 import datetime
-import openpyxl
 import argparse
 from tkinter import filedialog
 from PIL import Image, ImageDraw, ImageFont
@@ -17,6 +16,7 @@ from scrolled_canvas import ScrolledCanvas
 from manage_survey_point import SurveyPointManager 
 from survey_trail import SurveyTrail
 from sample_file import SamplePoint
+from sample_table import SampleTable
 
 def report(msg):
     """ Defaut popup report
@@ -69,116 +69,13 @@ SlTrace.lg("args: %s\n" % args)
 
 
 sample_file = "../data/2018 05 12 Revised GPS coordinates of 32 sample plot centers.xlsx"
-wb = openpyxl.load_workbook(sample_file)
-sheet = wb['WhitneyHill_average']
-nrow = sheet.max_row
-SlTrace.lg("%d rows" % nrow)
-ncol = sheet.max_column
-SlTrace.lg("%d columns" % ncol)
-point_header = "POINT"
-plot_header = "Plot"
-long_header = "long_deg"
-lat_header = "lat_deg"
-max_long = None
-min_long = None
-max_lat = None
-min_lat = None
-"""
-Find column headers and beginning of data rows
-"""
-
-got_headers = False
-header_row = None
-point_colno = None
-plot_colno = None
-long_colno = None
-lat_colno = None
-for nr in range(1, nrow+1):
-    value = sheet.cell(row=nr, column=1).value
-    if value != "POINT":
-        continue            # Look at next row
-    
-    for nc in range(1, ncol+1):
-        value = sheet.cell(row=nr, column=nc).value
-        if value == point_header:
-            point_colno = nc
-        elif value == plot_header:
-            plot_colno = nc
-        elif value == long_header:      # Finds last one in row
-            long_colno = nc
-        elif value == lat_header:
-            lat_colno = nc
-            
-    if point_colno is None:
-        SlTrace.lg("POINT column missing")
-        sys.exit(1)
-    if plot_colno is None:
-        SlTrace.lg("Plot column missing")
-        sys.exit(1)
-    if long_colno is None:
-        SlTrace.lg("long column missing")
-        sys.exit(1)
-    if lat_colno is None:
-        SlTrace.lg("lat column missing")
-        sys.exit(1)
-    header_row = nr
-    break
-
-if header_row is None:
-    SlTrace.lg("Header row not found")
-    sys.exit(1)
-
-"""
-Collect points and find extent of lat,long
-"""
+sample_table = SampleTable.load(sample_file, sheet_name='WhitneyHill_average')
 points = []     # SamplePoint
-limit_pointh = {}   # Hash by limit
-pointh = {}         # Hash by plot
-lat_colno_1 = lat_colno - 3     # Orig #'s are 3 cols left
-long_colno_1 = long_colno - 3
-for nr in range(header_row+1, nrow+1):
-    lat = sheet.cell(row=nr, column=lat_colno).value
-    if lat is None:
-        lat = sheet.cell(row=nr, column=lat_colno_1).value
-        
-    long = sheet.cell(row=nr, column=long_colno).value
-    if long is None:
-        long = sheet.cell(row=nr, column=long_colno_1).value
-        
-    if lat is None or long is None:
-        continue
-    
-    plot = sheet.cell(row=nr, column=plot_colno).value
-    if max_lat is None or lat > max_lat:
-        max_lat = lat
-        limit_pointh['max_lat'] = plot
-    if min_lat is None or lat < min_lat:
-        min_lat = lat
-        limit_pointh['min_lat'] = plot
-    if max_long is None or long > max_long:
-        max_long = long
-        limit_pointh['max_long'] = plot
-    if min_long is None or long < min_long:
-        min_long = long
-        limit_pointh['min_long'] = plot
-        
-    point = SamplePoint(plot_key=plot, lat=lat, long=long)
+for i in range(len(sample_table)):
+    point = SamplePoint(plot_key=str(sample_table.plots[i]),
+                        lat=float(sample_table.lats[i]), long=float(sample_table.longs[i]))
     points.append(point)
-    pointh[plot] = point
-    
-SlTrace.lg("%d Sample Points" % len(points))
-SlTrace.lg("Max Longitude: %.5f Latitude: %.5f" % (max_long, max_lat))
-SlTrace.lg("Min Longitude: %.5f Latitude: %.5f" % (min_long, min_lat))
-SlTrace.lg("Points on the edge")
-for key in limit_pointh.keys():
-    plot = limit_pointh[key]
-    point = pointh[plot]
-    pm = re.match("T(\d+)P(\d+)", plot)
-    if pm is not None:
-        plot_key = f"{pm.group(1)}-{pm.group(2)}"
-    else:
-        plot_key = plot
-    SlTrace.lg("%-8s %s  Longitude: %.5f latitude: %.5f" % (key, plot_key, point.long, point.lat))
+sample_table.log_extent()
 
 """
 Plot using points, mapRotate, and mapBorder as guide
@@ -246,6 +143,8 @@ if testMarks:
     Do box around orignial boxex
     """
     gd = gmi.geoDraw
+    min_lat, max_lat = float(sample_table.lats.min()), float(sample_table.lats.max())
+    min_long, max_long = float(sample_table.longs.min()), float(sample_table.longs.max())
     inset = 100
     box_line_width = 10
     gd.line([gd.addToPoint(latLong=(max_lat, min_long), leng=inset, deg=-45),
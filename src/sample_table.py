@@ -0,0 +1,193 @@
+# sample_table.py    19Oct2026  crs
+"""
+Sample plot coordinate table, read from the sample .xlsx file
+
+The sheet is read with openpyxl in read-only (streaming) mode,
+finding the header row and collecting data rows in one pass.
+The parsed table is cached in a sidecar .npz file keyed by the
+workbook's content hash and the sheet name, so later loads of an
+unchanged workbook do not open it at all.
+"""
+import os
+import re
+import hashlib
+
+import numpy as np
+import openpyxl
+
+from select_trace import SlTrace
+from select_error import SelectError
+
+
+def plot_to_key(plot):
+    """ Convert plot name to plot key e.g. T3P12 => 3-12
+    :plot: plot name
+    :returns: plot key, plot if not in T<n>P<n> form
+    """
+    pm = re.match(r"T(\d+)P(\d+)", plot)
+    if pm is not None:
+        return f"{pm.group(1)}-{pm.group(2)}"
+    return plot
+
+
+def file_hash(file_name):
+    """ Content hash of file
+    :returns: hex digest string
+    """
+    h = hashlib.sha1()
+    with open(file_name, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class SampleTable:
+    """ Columns of sample plot coordinates
+    """
+    VERSION = 1                 # Change if the cache layout changes
+
+    def __init__(self, plots=None, lats=None, longs=None):
+        """ Setup table
+        :plots: array of plot names e.g. T1P3
+        :lats, longs: arrays of plot center latitude, longitude
+        """
+        if plots is None:
+            plots = np.zeros(0, dtype="U1")
+        if lats is None:
+            lats = np.zeros(0)
+        if longs is None:
+            longs = np.zeros(0)
+        self.plots = plots
+        self.lats = lats
+        self.longs = longs
+        self.plot_keys = np.array([plot_to_key(plot) for plot in plots], dtype=str)
+
+    def __len__(self):
+        return len(self.plots)
+
+    @staticmethod
+    def cache_name(file_name, sheet_name):
+        return f"{file_name}.{sheet_name}.samplecache.npz"
+
+    @classmethod
+    def load(cls, file_name, sheet_name="WhitneyHill_average", use_cache=True):
+        """ Load table, from cache if valid, else from workbook
+        :file_name: .xlsx file name
+        :sheet_name: sheet name default: WhitneyHill_average
+        :use_cache: use/update cache default: True
+        :returns: SampleTable
+        """
+        if not os.path.exists(file_name):
+            raise SelectError(f"Sample file {file_name} not found")
+
+        digest = file_hash(file_name)
+        cache_name = cls.cache_name(file_name, sheet_name)
+        if use_cache and os.path.exists(cache_name):
+            try:
+                with np.load(cache_name, allow_pickle=False) as cf:
+                    if (int(cf["version"]) == cls.VERSION
+                            and str(cf["hash"]) == digest
+                            and str(cf["sheet"]) == sheet_name):
+                        SlTrace.lg(f"Sample table from cache {cache_name}", "sample_table")
+                        return cls(plots=cf["plots"], lats=cf["lats"], longs=cf["longs"])
+            except (OSError, KeyError, ValueError) as e:
+                SlTrace.lg(f"Ignoring bad sample cache {cache_name}: {e}")
+
+        table = cls.read_sheet(file_name, sheet_name)
+        if use_cache:
+            tmp_name = cache_name + ".tmp"
+            try:
+                with open(tmp_name, "wb") as f:
+                    np.savez(f, version=cls.VERSION, hash=digest, sheet=sheet_name,
+                             plots=table.plots, lats=table.lats, longs=table.longs)
+                os.replace(tmp_name, cache_name)
+            except OSError as e:
+                SlTrace.lg(f"Can't save sample cache {cache_name}: {e}")
+        return table
+
+    @classmethod
+    def read_sheet(cls, file_name, sheet_name):
+        """ Read table from workbook sheet
+        Header row starts with "POINT" and has "Plot", "long_deg" (last one
+        in row), and "lat_deg" columns.  If a row's lat/long are missing
+        the original values, 3 columns to the left, are used.
+        :file_name: .xlsx file name
+        :sheet_name: sheet name
+        :returns: SampleTable
+        """
+        point_header = "POINT"
+        plot_header = "Plot"
+        long_header = "long_deg"
+        lat_header = "lat_deg"
+        wb = openpyxl.load_workbook(file_name, read_only=True, data_only=True)
+        try:
+            if sheet_name not in wb.sheetnames:
+                raise SelectError(f"Sheet {sheet_name} not in {file_name}")
+            sheet = wb[sheet_name]
+            header_row = None
+            plot_idx = long_idx = lat_idx = None
+            plots = []
+            lats = []
+            longs = []
+            for nr, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                if header_row is None:
+                    if len(row) == 0 or row[0] != point_header:
+                        continue            # Look at next row
+
+                    for nc, value in enumerate(row):
+                        if value == plot_header:
+                            plot_idx = nc
+                        elif value == long_header:      # Finds last one in row
+                            long_idx = nc
+                        elif value == lat_header:
+                            lat_idx = nc
+                    if plot_idx is None:
+                        raise SelectError(f"Plot column missing in {file_name}")
+                    if long_idx is None:
+                        raise SelectError(f"long column missing in {file_name}")
+                    if lat_idx is None:
+                        raise SelectError(f"lat column missing in {file_name}")
+                    header_row = nr
+                    continue
+
+                lat = row[lat_idx] if lat_idx < len(row) else None
+                if lat is None and lat_idx >= 3:
+                    lat = row[lat_idx-3]        # Orig #'s are 3 cols left
+                long = row[long_idx] if long_idx < len(row) else None
+                if long is None and long_idx >= 3:
+                    long = row[long_idx-3]
+                if lat is None or long is None:
+                    continue
+
+                plot = row[plot_idx] if plot_idx < len(row) else None
+                if plot is None:
+                    continue
+                plots.append(str(plot))
+                lats.append(float(lat))
+                longs.append(float(long))
+        finally:
+            wb.close()
+        if header_row is None:
+            raise SelectError(f"Header row not found in {file_name}")
+
+        SlTrace.lg(f"{len(plots)} sample rows read from {file_name}", "sample_table")
+        return cls(plots=np.array(plots, dtype=str),
+                   lats=np.array(lats, dtype=np.float64),
+                   longs=np.array(longs, dtype=np.float64))
+
+    def log_extent(self):
+        """ Log extent of lat, long and points on the edge
+        """
+        if len(self) == 0:
+            return
+
+        SlTrace.lg("%d Sample Points" % len(self))
+        SlTrace.lg("Max Longitude: %.5f Latitude: %.5f" % (self.longs.max(), self.lats.max()))
+        SlTrace.lg("Min Longitude: %.5f Latitude: %.5f" % (self.longs.min(), self.lats.min()))
+        SlTrace.lg("Points on the edge")
+        for key, idx in (("max_lat", self.lats.argmax()),
+                         ("min_lat", self.lats.argmin()),
+                         ("max_long", self.longs.argmax()),
+                         ("min_long", self.longs.argmin())):
+            SlTrace.lg("%-8s %s  Longitude: %.5f latitude: %.5f"
+                       % (key, self.plot_keys[idx], self.longs[idx], self.lats[idx]))
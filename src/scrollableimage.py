@@ -24,7 +24,8 @@ class ScrolledCanvas(Frame):
         if image is not None:
             self.im = image
         elif fileName is not None:
-            image, info = LoadImageFile(fileName)
+            view_size = None if width is None or height is None else (width, height)
+            image, info = LoadImageFile(fileName, view_size=view_size)
             if image is None:
                 raise GMIError("Can't load image file %s" % fileName)
             
@@ -6,8 +6,12 @@ from math import cos, sin, pi
 from select_trace import SlTrace
 from select_error import SelectError
 from GoogleMapImage import GoogleMapImage
+from image_pyramid import ImagePyramid
+from tiled_canvas import TiledCanvas
 
 class ScrolledCanvas(Frame):
+    RESIZE_DELAY = 100          # msec, after last <Configure>, to resize
+    
     def __init__(self, fileName=None, gmi=None, image=None, title=None, parent=None,
                  mapRotate=None,
                  enlargeForRotate=False,
@@ -67,6 +71,13 @@ class ScrolledCanvas(Frame):
         self.image = None
         self.no_op = no_op
         self.cv_mark_tags = []    # Diagostic markings for canvas
+        self.pyramid = None         # Downsample pyramid of displayed image
+        self.im2 = None             # Displayed PhotoImage, reused if same size
+        self.imgtag = None
+        self.resize_event = None    # Most recent, pending, resize event
+        self.resize_after = None    # Pending resize, from after
+        self.displayed_size = None  # Canvas size at last resize_call
+        self.full_size_view = None  # Native resolution viewer, if one
         if no_op:
             return                  # Not a really functioning canvas, just a place holder 
         
@@ -140,6 +151,17 @@ class ScrolledCanvas(Frame):
         """
         return self.canv.winfo_width()
 
+    def get_view_size(self):
+        """ Size of view, for loading only the map resolution needed
+        :returns: (width, height) of canvas, if displayed, else
+                requested width, height, None if not known
+        """
+        if self.canv is not None and self.canv.winfo_width() > 1:
+            return (self.canv.winfo_width(), self.canv.winfo_height())
+        if self.width is not None and self.height is not None:
+            return (self.width, self.height)
+        return None
+
     def getXFract(self, canvas_x):
         return canvas_x/self.get_width()
 
@@ -209,10 +231,23 @@ class ScrolledCanvas(Frame):
         self.resize_call = called
                     
     def on_resize(self, event):
-        # determine the ratio of old width/height to new width/height
-        ###if self.imOriginal is None:
-        ###    return                      # Nothing yet
-        self.update()                   # Insure sizing completed
+        """ Note resize, coalescing the <Configure> events of
+        a window drag into one resize, RESIZE_DELAY after the last
+        """
+        self.resize_event = event
+        if self.resize_after is not None:
+            self.after_cancel(self.resize_after)
+        self.resize_after = self.after(self.RESIZE_DELAY, self.do_resize)
+        
+    def do_resize(self):
+        """ Resize, to the most recent resize event
+        """
+        self.resize_after = None
+        event = self.resize_event
+        if event is None or self.canv is None:
+            return
+        
+        self.resize_event = None
         new_width = event.width
         new_height = event.height
         new_width = new_height = min(new_width, new_height)
@@ -226,23 +261,84 @@ class ScrolledCanvas(Frame):
         self.size_image_to_canvas()
     
     def size_image_to_canvas(self):
-        self.update()
         if self.canv is None:
             return
         
+        self.canv.update_idletasks()        # Insure geometry is current
         self.canvas_width = self.canv.winfo_width()
         self.canvas_height = self.canv.winfo_height()
-        image = self.get_image()
-        image = image.resize((self.canvas_width, self.canvas_height))
-        ###self.set_image(image)
+        image = self.get_sized_image((self.canvas_width, self.canvas_height))
         self.canv.config(scrollregion=(0,0,self.canvas_width,self.canvas_height))
-        self.im2=PIL.ImageTk.PhotoImage(image)
-        self.imgtag=self.canv.create_image(0,0,anchor="nw",image=self.im2)
+        self.show_image(image)
         self.lower_image()
-        self.update()                   # Insure sizing completed
-        SlTrace.lg(f"size_image_to_canvas: width: {self.get_width()} height: {self.get_height()}", "resize")
-        if self.resize_call is not None:
+        SlTrace.lg(f"size_image_to_canvas: width: {self.canvas_width} height: {self.canvas_height}", "resize")
+        canvas_size = (self.canvas_width, self.canvas_height)
+        if self.resize_call is not None and canvas_size != self.displayed_size:
+            self.displayed_size = canvas_size
             self.resize_call()
+
+    def show_full_size(self):
+        """ View map at native resolution, in a tiled viewer window
+        Only the visible tiles are made into PhotoImages
+        A map loaded below full resolution is shown from its full
+        resolution source, if it has one
+        """
+        gmi = self.get_gmi()
+        if gmi is None:
+            return
+        
+        image = gmi.get_full_image()
+        if image is None:
+            SlTrace.lg("No full resolution source - showing loaded resolution")
+            image = gmi.get_image()
+        
+        view = self.full_size_view
+        if view is not None and view.winfo_exists():
+            view.set_image(image)
+            view.parent.lift()
+            return
+        
+        self.full_size_view = TiledCanvas(image=image,
+                                          title=f"{self.title} - full size")
+
+    def show_preview(self, image):
+        """ Display a (low resolution) preview image, stretched to the
+        canvas e.g. while rotating.  Restored by size_image_to_canvas
+        :image: preview image
+        """
+        if self.canv is None:
+            return
+        
+        size = (max(self.canv.winfo_width(), 1), max(self.canv.winfo_height(), 1))
+        self.show_image(image.resize(size))
+        self.lower_image()
+
+    def get_sized_image(self, size):
+        """ Map image, sized for display, from the image's pyramid
+        :size: (width, height) in pixels
+        :returns: sized image
+        """
+        image = self.get_image()
+        if self.pyramid is None or not self.pyramid.is_for(image):
+            self.pyramid = ImagePyramid(image)
+        return self.pyramid.get_sized(size)
+
+    def show_image(self, image):
+        """ Display image in canvas, reusing the current PhotoImage
+        and canvas image item if the size is unchanged
+        :image: sized image
+        """
+        if (self.im2 is not None and self.imgtag is not None
+                and self.im2.width() == image.width
+                and self.im2.height() == image.height):
+            self.im2.paste(image)
+            return
+        
+        self.im2 = PIL.ImageTk.PhotoImage(image)
+        if self.imgtag is not None:
+            self.canv.itemconfigure(self.imgtag, image=self.im2)
+        else:
+            self.imgtag=self.canv.create_image(0,0,anchor="nw",image=self.im2)
             
     def set_size(self, width=None, height=None):
         """ Set image size according to canvas size, possibley changed
@@ -878,8 +974,10 @@ class ScrolledCanvas(Frame):
         self.canv_width = self.width = width
         self.canv_height = self.height = height
         SlTrace.lg("sizeWindow width=%d height=%d" % (width, height), "resize")
-        im = PIL.ImageTk.PhotoImage(image)
-        self.imgtag=self.canv.create_image(0,0,anchor="nw",image=im)
+        self.pyramid = None             # New image
+        self.displayed_size = None
+        self.im2 = PIL.ImageTk.PhotoImage(image)
+        self.imgtag=self.canv.create_image(0,0,anchor="nw",image=self.im2)
         image = image.resize((width,height))
         ###self.set_image(image)
         
@@ -952,6 +1050,8 @@ class ScrolledCanvas(Frame):
             raise SelectError("update file: should not have file=")
 
         self.file_name = fileName
+        if "view_size" not in kwargs:
+            kwargs["view_size"] = self.get_view_size()
         gmi = GoogleMapImage(file=fileName, add_compass_rose=False, **kwargs)
         if gmi is None:
             raise SelectError(f"Can't load GoogleMapImage({fileName}")
@@ -0,0 +1,596 @@
+# species_density.py    19Oct2026  crs
+"""
+Species density / basal area by sample plot, read from the data .xlsx files
+
+Two workbook layouts are read:
+    Shrub-Sapling-Liana density - one row per plot and species, with
+        individuals counted in each octagonal sector (NNE ... NNW) plus
+        a "Total Number" column.  The plot ("T1-P1") is given only on
+        the first row of each plot.
+    Tree basal area and density - a "SAMPLE 1-1" row starts each plot,
+        followed by one row per species with stem diameters (cm) and
+        an "Individuals" total column.
+
+Each workbook is parsed once into columns (plot key, species, count,
+basal area, sector counts) and cached in a sidecar .npz file, as
+SampleTable does.  SpeciesDensity combines the records and builds,
+once, dense plot x species matrices and the join to the sample plot
+points, so per species queries are array lookups.
+
+Species may be selected by scientific name, as in the workbooks, or by
+common name (e.g. "Norway Maple"), from data/Plant species with
+invasive potential recorded at Whitney Hill Park.docx.
+"""
+import os
+import re
+from math import pi
+
+import numpy as np
+import openpyxl
+
+from select_trace import SlTrace
+from select_error import SelectError
+from sample_table import plot_to_key, file_hash
+
+SHRUB_KIND = "shrub"
+TREE_KIND = "tree"
+
+# (scientific name, common names) - "<genus> species" is all of the genus
+INVASIVE_SPECIES = (
+    ("Acer platanoides", ("Norway Maple",)),
+    ("Alliaria petiolata", ("Garlic Mustard",)),
+    ("Berberis thunbergii", ("Japanese Barberry",)),
+    ("Campsis radicans", ("Trumpet Creeper",)),
+    ("Celastrus orbiculatus", ("Asian Bittersweet",)),
+    ("Euonymus alatus", ("Burning Bush", "Winged Spindle-tree")),
+    ("Fallopia japonica", ("Japanese Knotweed",)),
+    ("Frangula alnus", ("Glossy False Buckthorn",)),
+    ("Hedera helix", ("English Ivy",)),
+    ("Lonicera morrowii", ("Morrow's Honeysuckle",)),
+    ("Lythrum salicaria", ("Purple Loosestrife",)),
+    ("Malus species", ("Apple",)),
+    ("Rhamnus cathartica", ("European Buckthorn",)),
+    ("Robinia pseudo-acacia", ("Black Locust",)),
+    ("Rosa multiflora", ("Multiflora Rose",)),
+    )
+GENUS_WORDS = ("species", "sp", "spp")
+
+
+def plot_label_to_key(label):
+    """ Convert plot label, as found in the species workbooks, to plot key
+    e.g. T1-P3 => 1-3, SAMPLE 4-2 => 4-2, T3P12 => 3-12
+    :label: plot label
+    :returns: plot key, None if label is not a plot label
+    """
+    if label is None:
+        return None
+    label = str(label).strip()
+    if label == "":
+        return None
+    pm = re.match(r"T(\d+)-?P(\d+)$", label)
+    if pm is not None:
+        return plot_to_key(f"T{pm.group(1)}P{pm.group(2)}")
+    pm = re.match(r"SAMPLE\s+(\d+)-(\d+)$", label, flags=re.IGNORECASE)
+    if pm is not None:
+        return f"{pm.group(1)}-{pm.group(2)}"
+    pm = re.match(r"(\d+)-(\d+)$", label)
+    if pm is not None:
+        return label
+    return None
+
+
+def species_name(name):
+    """ Cleaned species name, None if not a name
+    """
+    if name is None:
+        return None
+    name = " ".join(str(name).split())
+    if name == "":
+        return None
+    return name
+
+
+def name_key(name):
+    """ Name for matching - lower case letters only
+    e.g. "Robinia pseudo-acacia" and "Robinia pseudoacacia" match
+    """
+    return re.sub(r"[^a-z]", "", name.lower())
+
+
+COMMON_NAMES = {name_key(common) : scientific
+                for scientific, commons in INVASIVE_SPECIES
+                for common in commons}
+
+
+def basal_area(diameter):
+    """ Basal area of stem
+    :diameter: diameter at breast height, in cm
+    :returns: area in square meters
+    """
+    return pi * (diameter/200.)**2
+
+
+class SpeciesRecords:
+    """ Columns of (plot, species) records from one workbook
+    """
+    VERSION = 1                 # Change if the cache layout changes
+    N_SECTORS = 8               # Octagonal plot sectors
+
+    def __init__(self, kind, plot_keys=None, species=None, counts=None,
+                 basal_areas=None, sectors=None, sector_names=None):
+        """ Setup records
+        :kind: SHRUB_KIND or TREE_KIND
+        :plot_keys: array of plot keys e.g. 1-3
+        :species: array of species names
+        :counts: array of number of individuals
+        :basal_areas: array of basal area (square meters), nan if not measured
+        :sectors: array (n x N_SECTORS) of individuals by sector,
+                 zeros if not recorded
+        :sector_names: sector names e.g. NNE
+        """
+        if plot_keys is None:
+            plot_keys = np.zeros(0, dtype="U1")
+        if species is None:
+            species = np.zeros(0, dtype="U1")
+        n = len(plot_keys)
+        if counts is None:
+            counts = np.zeros(n)
+        if basal_areas is None:
+            basal_areas = np.full(n, np.nan)
+        if sectors is None:
+            sectors = np.zeros((n, SpeciesRecords.N_SECTORS))
+        if sector_names is None:
+            sector_names = np.zeros(0, dtype="U1")
+        self.kind = kind
+        self.plot_keys = plot_keys
+        self.species = species
+        self.counts = counts
+        self.basal_areas = basal_areas
+        self.sectors = sectors
+        self.sector_names = sector_names
+
+    def __len__(self):
+        return len(self.plot_keys)
+
+    @staticmethod
+    def cache_name(file_name, sheet_name):
+        return f"{file_name}.{sheet_name}.speciescache.npz"
+
+    @classmethod
+    def load(cls, file_name, kind, sheet_name="Sheet1", use_cache=True):
+        """ Load records, from cache if valid, else from workbook
+        :file_name: .xlsx file name
+        :kind: SHRUB_KIND or TREE_KIND
+        :sheet_name: sheet name default: Sheet1
+        :use_cache: use/update cache default: True
+        :returns: SpeciesRecords
+        """
+        if kind not in (SHRUB_KIND, TREE_KIND):
+            raise SelectError(f"Unrecognized species file kind: {kind}")
+        if not os.path.exists(file_name):
+            raise SelectError(f"Species file {file_name} not found")
+
+        digest = file_hash(file_name)
+        cache_name = cls.cache_name(file_name, sheet_name)
+        if use_cache and os.path.exists(cache_name):
+            try:
+                with np.load(cache_name, allow_pickle=False) as cf:
+                    if (int(cf["version"]) == cls.VERSION
+                            and str(cf["hash"]) == digest
+                            and str(cf["sheet"]) == sheet_name
+                            and str(cf["kind"]) == kind):
+                        SlTrace.lg(f"Species records from cache {cache_name}", "species")
+                        return cls(kind, plot_keys=cf["plot_keys"], species=cf["species"],
+                                   counts=cf["counts"], basal_areas=cf["basal_areas"],
+                                   sectors=cf["sectors"], sector_names=cf["sector_names"])
+            except (OSError, KeyError, ValueError) as e:
+                SlTrace.lg(f"Ignoring bad species cache {cache_name}: {e}")
+
+        if kind == SHRUB_KIND:
+            records = cls.read_shrub_sheet(file_name, sheet_name)
+        else:
+            records = cls.read_tree_sheet(file_name, sheet_name)
+        if use_cache:
+            tmp_name = cache_name + ".tmp"
+            try:
+                with open(tmp_name, "wb") as f:
+                    np.savez(f, version=cls.VERSION, hash=digest, sheet=sheet_name,
+                             kind=kind, plot_keys=records.plot_keys,
+                             species=records.species, counts=records.counts,
+                             basal_areas=records.basal_areas,
+                             sectors=records.sectors,
+                             sector_names=records.sector_names)
+                os.replace(tmp_name, cache_name)
+            except OSError as e:
+                SlTrace.lg(f"Can't save species cache {cache_name}: {e}")
+        return records
+
+    @staticmethod
+    def _open_sheet(file_name, sheet_name):
+        wb = openpyxl.load_workbook(file_name, read_only=True, data_only=True)
+        if sheet_name not in wb.sheetnames:
+            wb.close()
+            raise SelectError(f"Sheet {sheet_name} not in {file_name}")
+        return wb, wb[sheet_name]
+
+    @classmethod
+    def read_shrub_sheet(cls, file_name, sheet_name="Sheet1"):
+        """ Read shrub-sapling-liana density sheet
+        Header row starts with "Plot No." and has "Species" and
+        "Total Number" columns.  The following row names the sectors,
+        in the columns before "Total Number".
+        :file_name: .xlsx file name
+        :sheet_name: sheet name
+        :returns: SpeciesRecords
+        """
+        plot_header = "Plot No."
+        species_header = "Species"
+        total_header = "Total Number"
+        wb, sheet = cls._open_sheet(file_name, sheet_name)
+        try:
+            header_row = None
+            species_idx = total_idx = None
+            sector_idxs = None
+            sector_names = []
+            plot_key = None
+            plot_keys = []
+            species = []
+            counts = []
+            sectors = []
+            for nr, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                if header_row is None:
+                    if len(row) == 0 or row[0] is None or str(row[0]).strip() != plot_header:
+                        continue            # Look at next row
+
+                    for nc, value in enumerate(row):
+                        if value is None:
+                            continue
+                        value = str(value).strip()
+                        if value == species_header:
+                            species_idx = nc
+                        elif value == total_header:
+                            total_idx = nc
+                    if species_idx is None:
+                        raise SelectError(f"Species column missing in {file_name}")
+                    if total_idx is None:
+                        raise SelectError(f"Total column missing in {file_name}")
+                    header_row = nr
+                    continue
+
+                if sector_idxs is None:     # Row after header - sector names
+                    sector_idxs = []
+                    for nc in range(species_idx+1, min(total_idx, len(row))):
+                        if row[nc] is not None and str(row[nc]).strip() != "":
+                            sector_idxs.append(nc)
+                            sector_names.append(str(row[nc]).strip())
+                    if len(sector_idxs) > cls.N_SECTORS:
+                        raise SelectError(f"Too many sectors ({len(sector_idxs)})"
+                                          f" in {file_name}")
+                    continue
+
+                key = plot_label_to_key(row[0]) if len(row) > 0 else None
+                if key is not None:
+                    plot_key = key
+                name = species_name(row[species_idx]) if species_idx < len(row) else None
+                if name is None or plot_key is None:
+                    continue
+
+                sector_counts = np.zeros(cls.N_SECTORS)
+                for ns, nc in enumerate(sector_idxs):
+                    sector_counts[ns] = cls._number(row[nc]) if nc < len(row) else 0.
+                total = cls._number(row[total_idx]) if total_idx < len(row) else 0.
+                if total == 0.:
+                    total = sector_counts.sum()
+                plot_keys.append(plot_key)
+                species.append(name)
+                counts.append(total)
+                sectors.append(sector_counts)
+        finally:
+            wb.close()
+        if header_row is None:
+            raise SelectError(f"Header row not found in {file_name}")
+
+        SlTrace.lg(f"{len(plot_keys)} shrub species rows read from {file_name}", "species")
+        n = len(plot_keys)
+        return cls(SHRUB_KIND, plot_keys=np.array(plot_keys, dtype=str),
+                   species=np.array(species, dtype=str),
+                   counts=np.array(counts, dtype=np.float64),
+                   sectors=(np.array(sectors, dtype=np.float64) if n > 0
+                            else np.zeros((0, cls.N_SECTORS))),
+                   sector_names=np.array(sector_names, dtype=str))
+
+    @classmethod
+    def read_tree_sheet(cls, file_name, sheet_name="Sheet1"):
+        """ Read tree basal area and density sheet
+        A row with "Individuals" gives the individuals total column,
+        diameter measurement columns lie between the species (first)
+        column and the "Diameter" total column.  Each plot starts with
+        a "SAMPLE n-m" row.  Basal area is computed from the diameters.
+        :file_name: .xlsx file name
+        :sheet_name: sheet name
+        :returns: SpeciesRecords
+        """
+        diameter_header = "Diameter"
+        individuals_header = "Individuals"
+        wb, sheet = cls._open_sheet(file_name, sheet_name)
+        try:
+            diameter_idx = individuals_idx = None
+            plot_key = None
+            plot_keys = []
+            species = []
+            counts = []
+            basal_areas = []
+            for row in sheet.iter_rows(values_only=True):
+                if len(row) == 0:
+                    continue
+                if individuals_idx is None:
+                    for nc, value in enumerate(row):
+                        if value is None:
+                            continue
+                        value = str(value).strip()
+                        if value == diameter_header:
+                            diameter_idx = nc
+                        elif value == individuals_header:
+                            individuals_idx = nc
+                    continue            # Data follows header
+
+                key = plot_label_to_key(row[0])
+                if key is not None:
+                    plot_key = key
+                    continue
+
+                name = species_name(row[0])
+                if name is None or plot_key is None:
+                    continue
+
+                diameters = []
+                for nc in range(1, min(diameter_idx, len(row))):
+                    diameter = cls._number(row[nc])
+                    if diameter > 0.:
+                        diameters.append(diameter)
+                if len(diameters) == 0:
+                    continue            # e.g. a note
+                count = cls._number(row[individuals_idx]) if individuals_idx < len(row) else 0.
+                if count == 0.:
+                    count = float(len(diameters))
+                plot_keys.append(plot_key)
+                species.append(name)
+                counts.append(count)
+                basal_areas.append(sum(basal_area(d) for d in diameters))
+        finally:
+            wb.close()
+        if individuals_idx is None or diameter_idx is None:
+            raise SelectError(f"Header row not found in {file_name}")
+
+        SlTrace.lg(f"{len(plot_keys)} tree species rows read from {file_name}", "species")
+        return cls(TREE_KIND, plot_keys=np.array(plot_keys, dtype=str),
+                   species=np.array(species, dtype=str),
+                   counts=np.array(counts, dtype=np.float64),
+                   basal_areas=np.array(basal_areas, dtype=np.float64))
+
+    @staticmethod
+    def _number(value):
+        """ Cell value as number, 0 if empty or not a number
+        """
+        if value is None:
+            return 0.
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0.
+
+
+class SpeciesDensity:
+    """ Species density / basal area by sample plot
+
+    Dense matrices, indexed [plot index, species index], are built once:
+        shrub_counts    shrub-sapling-liana individuals
+        tree_counts     tree individuals
+        tree_basal      tree basal area (square meters)
+    """
+    def __init__(self, shrub=None, tree=None):
+        """ Setup from records
+        :shrub: shrub SpeciesRecords default: none
+        :tree: tree SpeciesRecords default: none
+        """
+        if shrub is None:
+            shrub = SpeciesRecords(SHRUB_KIND)
+        if tree is None:
+            tree = SpeciesRecords(TREE_KIND)
+        self.shrub = shrub
+        self.tree = tree
+        self.plot_keys = np.union1d(shrub.plot_keys, tree.plot_keys)
+        self.species = np.union1d(shrub.species, tree.species)
+        self.plot_index = {str(key) : i for i, key in enumerate(self.plot_keys)}
+        self.species_index = {str(name) : i for i, name in enumerate(self.species)}
+        self.shrub_counts = self._matrix(shrub, shrub.counts)
+        self.shrub_sectors = self._sector_matrix(shrub)
+        self.tree_counts = self._matrix(tree, tree.counts)
+        self.tree_basal = self._matrix(tree, tree.basal_areas)
+        self.points = None                          # Joined sample points
+        self.point_lats = np.full(len(self.plot_keys), np.nan)
+        self.point_longs = np.full(len(self.plot_keys), np.nan)
+
+    @classmethod
+    def load(cls, shrub_file=None, tree_file=None, use_cache=True):
+        """ Load from species workbooks
+        :shrub_file: shrub-sapling-liana density .xlsx default: none
+        :tree_file: tree basal area and density .xlsx default: none
+        :use_cache: use/update caches default: True
+        :returns: SpeciesDensity
+        """
+        shrub = tree = None
+        if shrub_file is not None:
+            shrub = SpeciesRecords.load(shrub_file, SHRUB_KIND, use_cache=use_cache)
+        if tree_file is not None:
+            tree = SpeciesRecords.load(tree_file, TREE_KIND, use_cache=use_cache)
+        density = cls(shrub=shrub, tree=tree)
+        SlTrace.lg(f"Species density: {len(density.plot_keys)} plots"
+                   f" {len(density.species)} species", "species")
+        return density
+
+    def _record_idxs(self, records):
+        plot_idxs = np.searchsorted(self.plot_keys, records.plot_keys)
+        species_idxs = np.searchsorted(self.species, records.species)
+        return plot_idxs, species_idxs
+
+    def _matrix(self, records, values):
+        """ Dense plot x species matrix of record values
+        Duplicate (plot, species) records are summed
+        """
+        matrix = np.zeros((len(self.plot_keys), len(self.species)))
+        if len(records) > 0:
+            plot_idxs, species_idxs = self._record_idxs(records)
+            np.add.at(matrix, (plot_idxs, species_idxs), np.nan_to_num(values))
+        return matrix
+
+    def _sector_matrix(self, records):
+        """ plot x species x sector matrix of individuals
+        """
+        matrix = np.zeros((len(self.plot_keys), len(self.species),
+                           SpeciesRecords.N_SECTORS))
+        if len(records) > 0:
+            plot_idxs, species_idxs = self._record_idxs(records)
+            np.add.at(matrix, (plot_idxs, species_idxs), records.sectors)
+        return matrix
+
+    def join_points(self, sample_file):
+        """ Join plots to sample plot points (plot centers)
+        :sample_file: SampleFile, with points loaded
+        :returns: number of plots with a point
+        """
+        self.points = [None] * len(self.plot_keys)
+        self.point_lats[:] = np.nan
+        self.point_longs[:] = np.nan
+        njoined = 0
+        for point in sample_file.get_points():
+            plot_idx = self.plot_index.get(point.get_plot_key())
+            if plot_idx is None:
+                continue
+            self.points[plot_idx] = point
+            self.point_lats[plot_idx] = point.lat
+            self.point_longs[plot_idx] = point.long
+            njoined += 1
+        if njoined < len(self.plot_keys):
+            missing = [str(key) for key, point in zip(self.plot_keys, self.points)
+                       if point is None]
+            SlTrace.lg(f"Species plots without sample point: {' '.join(missing)}")
+        return njoined
+
+    def get_plot_keys(self):
+        return self.plot_keys
+
+    def get_species(self):
+        """ Species names, sorted
+        """
+        return self.species
+
+    def get_measure(self, measure="shrub_count"):
+        """ plot x species matrix of measure
+        :measure: "shrub_count", "tree_count", "tree_basal", or "count"
+                (shrub + tree individuals)
+                default: shrub_count
+        """
+        if measure == "shrub_count":
+            return self.shrub_counts
+        if measure == "tree_count":
+            return self.tree_counts
+        if measure == "tree_basal":
+            return self.tree_basal
+        if measure == "count":
+            return self.shrub_counts + self.tree_counts
+        raise SelectError(f"Unrecognized species measure: {measure}")
+
+    def find_species(self, species):
+        """ Workbook species for name
+        :species: scientific name, as in the workbooks, or common name
+                e.g. "Norway Maple" - a genus (e.g. Apple, "Malus species")
+                is all of the genus' species
+        :returns: list of species indexes (into get_species())
+                SelectError raised if no species matches
+        """
+        name = species_name(species)
+        if name is None:
+            raise SelectError(f"No species name: {species!r}")
+        si = self.species_index.get(name)
+        if si is not None:
+            return [si]
+
+        scientific = COMMON_NAMES.get(name_key(name), name)
+        words = scientific.split()
+        if len(words) == 2 and name_key(words[1]) in GENUS_WORDS:
+            genus = words[0].lower()
+            sis = [i for i, sp_name in enumerate(self.species)
+                   if str(sp_name).split()[0].lower() == genus]
+        else:
+            key = name_key(scientific)
+            sis = [i for i, sp_name in enumerate(self.species)
+                   if name_key(str(sp_name)) == key]
+        if len(sis) == 0:
+            raise SelectError(f"Species {species!r} not found in species workbooks")
+        return sis
+
+    def get_species_values(self, species, measure="shrub_count"):
+        """ Measure of species, by plot
+        :species: species name, scientific or common (see find_species)
+        :measure: measure (see get_measure)
+        :returns: array, aligned with get_plot_keys(), summed over
+                matching species - SelectError raised if none match
+        """
+        sis = self.find_species(species)
+        return self.get_measure(measure)[:, sis].sum(axis=1)
+
+    def get_plot_values(self, plot_key, measure="shrub_count"):
+        """ Measure of each species present in plot
+        :plot_key: plot key e.g. 1-3
+        :measure: measure (see get_measure)
+        :returns: dictionary by species name of value
+        """
+        plot_idx = self.plot_index.get(plot_key)
+        if plot_idx is None:
+            return {}
+        row = self.get_measure(measure)[plot_idx]
+        return {str(self.species[si]) : float(row[si]) for si in np.nonzero(row)[0]}
+
+    def get_plot_sectors(self, plot_key, species):
+        """ Individuals by octagonal sector
+        :returns: array of N_SECTORS counts, None if not found
+        """
+        plot_idx = self.plot_index.get(plot_key)
+        si = self.species_index.get(species_name(species))
+        if plot_idx is None or si is None:
+            return None
+        return self.shrub_sectors[plot_idx, si]
+
+    def get_totals(self, measure="shrub_count"):
+        """ Total measure per species, over all plots
+        :returns: array aligned with get_species()
+        """
+        return self.get_measure(measure).sum(axis=0)
+
+    def get_plot_totals(self, measure="shrub_count"):
+        """ Total measure per plot, over all species
+        :returns: array aligned with get_plot_keys()
+        """
+        return self.get_measure(measure).sum(axis=1)
+
+    def get_richness(self):
+        """ Number of species present, per plot
+        """
+        return np.count_nonzero(self.shrub_counts + self.tree_counts, axis=1)
+
+    def get_symbology(self, species=None, measure="shrub_count"):
+        """ Values for map display at the sample plot points
+        :species: species name, scientific or common (see find_species)
+                default: all species
+        :measure: measure (see get_measure)
+        :returns: (lats, longs, values, plot_keys) arrays, for plots
+                joined to a sample point (see join_points)
+        """
+        if species is None:
+            values = self.get_plot_totals(measure)
+        else:
+            values = self.get_species_values(species, measure)
+        joined = ~np.isnan(self.point_lats)
+        return (self.point_lats[joined], self.point_longs[joined],
+                values[joined], self.plot_keys[joined])
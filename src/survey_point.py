@@ -5,17 +5,22 @@ Handling point display aspect for points in SurveyPointManager
 from select_trace import SlTrace
 
 from select_trace import SelectError
+from survey_point_store import PointStore
 
 class SurveyPoint:
     """ Point objects used for doing surveying type operations
     .e.g. distance, direction, area, circumferance measurements
+    Location and display attributes are held in the manager's
+    PointStore; the point object is a view (store, idx) plus
+    display tags.
     """
     
     POINT_TYPE_NONE = 1
     POINT_TYPE_CIRCLE = 2
     POINT_TYPE_SQUARE = 3
     POINT_TYPE_CROSS = 4
-    point_id = 0                # Unique id
+    __slots__ = ("mgr", "store", "idx", "_show_item",
+                 "point_tag", "center_tag", "label_tag", "trackers")
             
     def __init__(self, mgr, lat=None, long=None,
                  label=None, label_size=None,
@@ -55,17 +60,9 @@ class SurveyPoint:
         """
         
         self.mgr = mgr
-        self.lat = lat
-        self.long = long
         if label is None:
             label = f"{mgr.label}{self.mgr.label_no}" 
             self.mgr.label_no += 1
-        self.label = label
-        self.label_displayed = label_displayed
-        self.displayed = displayed
-        if show_item is None:
-            show_item = f"{label}:  lat={lat} long={long}"
-        self.show_item = show_item
         if lat is None:
             raise SelectError(f"SurveyPoing {label} lat is missing")
         
@@ -74,31 +71,149 @@ class SurveyPoint:
         
         if label_size is None:
             label_size = mgr.label_size 
-        self.label_size = label_size
         if display_size is None:
             display_size = mgr.display_size
-        self.display_size = display_size
         if select_size is None:
             select_size = mgr.select_size
-        self.select_size = select_size
         if point_type is None:
             point_type = mgr.point_type
-        self.point_type = point_type
         if center_color is None:
             center_color = mgr.center_color
-        self.center_color = center_color
         if color is None:
             color = mgr.color
-        self.color = color
         if point_id is None:
             mgr.point_id += 1
             point_id = mgr.point_id
-        self.point_id = point_id
+        self.store = mgr.get_point_store()
+        self.idx = self.store.add(lat, long, label, point_id,
+                                  color=color, center_color=center_color,
+                                  displayed=displayed,
+                                  label_displayed=label_displayed,
+                                  point_type=point_type,
+                                  label_size=label_size,
+                                  display_size=display_size,
+                                  select_size=select_size)
+        self._show_item = show_item     # None - generated when requested
         
         self.point_tag = None       # point iodraw tag
         self.center_tag = None      # point center tag
         self.label_tag = None       # point label tag
-        self.trackers = []          # list of trackers if any
+        self.trackers = None        # list of trackers if any
+
+    """
+    Attributes kept in the point store
+    """
+    @property
+    def lat(self):
+        return float(self.store.lat[self.idx])
+
+    @lat.setter
+    def lat(self, lat):
+        self.store.lat[self.idx] = lat
+        self.store.moved(self.idx)
+
+    @property
+    def long(self):
+        return float(self.store.long[self.idx])
+
+    @long.setter
+    def long(self, long):
+        self.store.long[self.idx] = long
+        self.store.moved(self.idx)
+
+    @property
+    def label(self):
+        return self.store.get_label(self.idx)
+
+    @label.setter
+    def label(self, label):
+        self.store.set_label(self.idx, label)
+
+    @property
+    def point_id(self):
+        return int(self.store.point_id[self.idx])
+
+    @property
+    def color(self):
+        return self.store.get_color(self.idx)
+
+    @color.setter
+    def color(self, color):
+        self.store.set_color(self.idx, color)
+
+    @property
+    def center_color(self):
+        return self.store.get_center_color(self.idx)
+
+    @center_color.setter
+    def center_color(self, color):
+        self.store.set_center_color(self.idx, color)
+
+    @property
+    def displayed(self):
+        return self.store.get_flag(self.idx, PointStore.FLAG_DISPLAYED)
+
+    @displayed.setter
+    def displayed(self, displayed):
+        self.store.set_flag(self.idx, PointStore.FLAG_DISPLAYED, displayed)
+
+    @property
+    def label_displayed(self):
+        return self.store.get_flag(self.idx, PointStore.FLAG_LABEL_DISPLAYED)
+
+    @label_displayed.setter
+    def label_displayed(self, label_displayed):
+        self.store.set_flag(self.idx, PointStore.FLAG_LABEL_DISPLAYED,
+                            label_displayed)
+
+    @property
+    def point_type(self):
+        return int(self.store.point_type[self.idx])
+
+    @point_type.setter
+    def point_type(self, point_type):
+        self.store.point_type[self.idx] = point_type
+
+    @property
+    def label_size(self):
+        return float(self.store.label_size[self.idx])
+
+    @label_size.setter
+    def label_size(self, label_size):
+        self.store.label_size[self.idx] = label_size
+
+    @property
+    def display_size(self):
+        return float(self.store.display_size[self.idx])
+
+    @display_size.setter
+    def display_size(self, display_size):
+        self.store.display_size[self.idx] = display_size
+
+    @property
+    def select_size(self):
+        return float(self.store.select_size[self.idx])
+
+    @select_size.setter
+    def select_size(self, select_size):
+        self.store.select_size[self.idx] = select_size
+
+    @property
+    def show_item(self):
+        """ Selection list text, generated on first use if not given
+        """
+        if self._show_item is None:
+            return f"{self.label}:  lat={self.lat} long={self.long}"
+        return self._show_item
+
+    @show_item.setter
+    def show_item(self, show_item):
+        self._show_item = show_item
+
+    def has_show_item(self):
+        """ Check if show_item was supplied (or already generated)
+        """
+        return self._show_item is not None
 
     def __str__(self):
         """ Point diagnostic representation
@@ -291,13 +406,16 @@ class SurveyPoint:
         self.lat = pc.lat 
         self.long = pc.long 
         self.display()
-        for tracker in self.trackers:            
-            tracker(self)
+        if self.trackers is not None:
+            for tracker in self.trackers:            
+                tracker(self)
 
     def add_tracker(self, tracker):
         """ Add tracking function
         :tracker: tracking function to be called with self
         """
+        if self.trackers is None:
+            self.trackers = []
         self.trackers.append(tracker)
         
     def is_in(self, lat=None, long=None):
@@ -0,0 +1,329 @@
+# survey_point_store.py    19Oct2026  crs
+"""
+Columnar storage for survey points
+
+Point location and the small per-point display attributes are kept in
+contiguous numpy arrays, one entry per point, so that bulk operations
+(moving, bounding, distance calculations) can work on whole columns
+instead of walking a list of Python objects.  Strings (labels, colors)
+are interned in tables and referenced by index.
+
+SurveyPoint is a light view: (store, index) into a PointStore.
+
+Points may be put in a group (e.g. a trail segment), whose move count
+is incremented whenever one of its points moves, so the group's
+derived data can be checked without looking at all points.
+"""
+import numpy as np
+
+from select_trace import SlTrace
+from select_error import SelectError
+
+
+class PointStore:
+    """ Array backed point attributes
+    """
+    FLAG_DISPLAYED = 0x01           # Point is displayed
+    FLAG_LABEL_DISPLAYED = 0x02     # Label is displayed, if point is displayed
+    FLAG_DELETED = 0x80             # Slot no longer in use
+
+    def __init__(self, capacity=None):
+        """ Setup empty store
+        :capacity: initial number of point slots
+                default: 1024
+        """
+        if capacity is None:
+            capacity = 1024
+        if capacity < 1:
+            capacity = 1
+        self.n = 0                  # Number of slots in use
+        self.version = 0            # Incremented when any location changes
+        self.lat = np.zeros(capacity, dtype=np.float64)
+        self.long = np.zeros(capacity, dtype=np.float64)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.color_idx = np.zeros(capacity, dtype=np.int32)
+        self.center_color_idx = np.zeros(capacity, dtype=np.int32)
+        self.label_idx = np.zeros(capacity, dtype=np.int32)
+        self.point_id = np.zeros(capacity, dtype=np.int64)
+        self.point_type = np.zeros(capacity, dtype=np.uint8)
+        self.label_size = np.zeros(capacity, dtype=np.float32)
+        self.display_size = np.zeros(capacity, dtype=np.float32)
+        self.select_size = np.zeros(capacity, dtype=np.float32)
+        self.moves = np.zeros(capacity, dtype=np.uint32)    # Moves of point
+        self.group = np.zeros(capacity, dtype=np.int32)     # -1: none
+        self.next_group = 0         # Group numbers are not reused
+        self.group_moves = {}       # Move count, by group number
+        self.colors = []            # Interned color strings
+        self.colors_idx = {}        # by color string
+        self.labels = []            # Interned label strings
+        self.labels_idx = {}        # by label string
+
+    def __len__(self):
+        return self.n
+
+    def columns(self):
+        """ Names of per-point array columns
+        """
+        return ("lat", "long", "flags", "color_idx", "center_color_idx",
+                "label_idx", "point_id", "point_type",
+                "label_size", "display_size", "select_size",
+                "moves", "group")
+
+    def capacity(self):
+        return len(self.lat)
+
+    def reserve(self, capacity):
+        """ Make sure there is room for at least capacity points
+        Grows by doubling to keep appends amortized constant time
+        :capacity: number of points needed
+        """
+        cur_cap = self.capacity()
+        if capacity <= cur_cap:
+            return
+
+        new_cap = cur_cap
+        while new_cap < capacity:
+            new_cap *= 2
+        SlTrace.lg(f"PointStore: growing from {cur_cap} to {new_cap} points",
+                   "point_store")
+        for name in self.columns():
+            old = getattr(self, name)
+            new = np.zeros(new_cap, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def intern_color(self, color):
+        """ Get index of color string, adding if new
+        :color: color string
+        :returns: index in color table
+        """
+        if color in self.colors_idx:
+            return self.colors_idx[color]
+
+        idx = len(self.colors)
+        self.colors.append(color)
+        self.colors_idx[color] = idx
+        return idx
+
+    def intern_label(self, label):
+        """ Get index of label string, adding if new
+        :label: point label
+        :returns: index in label table
+        """
+        if label in self.labels_idx:
+            return self.labels_idx[label]
+
+        idx = len(self.labels)
+        self.labels.append(label)
+        self.labels_idx[label] = idx
+        return idx
+
+    def add(self, lat, long, label, point_id,
+            color=None, center_color=None,
+            displayed=True, label_displayed=True,
+            point_type=0, label_size=0, display_size=0, select_size=0):
+        """ Add point attributes to store
+        :lat, long: point latitude, longitude
+        :label: point label
+        :point_id: unique point id
+        :color, center_color: color strings
+        :displayed, label_displayed: display flags
+        :point_type, label_size, display_size, select_size:
+                see SurveyPoint
+        :returns: index of point in store
+        """
+        if lat is None or long is None:
+            raise SelectError(f"PointStore: point {label} missing lat/long")
+
+        self.reserve(self.n + 1)
+        idx = self.n
+        self.n += 1
+        self.lat[idx] = lat
+        self.long[idx] = long
+        self.version += 1
+        flags = 0
+        if displayed:
+            flags |= PointStore.FLAG_DISPLAYED
+        if label_displayed:
+            flags |= PointStore.FLAG_LABEL_DISPLAYED
+        self.flags[idx] = flags
+        self.color_idx[idx] = self.intern_color(color)
+        self.center_color_idx[idx] = self.intern_color(center_color)
+        self.label_idx[idx] = self.intern_label(label)
+        self.point_id[idx] = point_id
+        self.point_type[idx] = point_type
+        self.label_size[idx] = label_size
+        self.display_size[idx] = display_size
+        self.select_size[idx] = select_size
+        self.moves[idx] = 0
+        self.group[idx] = -1
+        return idx
+
+    def copy_point(self, src, idx):
+        """ Add copy of another store's point e.g. compacting a store
+        The copy is in no group
+        :src: store holding point
+        :idx: point index in src
+        :returns: index of point in store
+        """
+        self.reserve(self.n + 1)
+        new_idx = self.n
+        self.n += 1
+        for name in self.columns():
+            getattr(self, name)[new_idx] = getattr(src, name)[idx]
+        self.color_idx[new_idx] = self.intern_color(src.get_color(idx))
+        self.center_color_idx[new_idx] = self.intern_color(src.get_center_color(idx))
+        self.label_idx[new_idx] = self.intern_label(src.get_label(idx))
+        self.group[new_idx] = -1
+        self.version += 1
+        return new_idx
+
+    def release(self, idx):
+        """ Mark slot as no longer in use
+        Slots are not reused so existing views stay valid, they are
+        dropped when the store is compacted
+        (SurveyPointManager.compact_point_store)
+        :idx: point index
+        """
+        self.flags[idx] |= PointStore.FLAG_DELETED
+
+    def restore(self, idx):
+        """ Return released slot to use e.g. undoing a point removal
+        :idx: point index
+        """
+        self.flags[idx] &= ~PointStore.FLAG_DELETED
+
+    def is_released(self, idx):
+        return (self.flags[idx] & PointStore.FLAG_DELETED) != 0
+
+    def get_flag(self, idx, flag):
+        return (self.flags[idx] & flag) != 0
+
+    def set_flag(self, idx, flag, value=True):
+        if value:
+            self.flags[idx] |= flag
+        else:
+            self.flags[idx] &= ~flag & 0xff
+
+    def get_color(self, idx):
+        return self.colors[self.color_idx[idx]]
+
+    def set_color(self, idx, color):
+        self.color_idx[idx] = self.intern_color(color)
+
+    def get_center_color(self, idx):
+        return self.colors[self.center_color_idx[idx]]
+
+    def set_center_color(self, idx, color):
+        self.center_color_idx[idx] = self.intern_color(color)
+
+    def get_label(self, idx):
+        return self.labels[self.label_idx[idx]]
+
+    def set_label(self, idx, label):
+        self.label_idx[idx] = self.intern_label(label)
+
+    def get_lat_long(self, idx):
+        return float(self.lat[idx]), float(self.long[idx])
+
+    def set_lat_long(self, idx, lat, long):
+        self.lat[idx] = lat
+        self.long[idx] = long
+        self.moved(idx)
+
+    def moved(self, idx):
+        """ Note point location change
+        :idx: point index
+        """
+        self.version += 1
+        self.moves[idx] += 1
+        group = int(self.group[idx])
+        if group >= 0:
+            self.group_moves[group] = self.group_moves.get(group, 0) + 1
+
+    def new_group(self):
+        """ Start a new point group
+        :returns: group number
+        """
+        group = self.next_group
+        self.next_group += 1
+        self.group_moves[group] = 0
+        return group
+
+    def set_group(self, idx, group):
+        """ Put point in group, replacing any previous group
+        :idx: point index
+        :group: group number from new_group, -1 for none
+        """
+        self.group[idx] = group
+
+    def get_group_moves(self, group):
+        """ Number of moves of group's points
+        :group: group number
+        """
+        return self.group_moves.get(group, 0)
+
+    def get_lats(self, idxs=None):
+        """ Latitude column
+        :idxs: index array/list default: all points in use
+        :returns: array of latitudes (view if idxs is None)
+        """
+        if idxs is None:
+            return self.lat[:self.n]
+        return self.lat[np.asarray(idxs, dtype=np.int64)]
+
+    def get_longs(self, idxs=None):
+        """ Longitude column
+        :idxs: index array/list default: all points in use
+        :returns: array of longitudes (view if idxs is None)
+        """
+        if idxs is None:
+            return self.long[:self.n]
+        return self.long[np.asarray(idxs, dtype=np.int64)]
+
+    def get_lat_longs(self, idxs=None):
+        """ Get lat, long pairs
+        :idxs: index array/list default: all points in use
+        :returns: n x 2 array of latitude, longitude
+        """
+        return np.column_stack((self.get_lats(idxs), self.get_longs(idxs)))
+
+    def live_idxs(self):
+        """ Indexes of all points not released
+        """
+        return np.nonzero((self.flags[:self.n] & PointStore.FLAG_DELETED) == 0)[0]
+
+    def translate(self, d_lat=0., d_long=0., idxs=None):
+        """ Move group of points
+        :d_lat: latitude change
+        :d_long: longitude change
+        :idxs: points to move default: all live points
+        """
+        if idxs is None:
+            idxs = self.live_idxs()
+        idxs = np.asarray(idxs, dtype=np.int64)
+        self.lat[idxs] += d_lat
+        self.long[idxs] += d_long
+        self.version += 1
+        self.moves[idxs] += 1
+        for group in np.unique(self.group[idxs]):
+            if group >= 0:
+                group = int(group)
+                self.group_moves[group] = self.group_moves.get(group, 0) + 1
+
+    def min_max_ll(self, idxs=None):
+        """ Bounds of points
+        :idxs: points of interest default: all live points
+        :returns: min_lat, max_lat, min_long, max_long
+                None if no points
+        """
+        if idxs is None:
+            idxs = self.live_idxs()
+        idxs = np.asarray(idxs, dtype=np.int64)
+        if len(idxs) == 0:
+            return None
+
+        lats = self.lat[idxs]
+        longs = self.long[idxs]
+        return (float(lats.min()), float(lats.max()),
+                float(longs.min()), float(longs.max()))
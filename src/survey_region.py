@@ -2,7 +2,10 @@
 """ Region object similar, but simpler than SelectRegion (crs_dots)
 A region is composed of a connected set of edges surrounding a contiguous area
 """
-from select_trace import SelectError
+import numpy as np
+from geographiclib.geodesic import Geodesic
+
+from select_trace import SlTrace, SelectError
 
 from survey_edge import SurveyEdge
 
@@ -16,6 +19,11 @@ class SurveyRegion:
         self.points = []    # List of points
         self.completed = False
         self.tracked = []   # tracked in this region
+        self.prepared = None    # Polygon index (PreparedPolygon), when built
+        self.prepared_version = None    # get_version() when index was built
+        self.version = 0        # Incremented when points / edges change
+        self.metrics = {}       # Cached area, perimeter, bearing
+        self.memberships = {}   # Cached layer membership by layer name
         
     def add_points(self, *points):
         """ Add zero or more points to end of region
@@ -33,6 +41,7 @@ class SurveyRegion:
                 pts = [pts]     # Make list of one
             for point in pts:
                 self.points.append(point)
+        self.changed()
         
     def add_edges(self, *edges):
         """ Add edge(s) to Region
@@ -43,6 +52,25 @@ class SurveyRegion:
                 eds = [eds]     # Make list of one
             for edge in eds:
                 self.edges.append(edge)
+        self.changed()
+
+    def changed(self):
+        """ Note region's points / edges changed, dropping cached index
+        """
+        self.version += 1
+        self.prepared = None
+
+    def get_version(self):
+        """ Region version, including moves of the region's points
+        Only our points are checked, so moving other points
+        doesn't change it
+        :returns: (region version, our points' moves)
+        """
+        if any(getattr(pt, "store", None) is None for pt in self.points):
+            return (self.version,       # Not stored points - use locations
+                    tuple((pt.lat, pt.long) for pt in self.points))
+        return (self.version,
+                sum(int(pt.store.moves[pt.idx]) for pt in self.points))
 
     def add_tracked(self, tracked):
         """ Keep track of region tracked(edges)
@@ -65,7 +93,7 @@ class SurveyRegion:
                 if prev_point is not None:
                     edge = SurveyEdge(self.mgr, prev_point, point)
                     self.add_edges(edge)
-                    prev_point = point
+                prev_point = point
         self.add_edges(SurveyEdge(self.mgr, self.points[-1], self.points[0]))            
         self.completed = True
         return True
@@ -74,12 +102,93 @@ class SurveyRegion:
         """ get region rotation
             assume direction p2 -> p1
         """
-        pts = self.get_points()
-        
-        p1, p2 = pts[0], pts[1]
-        from GeoDraw import get_bearing
-        bearing = get_bearing(p2, p1)
-        return bearing
+        self.get_prepared()         # Clears cache if region changed
+        if "bearing" not in self.metrics:
+            pts = self.get_points()
+            p1, p2 = pts[0], pts[1]
+            from GeoDraw import get_bearing
+            self.metrics["bearing"] = get_bearing(p2, p1)
+        return self.metrics["bearing"]
+
+    def get_area(self):
+        """ Geodesic (WGS84) area enclosed by region
+        :returns: area in square meters
+        """
+        return self.get_geodesic_metrics()[0]
+
+    def get_perimeter(self):
+        """ Geodesic (WGS84) length of region boundary
+        :returns: perimeter in meters
+        """
+        return self.get_geodesic_metrics()[1]
+
+    def get_geodesic_metrics(self):
+        """ Get, computing if not cached, area and perimeter
+        :returns: (area, perimeter) in square meters, meters
+        """
+        self.get_prepared()
+        if "area" not in self.metrics:
+            segs = self.get_boundary_segments()
+            poly = Geodesic.WGS84.Polygon()
+            for lat, long in segs[:, :2]:
+                poly.AddPoint(lat, long)
+            _, perimeter, area = poly.Compute(False, True)
+            self.metrics["area"] = abs(area)      # Negative if clockwise
+            self.metrics["perimeter"] = perimeter
+            SlTrace.lg(f"Region area: {abs(area):.1f} sq m perimeter: {perimeter:.1f}m",
+                       "region_metrics")
+        return self.metrics["area"], self.metrics["perimeter"]
+
+    def get_layer_mask(self, layer, points, version=None):
+        """ Get membership of layer's points in region
+        Kept as a bitmap per layer, until the region changes or the
+        layer's version changes (see also clear_layer)
+        :layer: layer name e.g. "trails", "samples"
+        :points: layer's points (each with .lat, .long)
+        :version: layer version e.g. SurveyTrail.get_version(),
+                changed by any change to the layer's points
+                default: no caching - membership is recomputed
+        :returns: boolean array, True if point is inside
+        """
+        self.get_prepared()
+        npts = len(points)
+        if version is not None and layer in self.memberships:
+            n_bits, bits_version, bits = self.memberships[layer]
+            if n_bits == npts and bits_version == version:
+                return np.unpackbits(bits, count=npts).astype(bool)
+
+        lats = np.fromiter((pt.lat for pt in points), dtype=np.float64, count=npts)
+        longs = np.fromiter((pt.long for pt in points), dtype=np.float64, count=npts)
+        mask = self.get_inside_mask(lats, longs)
+        if version is not None:
+            self.memberships[layer] = (npts, version, np.packbits(mask))
+        return mask
+
+    def get_layer_points(self, layer, points, version=None):
+        """ Get layer's points inside region, using cached membership
+        :layer: layer name
+        :points: layer's points
+        :version: layer version (see get_layer_mask)
+        :returns: list of points within region
+        """
+        mask = self.get_layer_mask(layer, points, version=version)
+        return [points[i] for i in np.nonzero(mask)[0]]
+
+    def get_layer_count(self, layer, points, version=None):
+        """ Number of layer's points inside region
+        :version: layer version (see get_layer_mask)
+        """
+        return int(np.count_nonzero(self.get_layer_mask(layer, points,
+                                                         version=version)))
+
+    def clear_layer(self, layer=None):
+        """ Drop cached layer membership e.g. when layer's points change
+        :layer: layer name default: all layers
+        """
+        if layer is None:
+            self.memberships = {}
+        elif layer in self.memberships:
+            del self.memberships[layer]
         
     def get_points(self):
         """ Get points in region's perimeter possibility not complete
@@ -152,9 +261,44 @@ class SurveyRegion:
         """
         min_x, min_y, max_x, max_y = self.min_max_xy()
         return (min_x,min_y), (max_x, max_y)
+
+    def get_prepared(self):
+        """ Get polygon index, (re)building it if the region
+        changed or any point moved (see get_version)
+        :returns: PreparedPolygon
+        """
+        version = self.get_version()
+        if self.prepared is None or self.prepared_version != version:
+            self.prepared = PreparedPolygon(self.get_boundary_segments())
+            self.prepared_version = version
+            self.metrics = {}
+            self.memberships = {}
+        return self.prepared
+
+    def get_boundary_segments(self):
+        """ Get region boundary as line segments
+        From edges, if any, else from points in order, closed
+        :returns: array (n x 4) of lat1, long1, lat2, long2
+        """
+        pairs = []
+        if len(self.edges) > 0:
+            for edge in self.edges:
+                edge_points = edge.get_points()
+                for i in range(1, len(edge_points)):
+                    pairs.append((edge_points[i-1], edge_points[i]))
+        else:
+            pts = self.points
+            for i in range(len(pts)):
+                pairs.append((pts[i-1], pts[i]))
+        segs = np.empty((len(pairs), 4), dtype=np.float64)
+        for i, (p1, p2) in enumerate(pairs):
+            segs[i] = (p1.lat, p1.long, p2.lat, p2.long)
+        return segs
+
     def is_inside(self, point=None, latLong=None):
         """ Test if point is within region
-        Initially must an approximation: within min/max latitude longitude
+        The region is treated as a polygon in latitude, longitude,
+        bounded by its edges (or, if no edges yet, its points in order)
         :point, latitude, longitude pair
             OR
         :latLong: latitude, latitude pair
@@ -162,27 +306,107 @@ class SurveyRegion:
         """
         if point is not None and latLong is not None:
             raise SelectError("Can't have point AND latLong")
-        min_lat, max_lat, min_long, max_long = self.min_max_ll()
         if latLong is not None:
             lat, long = latLong
         else:
             lat, long = point.lat, point.long
-        if (lat >= min_lat and lat <= max_lat
-            and long >= min_long and long <= max_long):
-            return True
-        
-        return False
+        return self.get_prepared().contains(lat, long)
+
+    def get_inside_mask(self, lats, longs):
+        """ Test array of locations
+        :lats, longs: arrays of latitude, longitude
+        :returns: boolean array, True if inside
+        """
+        return self.get_prepared().contains_array(lats, longs)
     
     def get_inside_points(self, points):
         """ return list of points within region
         :points: points (each point must have point.lat, point.long    
-        Initially must an approximation: within min/max latitude longitude
-        :latLong, latitude, longitude pair
         :returns: list of points within region
         """
-        inside_points = []
-        for point in points:
-            if self.is_inside(point):
-                inside_points.append(point)
-                
-        return inside_points
\ No newline at end of file
+        npts = len(points)
+        if npts == 0:
+            return []
+        
+        lats = np.fromiter((pt.lat for pt in points), dtype=np.float64, count=npts)
+        longs = np.fromiter((pt.long for pt in points), dtype=np.float64, count=npts)
+        inside = self.get_inside_mask(lats, longs)
+        return [points[i] for i in np.nonzero(inside)[0]]
+
+
+class PreparedPolygon:
+    """ Point in polygon index
+    Boundary segments are sorted into horizontal (latitude) slabs
+    between successive vertex latitudes, so a test only looks at the
+    segments crossing the point's slab.  A bounding box check comes first.
+    Test is crossing number (even-odd) with longitude as x, latitude as y
+    """
+    def __init__(self, segs):
+        """ Build index
+        :segs: array (n x 4) of lat1, long1, lat2, long2
+        """
+        self.segs = segs.copy()
+        if len(segs) == 0:
+            self.bbox = None
+            return
+        
+        lats = np.concatenate((segs[:,0], segs[:,2]))
+        longs = np.concatenate((segs[:,1], segs[:,3]))
+        self.bbox = (lats.min(), lats.max(), longs.min(), longs.max())
+        self.slab_lats = np.unique(lats)         # Slab boundaries
+        seg_lo = np.minimum(segs[:,0], segs[:,2])
+        seg_hi = np.maximum(segs[:,0], segs[:,2])
+        self.slab_segs = []                     # segment indexes per slab
+        for i in range(len(self.slab_lats)-1):
+            mid = (self.slab_lats[i] + self.slab_lats[i+1])/2
+            self.slab_segs.append(np.nonzero((seg_lo <= mid) & (seg_hi > mid))[0])
+
+    def is_same(self, segs):
+        """ Check if index was built from these segments
+        """
+        return self.segs.shape == segs.shape and np.array_equal(self.segs, segs)
+
+    def get_bbox(self):
+        """ Bounding box
+        :returns: (min_lat, max_lat, min_long, max_long), None if empty
+        """
+        return self.bbox
+
+    def contains(self, lat, long):
+        """ Test if location is inside
+        :lat, long: location
+        :returns: True if inside
+        """
+        return bool(self.contains_array(np.array([lat]), np.array([long]))[0])
+
+    def contains_array(self, lats, longs):
+        """ Test array of locations
+        :lats, longs: arrays of latitude, longitude
+        :returns: boolean array, True if inside
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        longs = np.asarray(longs, dtype=np.float64)
+        inside = np.zeros(len(lats), dtype=bool)
+        if self.bbox is None or len(self.slab_segs) == 0:
+            return inside
+        
+        min_lat, max_lat, min_long, max_long = self.bbox
+        cand = np.nonzero((lats >= min_lat) & (lats < max_lat)
+                          & (longs >= min_long) & (longs <= max_long))[0]
+        if len(cand) == 0:
+            return inside
+        
+        slabs = np.searchsorted(self.slab_lats, lats[cand], side="right") - 1
+        for slab in np.unique(slabs):
+            seg_idxs = self.slab_segs[slab]
+            if len(seg_idxs) == 0:
+                continue
+            pts = cand[slabs == slab]
+            y = lats[pts][:, None]
+            x = longs[pts][:, None]
+            segs = self.segs[seg_idxs]
+            y1, x1, y2, x2 = segs[:,0], segs[:,1], segs[:,2], segs[:,3]
+            x_cross = x1 + (y - y1)*(x2 - x1)/(y2 - y1)   # slab segments are not horizontal
+            crossings = np.count_nonzero(x_cross > x, axis=1)
+            inside[pts] = (crossings % 2) == 1
+        return inside
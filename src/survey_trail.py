@@ -1,10 +1,17 @@
 # survey_trail.py    14May2020    crs
 """ Information / support for trail loading, presentation, modification, and saving
 """
-from select_trace import SelectError
+import numpy as np
+
+from select_trace import SlTrace, SelectError
 
 from gpx_file import GPXFile, GPXPoint, GPXTrackSegment
+from gpx_stream import GPXStreamReader
+from trail_cache import TrailCache
+from trail_journal import TrailJournal
 from survey_trail_segment import SurveyTrailSegment
+from trail_query import TrailQuery
+from trail_network import TrailNetwork
 from survey_point import SurveyPoint
 
 class SurveyTrail:
@@ -16,7 +23,9 @@ class SurveyTrail:
         """ Region object
         :mgr: point manager, None if none needed
         :basis: basis e.g. GPXFile, SampleFile
-            default: GPXFile
+            default: GPXFile, with the track read by the
+                    streaming reader (GPXStreamReader) if file_name
+                    is given
         :filename: file to load, if present
         :label_pattern: pattern for point's labeling
                 default: "t%d.%d" % (seg_no, point_no)
@@ -32,6 +41,10 @@ class SurveyTrail:
         self.file_name = file_name
         self.title = file_name      # default title
         self.is_show_points = show_points
+        self.query = None           # TrailQuery, built when requested
+        self.network = None         # TrailNetwork, built when requested
+        self.journal = None         # TrailJournal, of edits since last save
+        self.use_stream = basis is None and file_name is not None
         if basis is None:
             basis = GPXFile()
         self.basis = basis
@@ -46,7 +59,11 @@ class SurveyTrail:
 
     def delete(self):
         """ Remove trail
+        Trail file edits are already in the journal
         """
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None     # Point removal isn't a trail edit
         for segment in self.get_segments():
             segment.delete()
         self.segments = []
@@ -93,39 +110,148 @@ class SurveyTrail:
                 
     def load_file(self, file_name=None):
         """ Load file
+        Point show_item text is not created here - see get_show_item
+        Edits journaled since the file was saved are replayed,
+        including to segments added (add_new_segment) since
         :file_name: file to load, if present
         """
+        self.segments = []
+        if self.use_stream:
+            self.file_name = file_name
+            file_segments = self.iter_stream_segments(file_name)
+        else:
+            basis = self.basis       
+            basis.load_file(file_name)
+            self.file_name = basis.file_name
+            file_segments = []
+            for file_segment in basis.get_segments():
+                file_points = file_segment.get_points()
+                file_segments.append(([file_point.lat for file_point in file_points],
+                                      [file_point.long for file_point in file_points],
+                                      None))
+        edits = {}
+        if self.file_name is not None:
+            self.journal = TrailJournal(self.file_name)
+            edits = self.journal.read_by_segment()
+        for seg_no, (lats, longs, times) in enumerate(file_segments, start=1):
+            records = edits.pop(seg_no, None)
+            if records is not None:
+                lats, longs = self.journal.replay_segment(lats, longs, records)
+            if times is not None and len(times) != len(lats):
+                times = None        # Points inserted / deleted since
+            self.load_segment(seg_no, lats, longs, times=times)
+        for seg_no in sorted(edits):
+            if seg_no <= len(self.segments):
+                SlTrace.lg(f"Trail journal {self.journal.journal_name}:"
+                           f" ignoring edits to segment {seg_no}")
+                continue
+                
+            while len(self.segments) < seg_no-1:
+                self.load_segment(len(self.segments)+1, [], [])
+            lats, longs = self.journal.replay_segment([], [], edits[seg_no])
+            self.load_segment(seg_no, lats, longs)
+
+    def iter_stream_segments(self, file_name):
+        """ Generate trail file segments, as arrays - from the trail
+        cache (memory-mapped) if current, else streamed from the file,
+        then cached
+        :file_name: trail (GPX) file name
+        :returns: generator of (lats, longs, times)
+        """
+        cache = TrailCache(file_name)
+        file_segments = cache.load()
+        if file_segments is not None:
+            for seg_arrays in file_segments:
+                yield seg_arrays.lat, seg_arrays.long, seg_arrays.time
+            return
+
+        read_segments = []
+        for seg_arrays in GPXStreamReader(file_name).iter_segments():
+            read_segments.append(seg_arrays)
+            yield seg_arrays.lat, seg_arrays.long, seg_arrays.time
+        cache.save(read_segments)
+
+    def load_segment(self, seg_no, lats, longs, times=None):
+        """ Add segment, of points, to end of trail
+        :seg_no: segment number, used in point labels
+        :lats: sequence of point latitudes
+        :longs: sequence of point longitudes
+        :times: array of point times, if known
+        :returns: segment added
+        """
+        mgr = self.mgr
+        segment = SurveyTrailSegment(self)
+        for point_no in range(1, len(lats)+1):
+            label = self.label_pattern % (seg_no, point_no)
+            track_point = mgr.get_point_labeled(label) # Don't duplicate
+            if track_point is None:
+                track_point = SurveyPoint(mgr, label=label,
+                                lat=float(lats[point_no-1]),
+                                long=float(longs[point_no-1]),
+                                display_size=8,
+                                displayed=self.is_show_points,
+                                color="black")
+                mgr.add_point(track_point, track=False)
+            segment.add_points(track_point)
+        if times is not None:
+            segment.set_times(np.array(times, dtype=np.float64))
+        self.add_segments(segment)
+        return segment
+
+    def get_show_item(self, point, delta=None, prev_point=None):
+        """ Get point's selection list text, creating it on first request
+        :point: trail point
+        :delta: distance (meters) from previous point, if known
+        :prev_point: preceding point in segment, used if no delta
+                None - first point
+        :returns: show_item text
+        """
+        if point.has_show_item():
+            return point.show_item
+        
         mgr = self.mgr
         unit = mgr.unit
-        self.segments = []
-        basis = self.basis       
-        basis.load_file(file_name)
-        self.file_name = basis.file_name
-        for seg_no, file_segment in enumerate(basis.get_segments(), start=1):
-            segment = SurveyTrailSegment(self)
-            file_points = file_segment.get_points()
-            for point_no, file_point in enumerate(file_points, start=1):
-                label = self.label_pattern % (seg_no, point_no)
-                if point_no == 1:
-                    prev_point = file_point      # GPXPoint
-                prev_latLong = (prev_point.lat,prev_point.long)
-                latLong = (file_point.lat, file_point.long)
-                delta = mgr.sc.gmi.geoDist(prev_latLong, latLong)
-                x_d, y_d = mgr.sc.gmi.getPos(latLong=latLong)
-                show_item = str(f"{label}:   x:{x_d:.1f}{unit} y:{y_d:.1f}{unit}"
-                                 f"   delta: {delta:.1f}{unit}"
-                                 f"   lat:{file_point.lat} Long:{file_point.long}")
-                track_point = mgr.get_point_labeled(label) # Don't duplicate
-                if track_point is None:
-                    track_point = SurveyPoint(mgr, label=label,
-                                    show_item=show_item,
-                                    lat=file_point.lat, long=file_point.long,
-                                    display_size=8,
-                                    displayed=self.is_show_points,
-                                    color="black")
-                    mgr.add_point(track_point, track=False)
-                segment.add_points(track_point)
-            self.add_segments(segment)
+        latLong = (point.lat, point.long)
+        if delta is None:
+            if prev_point is None:
+                prev_point = point
+            delta = mgr.sc.gmi.geoDist((prev_point.lat, prev_point.long), latLong)
+        else:
+            delta /= mgr.sc.gmi.unitLen(unit)
+        x_d, y_d = mgr.sc.gmi.getPos(latLong=latLong)
+        show_item = str(f"{point.label}:   x:{x_d:.1f}{unit} y:{y_d:.1f}{unit}"
+                         f"   delta: {delta:.1f}{unit}"
+                         f"   lat:{point.lat} Long:{point.long}")
+        point.show_item = show_item
+        return show_item
+
+    def get_stats(self):
+        """ Get statistics for each segment
+        :returns: list of SegmentStats, in segment order
+        """
+        return [segment.get_stats() for segment in self.get_segments()]
+
+    def get_length(self):
+        """ Total trail path length, in meters
+        """
+        return sum(stats.total_length() for stats in self.get_stats())
+
+    def get_query(self):
+        """ Get spatial query service, rebuilt if points have changed
+        :returns: TrailQuery
+        """
+        if self.query is None or not self.query.is_current():
+            self.query = TrailQuery(self)
+        return self.query
+
+    def get_network(self):
+        """ Get trail network, rebuilt if points have changed
+        :returns: TrailNetwork
+        """
+        query = self.get_query()
+        if self.network is None or self.network.query is not query:
+            self.network = TrailNetwork(self)
+        return self.network
 
     def add_new_segment(self):
         """ Add new trail segment to end
@@ -160,6 +286,51 @@ class SurveyTrail:
     
     def get_segments(self):
         return self.segments
+
+    def get_point_index(self, point):
+        """ Locate point in trail
+        :point: point (SurveyPoint)
+        :returns: (segment, index in segment), (None, None) if not in trail
+        """
+        for segment in self.get_segments():
+            for i, segpt in enumerate(segment.get_points()):
+                if segpt.point_id == point.point_id:
+                    return segment, i
+        return None, None
+
+    def record_edit(self, edit):
+        """ Record edit for undo / redo
+        :edit: edit record (PointEdit)
+        """
+        if self.mgr is not None:
+            self.mgr.record_edit(edit)
+
+    def journal_move(self, point):
+        """ Record point's move, in the journal
+        :point: point moved, ignored if not in trail
+        """
+        if self.journal is None:
+            return
+        segment, index = self.get_point_index(point)
+        if segment is not None:
+            self.journal.move(segment.segment_no, index, point.lat, point.long)
+
+    def journal_delete(self, segment_no, index):
+        """ Record point deletion, in the journal
+        :segment_no: segment number
+        :index: index, in segment, of deleted point
+        """
+        if self.journal is not None:
+            self.journal.delete(segment_no, index)
+
+    def journal_insert(self, segment_no, index, point):
+        """ Record point insertion, in the journal
+        :segment_no: segment number
+        :index: index, in segment, of inserted point
+        :point: point inserted
+        """
+        if self.journal is not None:
+            self.journal.insert(segment_no, index, point.lat, point.long)
                     
     def delete_points(self, *points):
         """ Delete points from trail but not from mgr
@@ -177,6 +348,13 @@ class SurveyTrail:
                     del_points.extend(del_pts)
         return del_points
                     
+    def get_version(self):
+        """ Trail version, changed by point moves, additions, deletions
+        e.g. for region layer membership (SurveyRegion.get_layer_mask)
+        :returns: tuple of segment versions
+        """
+        return tuple(segment.get_version() for segment in self.get_segments())
+
     def get_points(self):
         """ Get points in trail
         :returns: list of points
@@ -193,8 +371,9 @@ class SurveyTrail:
         """
         items = []
         for segment in self.get_segments():
-            for point in segment.get_points():
-                items.append(point.show_item)
+            stats = segment.get_stats()
+            for i, point in enumerate(segment.get_points()):
+                items.append(self.get_show_item(point, delta=stats.get_dist(i)))
             if seg_sep is not None:
                 items.append(seg_sep)
         return items
@@ -203,11 +382,19 @@ class SurveyTrail:
         """ Create dictionary of points by show_item
         """
         points_by_show = {}
-        for point in self.get_points():
-            points_by_show[point.show_item] = point
+        for segment in self.get_segments():
+            stats = segment.get_stats()
+            for i, point in enumerate(segment.get_points()):
+                points_by_show[self.get_show_item(point, delta=stats.get_dist(i))] = point
         return points_by_show
         
     def save_file(self, filename):
+        """ Save (export) trail, with all edits, to file
+        The written file's journal, now compacted into it, is reset
+        and follows the trail.  Saved to another file, the original
+        file is unchanged, so keeps its journal
+        :filename: trail file name
+        """
         basis = self.basis
         if isinstance(basis, GPXFile):
             gpx_segments = []
@@ -219,6 +406,11 @@ class SurveyTrail:
                 gpx_segments.append(gpx_segment)
             basis.set_segments(gpx_segments)
             ret =  self.basis.save_file(filename)
+            if self.journal is not None:
+                self.journal.close()    # Another file's journal is kept
+            self.file_name = filename
+            self.journal = TrailJournal(filename)
+            self.journal.reset()
         else:
             raise SelectError(f"save_file({filename} - doesn't support basis:{basis}")
         
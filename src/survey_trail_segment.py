@@ -2,7 +2,11 @@
 """ trail segment object similar, but simpler than SelectEdge (crs_dots)
 An edge is composed of a connected set of zero or more points
 """
+import numpy as np
+
 from select_trace import SlTrace
+from survey_trail_stats import SegmentStats
+from edit_history import TrailInsertEdit, TrailDeleteEdit
 
 class SurveyTrailSegment:
     def __init__(self, trail):
@@ -12,6 +16,12 @@ class SurveyTrailSegment:
         """
         self.trail = trail
         self.points = []        # List of points
+        self.times = None       # Point times (seconds) array, if known
+        self.stats = None       # SegmentStats, created when requested
+        self.stats_version = None   # get_version() stats are current for
+        self.store = None       # Point store of our points' group
+        self.group = None       # Point store group, tracking point moves
+        self.changes = 0        # Incremented when points are added / removed
         self.segment_no = 0     # Set by adding function to provide identification
         
     def add_points(self, *points):
@@ -23,13 +33,85 @@ class SurveyTrailSegment:
                 pts = [pts]     # Make list of one
             for point in pts:
                 self.points.append(point)
+                self.track_point(point)
+        self.changes += 1
+        self.stats = None       # Recreate on next request
                     
+    def insert_point(self, index, point, time=None):
+        """ Insert point into segment
+        :index: index, in segment, before which point is inserted
+        :point: point to insert
+        :time: point time, if known
+        """
+        index = max(0, min(index, len(self.points)))
+        self.points.insert(index, point)
+        self.track_point(point)
+        self.changes += 1
+        if self.times is not None and index <= len(self.times):
+            self.times = np.insert(self.times, index,
+                                   np.nan if time is None else time)
+        self.stats = None       # Recreate on next request
+        self.trail.journal_insert(self.segment_no, index, point)
+        self.trail.record_edit(TrailInsertEdit(self, index, point, time))
+
     def get_points(self):
         """ Get points in region's perimeter possibility not complete
         :returns: list of points
         """
         return self.points
 
+    def track_point(self, point):
+        """ Add point to our point store group, so its moves
+        change our version
+        :point: segment point
+        """
+        store = getattr(point, "store", None)
+        if store is None:
+            return                  # Not a stored point
+        
+        if self.group is None or store is not self.store:
+            self.store = store
+            self.group = store.new_group()
+        store.set_group(point.idx, self.group)
+
+    def get_version(self):
+        """ Segment version, changed by moves of our points
+        Additions / insertions drop the stats, deletions update them
+        :returns: (number of points, changes, group, group move count)
+        """
+        if len(self.points) == 0 or self.group is None:
+            return (len(self.points), self.changes, None, 0)
+        return (len(self.points), self.changes, self.group,
+                self.store.get_group_moves(self.group))
+
+    def get_stats(self):
+        """ Get segment statistics, updated for any moved points
+        The points are checked only if a point has moved since
+        :returns: SegmentStats
+        """
+        version = self.get_version()
+        if self.stats is None:
+            self.stats = SegmentStats(self)
+        elif version != self.stats_version:
+            self.stats.refresh()
+        self.stats_version = version
+        return self.stats
+
+    def set_times(self, times):
+        """ Set point times
+        :times: array of times (seconds since epoch, nan if unknown)
+                one per point, None if not known
+        """
+        self.times = times
+
+    def get_times(self):
+        """ Get point times
+        :returns: array of times, None if not known
+        """
+        if self.times is not None and len(self.times) != len(self.points):
+            return None         # Points added without times
+        return self.times
+
     def get_end_point(self):
         """ Get end point
         :returns: end point, None if none
@@ -59,6 +141,7 @@ class SurveyTrailSegment:
             self.delete_points(point)
             self.trail.delete_point(point)
         self.points = []
+        self.stats = None
         
     def delete_points(self, *points):
         """ Delete points from segment, and from mgr via trail
@@ -75,7 +158,16 @@ class SurveyTrailSegment:
                     if segpt.point_id == pt.point_id:
                         del_points.append(segpt)
                         SlTrace.lg(f"TrailSegment.delete point({self.points[ip]}")
+                        if self.stats is not None:
+                            self.stats.point_deleted(ip)
                         del(self.points[ip])
+                        self.changes += 1
+                        time = None
+                        if self.times is not None and ip < len(self.times):
+                            time = self.times[ip]
+                            self.times = np.delete(self.times, ip)
+                        self.trail.journal_delete(self.segment_no, ip)
+                        self.trail.record_edit(TrailDeleteEdit(self, ip, segpt, time))
                         self.trail.delete_point(segpt)
                         del_points.append(segpt)
                         break
@@ -0,0 +1,245 @@
+# survey_trail_stats.py    19Oct2026  crs
+"""
+Cached trail segment statistics
+
+Per segment: distances between consecutive points, prefix sums of
+those distances (path length between any two points in O(1)),
+spacing histogram, using the color code buckets, and bounding box.
+Values are kept up to date incrementally as points are moved or
+deleted, rather than being recomputed for each display.
+"""
+import numpy as np
+
+from select_trace import SlTrace
+from trail_clean import geo_distances
+
+SPACING_BINS = (5., 10., 20., 100.)     # meters - spacing bucket limits
+SPACING_COLORS = (None, "yellow", "green", "blue", "red")   # color per bucket
+
+
+def spacing_buckets(dists):
+    """ Spacing bucket index for distances
+    :dists: array of distances (meters)
+    :returns: array of indexes into SPACING_COLORS
+            (0: <= 5, 1: <= 10, 2: <= 20, 3: <= 100, 4: > 100)
+    """
+    return np.searchsorted(SPACING_BINS, dists, side="left")
+
+
+def spacing_color(dist):
+    """ Color code for line of given length
+    :dist: distance in meters
+    :returns: color, None for no special color
+    """
+    return SPACING_COLORS[int(spacing_buckets(dist))]
+
+
+class SegmentStats:
+    """ Statistics for one trail segment (SurveyTrailSegment)
+    """
+    def __init__(self, segment):
+        """ Setup stats from segment's current points
+        :segment: SurveyTrailSegment
+        """
+        self.segment = segment
+        self.rebuild()
+
+    def rebuild(self):
+        """ Recompute everything from segment's points
+        """
+        points = self.segment.get_points()
+        npts = len(points)
+        self.lats = np.fromiter((pt.lat for pt in points), dtype=np.float64, count=npts)
+        self.longs = np.fromiter((pt.long for pt in points), dtype=np.float64, count=npts)
+        self.dists = geo_distances(self.lats, self.longs) if npts > 1 else np.zeros(0)
+        self.update_prefix()
+        self.hist = np.bincount(spacing_buckets(self.dists),
+                                minlength=len(SPACING_COLORS))
+        self.update_bbox()
+        SlTrace.lg(f"SegmentStats: segment {self.segment.segment_no}"
+                   f" {npts} points length {self.total_length():.1f}m",
+                   "trail_stats")
+
+    def update_prefix(self, start=0):
+        """ Update prefix sums of distance
+        prefix[i] is the path length from point 0 to point i
+        :start: first distance index changed
+        """
+        if start == 0 or len(self.prefix) != len(self.dists)+1:
+            self.prefix = np.zeros(len(self.dists)+1)
+            np.cumsum(self.dists, out=self.prefix[1:])
+            return
+
+        np.cumsum(self.dists[start:], out=self.prefix[start+1:])
+        self.prefix[start+1:] += self.prefix[start]
+
+    def update_bbox(self):
+        if len(self.lats) == 0:
+            self.bbox = None
+        else:
+            self.bbox = (float(self.lats.min()), float(self.lats.max()),
+                         float(self.longs.min()), float(self.longs.max()))
+
+    def _set_dist(self, di, dist):
+        """ Replace distance di, keeping histogram
+        """
+        self.hist[int(spacing_buckets(self.dists[di]))] -= 1
+        self.dists[di] = dist
+        self.hist[int(spacing_buckets(dist))] += 1
+
+    def _point_dist(self, i1, i2):
+        return float(geo_distances(self.lats[i1:i1+1], self.longs[i1:i1+1],
+                                   self.lats[i2:i2+1], self.longs[i2:i2+1])[0])
+
+    def point_moved(self, i, lat=None, long=None):
+        """ Update for point i moved
+        :i: point index in segment
+        :lat, long: new location default: from point
+        """
+        if lat is None or long is None:
+            point = self.segment.get_points()[i]
+            lat, long = point.lat, point.long
+        on_edge = self.bbox is not None and (
+                    self.lats[i] in (self.bbox[0], self.bbox[1])
+                    or self.longs[i] in (self.bbox[2], self.bbox[3]))
+        self.lats[i] = lat
+        self.longs[i] = long
+        first_di = None
+        if i > 0:
+            self._set_dist(i-1, self._point_dist(i-1, i))
+            first_di = i-1
+        if i < len(self.lats)-1:
+            self._set_dist(i, self._point_dist(i, i+1))
+            if first_di is None:
+                first_di = i
+        if first_di is not None:
+            self.update_prefix(first_di)
+        if on_edge:
+            self.update_bbox()
+        else:
+            min_lat, max_lat, min_long, max_long = self.bbox
+            self.bbox = (min(min_lat, lat), max(max_lat, lat),
+                         min(min_long, long), max(max_long, long))
+
+    def point_deleted(self, i):
+        """ Update for point i removed from segment
+        :i: point index (before removal)
+        """
+        npts = len(self.lats)
+        if npts <= 2:
+            self.lats = np.delete(self.lats, i)
+            self.longs = np.delete(self.longs, i)
+            self.dists = np.zeros(0)
+            self.hist[:] = 0
+            self.update_prefix()
+            self.update_bbox()
+            return
+
+        on_edge = (self.lats[i] in (self.bbox[0], self.bbox[1])
+                   or self.longs[i] in (self.bbox[2], self.bbox[3]))
+        if i == 0:
+            self.hist[int(spacing_buckets(self.dists[0]))] -= 1
+            self.dists = self.dists[1:]
+            start = 0
+        elif i == npts-1:
+            self.hist[int(spacing_buckets(self.dists[-1]))] -= 1
+            self.dists = self.dists[:-1]
+            start = len(self.dists)
+        else:
+            self.hist[int(spacing_buckets(self.dists[i]))] -= 1
+            self.dists = np.delete(self.dists, i)
+            self.lats = np.delete(self.lats, i)
+            self.longs = np.delete(self.longs, i)
+            self.hist[int(spacing_buckets(self.dists[i-1]))] -= 1
+            self.dists[i-1] = self._point_dist(i-1, i)
+            self.hist[int(spacing_buckets(self.dists[i-1]))] += 1
+            self.update_prefix(i-1)
+            if on_edge:
+                self.update_bbox()
+            return
+
+        self.lats = np.delete(self.lats, i)
+        self.longs = np.delete(self.longs, i)
+        self.update_prefix(start)
+        if on_edge:
+            self.update_bbox()
+
+    def refresh(self):
+        """ Pick up points moved since last check
+        Compares cached locations with the points' (array backed)
+        locations and updates only the changed points
+        :returns: number of points updated
+        """
+        points = self.segment.get_points()
+        npts = len(points)
+        if npts != len(self.lats):
+            self.rebuild()
+            return npts
+
+        if npts == 0:
+            return 0
+
+        store = points[0].store
+        idxs = np.fromiter((pt.idx for pt in points), dtype=np.int64, count=npts)
+        lats = store.lat[idxs]
+        longs = store.long[idxs]
+        moved = np.nonzero((lats != self.lats) | (longs != self.longs))[0]
+        for i in moved:
+            self.point_moved(i, lats[i], longs[i])
+        return len(moved)
+
+    def npoints(self):
+        return len(self.lats)
+
+    def get_dist(self, i):
+        """ Distance from previous point to point i
+        :i: point index
+        :returns: distance in meters, 0 for first point
+        """
+        if i <= 0:
+            return 0.
+        return float(self.dists[i-1])
+
+    def get_dists(self):
+        """ Distances between consecutive points
+        """
+        return self.dists
+
+    def length(self, i1=0, i2=None):
+        """ Path length between points
+        :i1: starting point index default: 0
+        :i2: ending point index default: last
+        :returns: length in meters
+        """
+        if i2 is None:
+            i2 = len(self.prefix)-1
+        return float(self.prefix[i2] - self.prefix[i1])
+
+    def total_length(self):
+        return float(self.prefix[-1])
+
+    def get_histogram(self):
+        """ Spacing histogram
+        :returns: counts per SPACING_COLORS bucket
+        """
+        return self.hist
+
+    def get_colors(self):
+        """ Color code for each line (point i to i+1)
+        """
+        return [SPACING_COLORS[b] for b in spacing_buckets(self.dists)]
+
+    def get_bbox(self):
+        """ Bounding box
+        :returns: (min_lat, max_lat, min_long, max_long), None if no points
+        """
+        return self.bbox
+
+    def min_spacing(self):
+        return None if len(self.dists) == 0 else float(self.dists.min())
+
+    def max_spacing(self):
+        return None if len(self.dists) == 0 else float(self.dists.max())
+
+    def avg_spacing(self):
+        return 0. if len(self.dists) == 0 else self.total_length()/len(self.dists)
@@ -454,7 +454,7 @@ elif map_file is not None:
         map_file = filedialog.askopenfilename(
             initialdir= "../out",
             title = "Open Map File",
-            filetypes= (("map files", "*.png"),
+            filetypes= (("map files", "*.png *.maptiles"),
                         ("info files", "*.map_info"),
                         ("all files", "*.*"))
                        )
@@ -0,0 +1,212 @@
+# tiled_canvas.py    19Oct2026  crs
+"""
+Tiled canvas viewer - browse a map at native resolution
+
+The raster is split into fixed size tiles (tile_size square, smaller at
+the right / bottom edges).  Only the tiles in, or within margin tiles
+of, the visible part of the scroll region have a PhotoImage and canvas
+image item, so Tk image memory follows the window size, not the map
+size.  Tiles scrolled out of range are recycled: their PhotoImage is
+pasted with the newly needed tile's pixels and their canvas item moved,
+instead of being destroyed and re-created.  Scrolling, panning (button 1
+drag) and wheel events only schedule a tile update (after_idle), so a
+burst of events costs one update.
+"""
+from tkinter import (Frame, Canvas, Scrollbar, Toplevel,
+                     HORIZONTAL, VERTICAL, BOTTOM, RIGHT, LEFT,
+                     X, Y, BOTH, YES, SUNKEN)
+import PIL.ImageTk
+
+from select_trace import SlTrace
+
+
+class TiledCanvas(Frame):
+    def __init__(self, image=None, parent=None, title=None,
+                 tile_size=256, margin=1, max_free=None,
+                 width=800, height=600):
+        """ Setup viewer
+        :image: image (PIL) to view
+        :parent: parent widget default: new Toplevel
+        :title: window title, if new Toplevel default: "Map - full size"
+        :tile_size: tile width and height, in pixels default: 256
+        :margin: tiles, beyond those visible, kept ready for scrolling
+                default: 1
+        :max_free: maximum unused tiles kept for recycling
+                default: number of tiles in the window
+        :width: window width, in pixels default: 800
+        :height: window height, in pixels default: 600
+        """
+        if parent is None:
+            parent = Toplevel()
+            if title is None:
+                title = "Map - full size"
+            parent.title(title)
+        self.parent = parent
+        Frame.__init__(self, parent)
+        self.pack(expand=YES, fill=BOTH)
+        self.tile_size = tile_size
+        self.margin = margin
+        if max_free is None:
+            max_free = (width//tile_size + 1)*(height//tile_size + 1)
+        self.max_free = max_free
+        self.image = None
+        self.ncols = self.nrows = 0
+        self.tiles = {}             # (photo, canvas tag) by (col, row)
+        self.free_tiles = {}        # unused (photo, canvas tag) lists by size
+        self.n_created = 0          # Tiles created, for diagnostics
+        self.n_recycled = 0
+        self.update_pending = None
+
+        self.sbarV = Scrollbar(self, orient=VERTICAL, command=self.yview)
+        self.sbarH = Scrollbar(self, orient=HORIZONTAL, command=self.xview)
+        self.canv = Canvas(self, relief=SUNKEN, width=width, height=height,
+                           xscrollcommand=self.sbarH.set,
+                           yscrollcommand=self.sbarV.set)
+        self.sbarV.pack(side=RIGHT, fill=Y)
+        self.sbarH.pack(side=BOTTOM, fill=X)
+        self.canv.pack(side=LEFT, expand=YES, fill=BOTH)
+        self.canv.bind("<Configure>", self.schedule_update)
+        self.canv.bind("<ButtonPress-1>", self.pan_start)
+        self.canv.bind("<B1-Motion>", self.pan)
+        self.canv.bind("<MouseWheel>", self.wheel)
+        self.canv.bind("<Button-4>", self.wheel)      # X11 wheel
+        self.canv.bind("<Button-5>", self.wheel)
+        if image is not None:
+            self.set_image(image)
+
+    def set_image(self, image):
+        """ Set image to view, dropping all tiles
+        :image: image (PIL)
+        """
+        self.clear_tiles()
+        self.image = image
+        ts = self.tile_size
+        self.ncols = (image.width + ts - 1)//ts
+        self.nrows = (image.height + ts - 1)//ts
+        self.canv.config(scrollregion=(0, 0, image.width, image.height))
+        SlTrace.lg(f"TiledCanvas: {image.width}x{image.height}"
+                   f" {self.ncols}x{self.nrows} tiles", "tiled_canvas")
+        self.schedule_update()
+
+    def clear_tiles(self):
+        """ Remove all tiles, in use and free
+        """
+        for _, tag in self.tiles.values():
+            self.canv.delete(tag)
+        for free in self.free_tiles.values():
+            for _, tag in free:
+                self.canv.delete(tag)
+        self.tiles = {}
+        self.free_tiles = {}
+
+    def xview(self, *args):
+        self.canv.xview(*args)
+        self.schedule_update()
+
+    def yview(self, *args):
+        self.canv.yview(*args)
+        self.schedule_update()
+
+    def pan_start(self, event):
+        self.canv.scan_mark(event.x, event.y)
+
+    def pan(self, event):
+        self.canv.scan_dragto(event.x, event.y, gain=1)
+        self.schedule_update()
+
+    def wheel(self, event):
+        """ Scroll - wheel: vertically, shift+wheel: horizontally
+        """
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            units = -1
+        else:
+            units = 1
+        if event.state & 0x1:           # Shift
+            self.canv.xview_scroll(units, "units")
+        else:
+            self.canv.yview_scroll(units, "units")
+        self.schedule_update()
+
+    def schedule_update(self, event=None):
+        """ Update tiles, when idle, once for a burst of events
+        """
+        if self.update_pending is None:
+            self.update_pending = self.after_idle(self.update_tiles)
+
+    def get_tile_range(self):
+        """ Tiles in, or within margin of, the visible region
+        :returns: (col_min, col_max, row_min, row_max) inclusive
+        """
+        canv = self.canv
+        ts = self.tile_size
+        x0 = canv.canvasx(0)
+        y0 = canv.canvasy(0)
+        x1 = canv.canvasx(max(canv.winfo_width(), 1) - 1)
+        y1 = canv.canvasy(max(canv.winfo_height(), 1) - 1)
+        col_min = max(int(x0//ts) - self.margin, 0)
+        col_max = min(int(x1//ts) + self.margin, self.ncols - 1)
+        row_min = max(int(y0//ts) - self.margin, 0)
+        row_max = min(int(y1//ts) + self.margin, self.nrows - 1)
+        return col_min, col_max, row_min, row_max
+
+    def tile_box(self, col, row):
+        """ Image box of tile
+        :returns: (left, upper, right, lower)
+        """
+        ts = self.tile_size
+        return (col*ts, row*ts,
+                min((col+1)*ts, self.image.width),
+                min((row+1)*ts, self.image.height))
+
+    def update_tiles(self):
+        """ Make tiles needed for the visible region, recycling the rest
+        """
+        self.update_pending = None
+        if self.image is None:
+            return
+
+        col_min, col_max, row_min, row_max = self.get_tile_range()
+        needed = set((col, row) for col in range(col_min, col_max+1)
+                     for row in range(row_min, row_max+1))
+        for key in [key for key in self.tiles if key not in needed]:
+            self.free_tile(key)
+        for key in needed:
+            if key not in self.tiles:
+                self.make_tile(*key)
+        SlTrace.lg(f"TiledCanvas: {len(self.tiles)} tiles"
+                   f" created: {self.n_created} recycled: {self.n_recycled}",
+                   "tiled_canvas")
+
+    def free_tile(self, key):
+        """ Move tile from use to the free lists, hidden
+        Beyond max_free, the tile is discarded
+        """
+        photo, tag = self.tiles.pop(key)
+        size = (photo.width(), photo.height())
+        free = self.free_tiles.setdefault(size, [])
+        if sum(len(fr) for fr in self.free_tiles.values()) >= self.max_free:
+            self.canv.delete(tag)
+            return
+
+        self.canv.itemconfigure(tag, state="hidden")
+        free.append((photo, tag))
+
+    def make_tile(self, col, row):
+        """ Show tile, recycling a free tile of the same size if one
+        """
+        box = self.tile_box(col, row)
+        tile_image = self.image.crop(box)
+        free = self.free_tiles.get(tile_image.size)
+        if free:
+            photo, tag = free.pop()
+            photo.paste(tile_image)
+            self.canv.coords(tag, box[0], box[1])
+            self.canv.itemconfigure(tag, state="normal")
+            self.n_recycled += 1
+        else:
+            photo = PIL.ImageTk.PhotoImage(tile_image)
+            tag = self.canv.create_image(box[0], box[1], anchor="nw",
+                                         image=photo)
+            self.canv.tag_lower(tag)        # Below any overlays
+            self.n_created += 1
+        self.tiles[(col, row)] = (photo, tag)
@@ -0,0 +1,229 @@
+# tiled_map_file.py    19Oct2026  crs
+"""
+Tiled map file - tiled raster container with internal overviews and
+embedded georeference metadata (corners, rotation, zoom, ...)
+
+In the style of a tiled GeoTIFF: the map is stored as tile_size square
+tiles (each PNG encoded), at full resolution (level 0) and at overview
+levels, each half the size of the one before, down to one tile.  A view
+of part of the map, or of the whole map at reduced size, is read by
+decoding only the tiles, of the coarsest sufficient level, it covers.
+
+File layout:
+    MAGIC
+    index offset                    8 bytes, little endian
+    tile data ...
+    index                           JSON - width, height, mode, tile_size,
+                                    info (georeference), levels, each with
+                                    width, height, cols, rows and the
+                                    [offset, length] of each tile, row major
+"""
+import io
+import json
+import numbers
+import struct
+
+from PIL import Image
+
+from select_trace import SlTrace
+from select_error import SelectError
+
+TILED_MAP_EXT = ".maptiles"
+
+
+def is_tiled_map_name(file_name):
+    return file_name is not None and file_name.lower().endswith(TILED_MAP_EXT)
+
+
+def fit_size(size, view_size):
+    """ Size of image fitting view, keeping its aspect, never enlarged
+    :size: (width, height) at full resolution
+    :view_size: (width, height) of view
+    :returns: (width, height)
+    """
+    fit = min(view_size[0]/size[0], view_size[1]/size[1], 1)
+    return (max(int(size[0]*fit), 1), max(int(size[1]*fit), 1))
+
+
+def json_value(value):
+    """ Info value, as JSON type
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, numbers.Integral):
+        return int(value)           # Including numpy numbers
+    if isinstance(value, numbers.Real):
+        return float(value)
+    return str(value)
+
+
+class TiledMapWriter:
+    MAGIC = b"PIMAPTILES1\n"
+
+    def __init__(self, image, info=None, tile_size=256, compress_level=6,
+                 progress=None):
+        """ Setup writer
+        :image: map image
+        :info: georeference info (e.g. GoogleMapImage.imageInfo)
+        :tile_size: tile width / height in pixels default: 256
+        :compress_level: tile PNG compression 0-9 default: 6
+        :progress: function(percent, message), if present
+        """
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        self.image = image
+        self.info = {} if info is None else info
+        self.tile_size = tile_size
+        self.compress_level = compress_level
+        self.progress = progress
+
+    def get_levels(self):
+        """ Level images, full size first, each overview half the previous
+        """
+        levels = [self.image]
+        level = self.image
+        while max(level.width, level.height) > self.tile_size:
+            level = level.reduce(2)
+            levels.append(level)
+        return levels
+
+    def write(self, fout):
+        """ Write tiled map
+        :fout: binary file, open for writing
+        """
+        ts = self.tile_size
+        levels = self.get_levels()
+        ntiles = sum(((lev.width + ts - 1)//ts)*((lev.height + ts - 1)//ts)
+                     for lev in levels)
+        fout.write(self.MAGIC)
+        fout.write(struct.pack("<Q", 0))        # Index offset, set at end
+        offset = len(self.MAGIC) + 8
+        level_index = []
+        ndone = 0
+        for nlev, level in enumerate(levels):
+            cols = (level.width + ts - 1)//ts
+            rows = (level.height + ts - 1)//ts
+            tiles = []
+            for row in range(rows):
+                for col in range(cols):
+                    box = (col*ts, row*ts, min((col+1)*ts, level.width),
+                           min((row+1)*ts, level.height))
+                    buf = io.BytesIO()
+                    level.crop(box).save(buf, format="PNG",
+                                         compress_level=self.compress_level)
+                    data = buf.getvalue()
+                    fout.write(data)
+                    tiles.append([offset, len(data)])
+                    offset += len(data)
+                    ndone += 1
+                    if self.progress is not None and ndone % 16 == 0:
+                        self.progress(int(95*ndone/ntiles),
+                                      f"level {nlev} tile {ndone} of {ntiles}")
+            level_index.append(dict(width=level.width, height=level.height,
+                                    cols=cols, rows=rows, tiles=tiles))
+        index = dict(width=self.image.width, height=self.image.height,
+                     mode=self.image.mode, tile_size=ts,
+                     info={key: json_value(value) for key, value in self.info.items()},
+                     levels=level_index)
+        fout.write(json.dumps(index).encode())
+        fout.seek(len(self.MAGIC))
+        fout.write(struct.pack("<Q", offset))
+        fout.seek(0, io.SEEK_END)
+
+
+class TiledMapFile:
+    def __init__(self, file_name):
+        """ Open tiled map file, reading its index
+        :file_name: tiled map file name
+        """
+        self.file_name = file_name
+        self.n_tiles_read = 0       # For diagnostics
+        with open(file_name, "rb") as fin:
+            magic = fin.read(len(TiledMapWriter.MAGIC))
+            if magic != TiledMapWriter.MAGIC:
+                raise SelectError(f"{file_name} is not a tiled map file")
+            index_offset, = struct.unpack("<Q", fin.read(8))
+            fin.seek(index_offset)
+            index = json.loads(fin.read().decode())
+        self.width = index["width"]
+        self.height = index["height"]
+        self.mode = index["mode"]
+        self.tile_size = index["tile_size"]
+        self.info = index["info"]
+        self.levels = index["levels"]
+
+    def get_level_no(self, box, out_size=None):
+        """ Coarsest level with at least the resolution needed
+        :box: level 0 pixel box (left, upper, right, lower)
+        :out_size: (width, height) to be displayed default: full resolution
+        :returns: level number
+        """
+        if out_size is None:
+            return 0
+        scale = min((box[2] - box[0])/max(out_size[0], 1),
+                    (box[3] - box[1])/max(out_size[1], 1))
+        nlev = 0
+        while nlev + 1 < len(self.levels) and 2**(nlev+1) <= scale:
+            nlev += 1
+        return nlev
+
+    def read_region(self, box=None, out_size=None):
+        """ Read map region, decoding only the tiles needed
+        :box: level 0 pixel box (left, upper, right, lower)
+                default: whole map
+        :out_size: (width, height) of returned image
+                default: box size at the level read (full resolution for
+                no out_size)
+        :returns: image
+        """
+        if box is None:
+            box = (0, 0, self.width, self.height)
+        nlev = self.get_level_no(box, out_size)
+        level = self.levels[nlev]
+        ts = self.tile_size
+        fx = level["width"]/self.width          # Level / level 0 scale
+        fy = level["height"]/self.height
+        lbox = (int(box[0]*fx), int(box[1]*fy),
+                max(int(round(box[2]*fx)), int(box[0]*fx) + 1),
+                max(int(round(box[3]*fy)), int(box[1]*fy) + 1))
+        col_min = max(lbox[0]//ts, 0)
+        col_max = min((lbox[2] - 1)//ts, level["cols"] - 1)
+        row_min = max(lbox[1]//ts, 0)
+        row_max = min((lbox[3] - 1)//ts, level["rows"] - 1)
+        region = Image.new(self.mode, (lbox[2] - lbox[0], lbox[3] - lbox[1]))
+        with open(self.file_name, "rb") as fin:
+            for row in range(row_min, row_max+1):
+                for col in range(col_min, col_max+1):
+                    offset, length = level["tiles"][row*level["cols"] + col]
+                    fin.seek(offset)
+                    tile = Image.open(io.BytesIO(fin.read(length)))
+                    region.paste(tile, (col*ts - lbox[0], row*ts - lbox[1]))
+                    self.n_tiles_read += 1
+        SlTrace.lg(f"TiledMapFile: read level {nlev}"
+                   f" {(row_max-row_min+1)*(col_max-col_min+1)} tiles"
+                   f" from {self.file_name}", "tiled_map")
+        if out_size is not None and region.size != tuple(out_size):
+            region = region.resize(tuple(out_size), Image.BILINEAR)
+        return region
+
+    def get_region_info(self, box=None):
+        """ Georeference info for region
+        Corners are interpolated, so regions are supported only for
+        unrotated maps
+        :box: level 0 pixel box default: whole map
+        :returns: info dictionary
+        """
+        info = dict(self.info)
+        if box is None or tuple(box) == (0, 0, self.width, self.height):
+            return info
+
+        if info.get("mapRotate"):
+            raise SelectError("region of rotated tiled map is not supported")
+        ulLat, ulLong = info["ulLat"], info["ulLong"]
+        lat_per_y = (info["lrLat"] - ulLat)/self.height
+        long_per_x = (info["lrLong"] - ulLong)/self.width
+        info["ulLat"] = ulLat + box[1]*lat_per_y
+        info["ulLong"] = ulLong + box[0]*long_per_x
+        info["lrLat"] = ulLat + box[3]*lat_per_y
+        info["lrLong"] = ulLong + box[2]*long_per_x
+        return info
@@ -18,6 +18,7 @@ from point_place_two import PointPlaceTwo
 from select_list import SelectList        # TEMP - select_list will be extended
 from survey_point import SurveyPoint
 from survey_region import SurveyRegion
+from edit_history import AddPointEdit, RegionAddEdit, RegionCompleteEdit
 
 class TrackingControl(SelectControlWindow):
     """ Collection of point selection controls
@@ -118,6 +119,10 @@ class TrackingControl(SelectControlWindow):
                          command=self.delete_points)
         self.set_button(points_control_frame, "clear_all_points", "Clear ALL Points",
                          command=self.clear_points)
+        self.set_button(points_control_frame, "undo", "Undo",
+                         command=self.undo)
+        self.set_button(points_control_frame, "redo", "Redo",
+                         command=self.redo)
         
         trail_control_frame = Frame(controls_frame)
         self.set_fields(trail_control_frame, "trail_control", "Trail")
@@ -192,6 +197,16 @@ class TrackingControl(SelectControlWindow):
         if not self.display:
             self.hide_window()
             
+    def undo(self):
+        """ Undo most recent point / trail / region edit
+        """
+        self.mgr.undo()
+
+    def redo(self):
+        """ Redo most recently undone edit
+        """
+        self.mgr.redo()
+
     def clear_points(self):
         """ remove points
         """
@@ -300,39 +315,66 @@ class TrackingControl(SelectControlWindow):
             point.display(displayed=True, color=trail.color)            
         segment.add_points(point)
 
+    def track_trail_point(self, segment, point):
+        """ Track (connect) trail point to its segment neighbors
+        e.g. when a deleted trail point is restored
+        :segment: trail segment (SurveyTrailSegment) containing point
+        :point: trail point
+        """
+        trail = segment.trail
+        points = segment.get_points()
+        for i, segpt in enumerate(points):
+            if segpt.point_id == point.point_id:
+                break
+        else:
+            return
+        pairs = []
+        if i > 0:
+            pairs.append((points[i-1], point))
+        if i+1 < len(points):
+            pairs.append((point, points[i+1]))
+        for point1, point2 in pairs:
+            self.track_two_points(point1, point2,
+                     color=trail.color, width=trail.line_width,
+                     line_type=trail.line_type,
+                     display_monitor=trail.display_monitor)
+
     def make_point(self, lat=None, long=None):
         """ Create appropriate point for mouse click with current tracking state
         :lat: latitude
         :long: longitude
         :returns: point (SurveyPoint)
         """
-        if (self.auto_tracking == "add_to_trail"
-            and self.trail is not None
-             and self.trail_segment is not None):
-            trail = self.trail
-            color_points = "black"
-            segment = self.trail_segment
-            seg_no = segment.segment_no
-            pt_no = len(segment.points)+1
-            label = self.trail.label_pattern % (seg_no, pt_no)
-            point = SurveyPoint(self.mgr, label=label, color=color_points,
-                                lat=lat, long=long)
-            point.snapshot(title=f"\n make_point on trail")
-            segment.add_points(point)
-            self.mgr.add_point(point, track=False)
-            seg_points = segment.get_points()
-            if len(seg_points) > 1:
-                self.track_two_points(seg_points[-2], seg_points[-1],
-                         color=trail.color, width=trail.line_width,
-                         line_type=trail.line_type,
-                         display_monitor=trail.display_monitor)
-        else:
-            point = SurveyPoint(self.mgr, lat=lat, long=long)
-            point.snapshot(title=f"\n make_point")
-            self.mgr.in_point_is_down = True                        # Standard continuation for regualar new points
-            self.mgr.in_point = point
-            self.mgr.in_point_start = (lat, long)
-            self.mgr.add_point(point)
+        with self.mgr.history.grouped():      # Point with its tracking - one undo step
+            if (self.auto_tracking == "add_to_trail"
+                and self.trail is not None
+                 and self.trail_segment is not None):
+                trail = self.trail
+                color_points = "black"
+                segment = self.trail_segment
+                seg_no = segment.segment_no
+                pt_no = len(segment.points)+1
+                label = self.trail.label_pattern % (seg_no, pt_no)
+                point = SurveyPoint(self.mgr, label=label, color=color_points,
+                                    lat=lat, long=long)
+                point.snapshot(title=f"\n make_point on trail")
+                self.mgr.add_point(point, track=False)
+                self.mgr.record_edit(AddPointEdit(point, len(self.mgr.points)-1))
+                segment.insert_point(len(segment.points), point)
+                seg_points = segment.get_points()
+                if len(seg_points) > 1:
+                    self.track_two_points(seg_points[-2], seg_points[-1],
+                             color=trail.color, width=trail.line_width,
+                             line_type=trail.line_type,
+                             display_monitor=trail.display_monitor)
+            else:
+                point = SurveyPoint(self.mgr, lat=lat, long=long)
+                point.snapshot(title=f"\n make_point")
+                self.mgr.in_point_is_down = True                        # Standard continuation for regualar new points
+                self.mgr.in_point = point
+                self.mgr.in_point_start = (lat, long)
+                self.mgr.record_edit(AddPointEdit(point, len(self.mgr.points)))
+                self.mgr.add_point(point)
         return point    
             
 
@@ -346,11 +388,14 @@ class TrackingControl(SelectControlWindow):
         if self.auto_tracking == "add_to_trail":
             return self.add_point_to_trail(point)
         
-        if self.current_region is None:
+        is_start = self.current_region is None
+        if is_start:
             if len(self.regions) > 0:
                 self.clear_region_accent()
             self.current_region = SurveyRegion(self.mgr)
             SlTrace.lg(f"Starting region with {point}")
+        self.mgr.record_edit(RegionAddEdit(self.current_region, point,
+                                           len(self.current_region.tracked), is_start))
         self.current_region.add_points(point)     # Add most recent point
         if self.auto_tracking == "adjacent_pairs":
             """ Track (connect) points in current region """
@@ -408,8 +453,10 @@ class TrackingControl(SelectControlWindow):
         if self.current_region is None:
             return False
         
+        nedges = len(self.current_region.edges)
         if not self.current_region.complete_region():
             return False
+        self.mgr.record_edit(RegionCompleteEdit(self.current_region, nedges))
         
         # Track completion edge
         self.augment_region(point1=self.current_region.points[-1], point2=self.current_region.points[0])
@@ -483,27 +530,22 @@ class TrackingControl(SelectControlWindow):
         if region is not None:
             list_segments = []
             for seg in trail_segments:      # Add segment if any point is inside
-                for pt in seg.get_points():
-                    if region.is_inside(pt):
-                        list_segments.append(seg)
-                        break 
+                if len(region.get_inside_points(seg.get_points())) > 0:
+                    list_segments.append(seg)
         else:
             list_segments = trail_segments
         
         unit = self.unit
         points = []
         show_list = []
+        unit_len = self.mgr.sc.gmi.unitLen(unit)
         for iseg, seg in enumerate(list_segments):
             seg_points = seg.get_points()
+            seg_stats = seg.get_stats()
             seg_no = iseg + 1
             for i, seg_point in enumerate(seg_points):
-                if i == 0:
-                    prev_point = seg_point
-                else:
-                    prev_point = points[i-1]
-                prev_latLong = (prev_point.lat,prev_point.long)
                 latLong = (seg_point.lat, seg_point.long)
-                delta = self.mgr.sc.gmi.geoDist(prev_latLong, latLong)
+                delta = seg_stats.get_dist(i)/unit_len
                 x_d, y_d = self.mgr.sc.gmi.getPos(latLong=latLong)
                 label = f"t{seg_no}.{i+1}"
                 show_list.append(f"{label}:   x:{x_d:.1f}{unit} y:{y_d:.1f}{unit}"
@@ -533,10 +575,11 @@ class TrackingControl(SelectControlWindow):
                          items=labels,
                          position=(x0, y0), size=(width, height))
         delete_list = app.get_checked()
-        for delete_label in delete_list:
-            del_point = self.mgr.points_by_label[delete_label.lower()]
-            SlTrace.lg(f"delete point: {del_point}")
-            self.mgr.remove_point(del_point)
+        with self.mgr.history.grouped():      # One undo step
+            for delete_label in delete_list:
+                del_point = self.mgr.points_by_label[delete_label.lower()]
+                SlTrace.lg(f"delete point: {del_point}")
+                self.mgr.remove_point(del_point)
 
     def delete_points(self):
         """ Provide selection list,
@@ -552,10 +595,11 @@ class TrackingControl(SelectControlWindow):
                          items=labels,
                          position=(x0, y0), size=(width, height))
         delete_list = app.get_checked()
-        for delete_label in delete_list:
-            del_point = self.mgr.points_by_label[delete_label.lower()]
-            SlTrace.lg(f"delete point: {del_point}")
-            self.mgr.remove_point(del_point)
+        with self.mgr.history.grouped():      # One undo step
+            for delete_label in delete_list:
+                del_point = self.mgr.points_by_label[delete_label.lower()]
+                SlTrace.lg(f"delete point: {del_point}")
+                self.mgr.remove_point(del_point)
 
     def delete_region_trail_points(self):
         """ Show region trail points, provide selection list,
@@ -574,8 +618,9 @@ class TrackingControl(SelectControlWindow):
                          items=t_show_list,
                          position=(x0, y0), size=(width, height))
         delete_list = app.get_checked()
-        for delete_label in delete_list:
-            self.mgr.remove_point(points_by_show[delete_label])
+        with self.mgr.history.grouped():      # One undo step
+            for delete_label in delete_list:
+                self.mgr.remove_point(points_by_show[delete_label])
 
     def delete_trail_points(self):
         """ Show region trail points, provide selection list,
@@ -595,11 +640,12 @@ class TrackingControl(SelectControlWindow):
                          item_sep=seg_sep,
                          position=(x0, y0), size=(width, height))
         delete_list = app.get_checked()
-        for delete_label in delete_list:
-            del_point = points_by_show[delete_label]
-            SlTrace.lg(f"delete point: {del_point}")
-            trail.delete_points(del_point)
-            self.mgr.remove_point(del_point)
+        with self.mgr.history.grouped():      # One undo step
+            for delete_label in delete_list:
+                del_point = points_by_show[delete_label]
+                SlTrace.lg(f"delete point: {del_point}")
+                trail.delete_points(del_point)
+                self.mgr.remove_point(del_point)
 
     def delete_trail_points_chosen(self):
         region = self.get_region()
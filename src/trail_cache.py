@@ -0,0 +1,124 @@
+# trail_cache.py    19Oct2026  crs
+"""
+Binary sidecar cache of trail (GPX) track points
+
+A trail file <name>.gpx is cached in two files next to it:
+    <name>.gpx.trailcache.npy - float64 array (npoints x 4) of
+                                lat, long, elevation, time
+                                loaded memory-mapped
+    <name>.gpx.trailcache.npz - key (path, mtime, size, version) and
+                                segment offsets
+The cache is used only if the key matches the current trail file.
+"""
+import os
+
+import numpy as np
+
+from select_trace import SlTrace
+from gpx_stream import GPXSegmentArrays
+
+
+class TrailCache:
+    VERSION = 1                 # Change if the cache layout changes
+
+    def __init__(self, file_name):
+        """ Setup cache for trail file
+        :file_name: trail (GPX) file name
+        """
+        self.file_name = os.path.abspath(file_name)
+        self.data_name = self.file_name + ".trailcache.npy"
+        self.key_name = self.file_name + ".trailcache.npz"
+
+    def get_key(self):
+        """ Current key for trail file
+        :returns: (path, mtime_ns, size), None if file not found
+        """
+        try:
+            st = os.stat(self.file_name)
+        except OSError:
+            return None
+        return (self.file_name, st.st_mtime_ns, st.st_size)
+
+    def is_valid(self):
+        """ Check if cache is present and matches the trail file
+        """
+        key = self.get_key()
+        if key is None:
+            return False
+        if not os.path.exists(self.data_name) or not os.path.exists(self.key_name):
+            return False
+        try:
+            with np.load(self.key_name) as kf:
+                if int(kf["version"]) != TrailCache.VERSION:
+                    return False
+                if (str(kf["path"]) != key[0]
+                        or int(kf["mtime_ns"]) != key[1]
+                        or int(kf["size"]) != key[2]):
+                    return False
+        except (OSError, KeyError, ValueError) as e:
+            SlTrace.lg(f"TrailCache: bad key file {self.key_name}: {e}")
+            return False
+        return True
+
+    def load(self):
+        """ Load trail segments from cache
+        :returns: list of GPXSegmentArrays (views into memory-mapped
+                data), None if cache is missing or stale
+        """
+        if not self.is_valid():
+            return None
+
+        try:
+            with np.load(self.key_name) as kf:
+                offsets = kf["offsets"].copy()
+            data = np.load(self.data_name, mmap_mode="r")
+        except (OSError, KeyError, ValueError) as e:
+            SlTrace.lg(f"TrailCache: can't load {self.data_name}: {e}")
+            return None
+
+        segments = []
+        for i in range(len(offsets)-1):
+            seg = data[offsets[i]:offsets[i+1]]
+            segments.append(GPXSegmentArrays(seg[:,0], seg[:,1], seg[:,2], seg[:,3]))
+        SlTrace.lg(f"TrailCache: loaded {len(segments)} segments"
+                   f" {len(data)} points from {self.data_name}", "trail_cache")
+        return segments
+
+    def save(self, segments):
+        """ Save trail segments to cache
+        Files are written to temporary names and renamed into place
+        :segments: list of GPXSegmentArrays
+        :returns: True if saved
+        """
+        key = self.get_key()
+        if key is None:
+            return False
+
+        offsets = np.zeros(len(segments)+1, dtype=np.int64)
+        for i, seg in enumerate(segments):
+            offsets[i+1] = offsets[i] + len(seg)
+        data = np.empty((offsets[-1], 4), dtype=np.float64)
+        for i, seg in enumerate(segments):
+            rows = data[offsets[i]:offsets[i+1]]
+            rows[:,0] = seg.lat
+            rows[:,1] = seg.long
+            rows[:,2] = seg.elev
+            rows[:,3] = seg.time
+        data_tmp = self.data_name + ".tmp"
+        key_tmp = self.key_name + ".tmp"
+        try:
+            with open(data_tmp, "wb") as f:
+                np.save(f, data)
+            with open(key_tmp, "wb") as f:
+                np.savez(f, version=TrailCache.VERSION,
+                         path=key[0], mtime_ns=key[1], size=key[2],
+                         offsets=offsets)
+            os.replace(data_tmp, self.data_name)
+            os.replace(key_tmp, self.key_name)
+        except OSError as e:
+            SlTrace.lg(f"TrailCache: can't save cache {self.data_name}: {e}")
+            return False
+
+        SlTrace.lg(f"TrailCache: saved {len(segments)} segments"
+                   f" {len(data)} points in {self.data_name}", "trail_cache")
+        return True
@@ -0,0 +1,262 @@
+# trail_clean.py    19Oct2026  crs
+"""
+GPS trail cleaning - flag / drop suspicious track points
+
+Works a segment at a time on arrays: consecutive distances, speeds
+(if point times are known) and map border membership are computed
+for the whole segment at once, then rules are applied to flag or
+drop points.
+"""
+import numpy as np
+
+from select_trace import SlTrace
+
+EARTH_MEAN_RADIUS = 6371e3      # meters, as in GeoDraw.geoDistance
+
+
+def geo_distances(lats, longs, lats2=None, longs2=None):
+    """ Vectorized geoDistance (haversine), in meters
+    :lats, longs: arrays of latitude, longitude
+    :lats2, longs2: arrays of second points
+            default: distances between consecutive points of lats, longs
+    :returns: array of distances, length len(lats)-1 if consecutive
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    longs = np.asarray(longs, dtype=np.float64)
+    if lats2 is None:
+        lats, lats2 = lats[:-1], lats[1:]
+        longs, longs2 = longs[:-1], longs[1:]
+    else:
+        lats2 = np.asarray(lats2, dtype=np.float64)
+        longs2 = np.asarray(longs2, dtype=np.float64)
+    phi1 = np.radians(lats)
+    phi2 = np.radians(lats2)
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(longs2 - longs)
+    a = (np.sin(delta_phi/2)**2
+         + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda/2)**2)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return EARTH_MEAN_RADIUS * c
+
+
+class TrailCleanRules:
+    """ Rules for questioning trail points
+    """
+    def __init__(self, max_dist_allowed=150., max_speed=None,
+                 keep_outside=True):
+        """ Setup rules
+        :max_dist_allowed: point is questioned if it is further than
+                this (meters) from its neighbors (both neighbors,
+                or the only neighbor for segment ends)
+                None - no distance check
+                default: 150
+        :max_speed: point is questioned if reached from previous point
+                faster than this (meters/sec). Only if point times are known
+                default: None - no speed check
+        :keep_outside: Keep questioned points (outside the map border,
+                too far, too fast) - only flag them
+                False: drop questioned points
+                default: keep
+        """
+        self.max_dist_allowed = max_dist_allowed
+        self.max_speed = max_speed
+        self.keep_outside = keep_outside
+
+
+class TrailCleanStats:
+    """ Statistics gathered while cleaning trail
+    """
+    def __init__(self):
+        self.n_points = 0       # Points examined
+        self.n_kept = 0         # Points kept
+        self.n_outside = 0      # Points outside border
+        self.n_too_far = 0      # Points too far from neighbors
+        self.n_too_fast = 0     # Points reached too fast
+        self.n_diff = 0         # Number of distances between kept points
+        self.min_dist = None
+        self.max_dist = None
+        self.total_dist = 0.
+        self.max_speed = None
+
+    def avg_dist(self):
+        return 0. if self.n_diff == 0 else self.total_dist/self.n_diff
+
+    def add_distances(self, dists):
+        """ Include distances between consecutive kept points
+        :dists: array of distances
+        """
+        if len(dists) == 0:
+            return
+
+        self.n_diff += len(dists)
+        self.total_dist += float(dists.sum())
+        dmin = float(dists.min())
+        dmax = float(dists.max())
+        if self.min_dist is None or dmin < self.min_dist:
+            self.min_dist = dmin
+        if self.max_dist is None or dmax > self.max_dist:
+            self.max_dist = dmax
+
+    def log(self, trace=None):
+        """ Log statistics
+        :trace: trace flag default: always log
+        """
+        SlTrace.lg("Trail Statistics", trace)
+        SlTrace.lg(f"Number of points: {self.n_points}", trace)
+        SlTrace.lg(f"Number of displayed points: {self.n_kept}", trace)
+        SlTrace.lg(f"Questioned: outside border: {self.n_outside}"
+                   f" too far: {self.n_too_far} too fast: {self.n_too_fast}", trace)
+        if self.n_diff > 0:
+            SlTrace.lg(f"minimum distance: {self.min_dist:.1f}m"
+                       f" maximum distance: {self.max_dist:.1f}m"
+                       f" average: {self.avg_dist():.2f}m", trace)
+            SlTrace.lg(f"Total path distance: {self.total_dist:.1f}m", trace)
+        if self.max_speed is not None:
+            SlTrace.lg(f"maximum speed: {self.max_speed:.2f}m/sec", trace)
+
+
+class CleanedTrailSegment:
+    """ Segment of cleaned trail - kept points plus flags
+    """
+    FLAG_OUTSIDE = 0x01
+    FLAG_TOO_FAR = 0x02
+    FLAG_TOO_FAST = 0x04
+
+    def __init__(self, points, flags, source=None):
+        """ Setup segment
+        :points: list of kept points
+        :flags: array of flags, for kept points
+        :source: original segment, if all its points were kept
+        """
+        self.points = points
+        self.flags = flags
+        self.source = source
+
+    def get_points(self):
+        return self.points
+
+    def get_flags(self):
+        return self.flags
+
+    def get_stats(self):
+        """ Statistics (SegmentStats) of original segment
+        :returns: stats, None if points were dropped
+        """
+        if self.source is None:
+            return None
+        return self.source.get_stats()
+
+
+class CleanedTrail:
+    """ Trail, as returned by cleanTrail
+    """
+    def __init__(self, segments, stats):
+        self.segments = segments
+        self.stats = stats
+
+    def get_segments(self):
+        return self.segments
+
+    def get_points(self):
+        points = []
+        for segment in self.segments:
+            points.extend(segment.get_points())
+        return points
+
+    def get_stats(self):
+        return self.stats
+
+
+def clean_segment_flags(lats, longs, times=None, inside=None, rules=None):
+    """ Flag questionable points in one segment
+    :lats, longs: arrays of point latitude, longitude
+    :times: array of point times (seconds), nan if unknown
+            default: no speed check
+    :inside: boolean array, True if point is inside border
+            default: all inside
+    :rules: TrailCleanRules default: TrailCleanRules()
+    :returns: array (uint8) of CleanedTrailSegment.FLAG_* per point
+    """
+    if rules is None:
+        rules = TrailCleanRules()
+    npts = len(lats)
+    flags = np.zeros(npts, dtype=np.uint8)
+    if npts == 0:
+        return flags
+
+    if inside is not None:
+        flags[~np.asarray(inside, dtype=bool)] |= CleanedTrailSegment.FLAG_OUTSIDE
+    if npts < 2:
+        return flags
+
+    dists = geo_distances(lats, longs)
+    if rules.max_dist_allowed is not None:
+        far = dists > rules.max_dist_allowed
+        too_far = np.zeros(npts, dtype=bool)
+        too_far[1:-1] = far[:-1] & far[1:]      # Spike - far from both sides
+        too_far[0] = far[0]
+        too_far[-1] = far[-1]
+        flags[too_far] |= CleanedTrailSegment.FLAG_TOO_FAR
+    if rules.max_speed is not None and times is not None:
+        dts = np.diff(np.asarray(times, dtype=np.float64))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speeds = dists / dts
+        fast = np.zeros(npts, dtype=bool)
+        fast[1:] = np.isfinite(speeds) & (dts > 0) & (speeds > rules.max_speed)
+        flags[fast] |= CleanedTrailSegment.FLAG_TOO_FAST
+    return flags
+
+
+def clean_trail(trail_in, inside_fun=None, rules=None, trace="clean_trail"):
+    """ Clean trail
+    :trail_in: trail (SurveyTrail) - get_segments() of
+            get_points(), get_times()
+    :inside_fun: function(lats, longs) returning boolean array, True if inside
+            default: no border check
+    :rules: TrailCleanRules default: TrailCleanRules()
+    :trace: trace flag for statistics logging
+    :returns: CleanedTrail
+    """
+    if rules is None:
+        rules = TrailCleanRules()
+    stats = TrailCleanStats()
+    segments = []
+    for track in trail_in.get_segments():
+        points = track.get_points()
+        npts = len(points)
+        lats = np.fromiter((pt.lat for pt in points), dtype=np.float64, count=npts)
+        longs = np.fromiter((pt.long for pt in points), dtype=np.float64, count=npts)
+        times = track.get_times()
+        if times is not None and len(times) != npts:
+            times = None
+        inside = None if inside_fun is None else inside_fun(lats, longs)
+        flags = clean_segment_flags(lats, longs, times=times, inside=inside,
+                                    rules=rules)
+        stats.n_points += npts
+        stats.n_outside += int(np.count_nonzero(flags & CleanedTrailSegment.FLAG_OUTSIDE))
+        stats.n_too_far += int(np.count_nonzero(flags & CleanedTrailSegment.FLAG_TOO_FAR))
+        stats.n_too_fast += int(np.count_nonzero(flags & CleanedTrailSegment.FLAG_TOO_FAST))
+        if rules.keep_outside:
+            keep = np.ones(npts, dtype=bool)
+        else:
+            keep = flags == 0
+        kept_idxs = np.nonzero(keep)[0]
+        kept_points = [points[i] for i in kept_idxs]
+        stats.n_kept += len(kept_points)
+        if len(kept_idxs) > 1:
+            kept_dists = geo_distances(lats[kept_idxs], longs[kept_idxs])
+            stats.add_distances(kept_dists)
+            if times is not None:
+                dts = np.diff(times[kept_idxs])
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    speeds = kept_dists / dts
+                speeds = speeds[np.isfinite(speeds) & (dts > 0)]
+                if len(speeds) > 0:
+                    smax = float(speeds.max())
+                    if stats.max_speed is None or smax > stats.max_speed:
+                        stats.max_speed = smax
+        source = track if len(kept_points) == npts else None
+        segments.append(CleanedTrailSegment(kept_points, flags[kept_idxs],
+                                            source=source))
+    stats.log(trace)
+    return CleanedTrail(segments, stats)
@@ -0,0 +1,245 @@
+# trail_diff.py    19Oct2026  crs
+"""
+Compare two revisions of a trail (GPX) file - points moved, added, deleted
+
+Points of the new revision are indexed in a KDTree (local meters).
+Each old segment is aligned with the new segment holding most of its
+points' nearest neighbors, its points are matched to that segment's
+points (a KDTree per aligned segment) and the matches kept in track
+order (longest increasing - or, for a reversed segment, decreasing -
+run of matched new point indexes), so the whole diff is O(n log n).
+Remaining close points are then matched to their nearest unmatched
+new point.
+Matched points further apart than move_tol are reported as moved,
+unmatched old points as deleted and unmatched new points as added.
+"""
+import os
+import sys
+import bisect
+
+import numpy as np
+
+from select_trace import SlTrace
+from select_error import SelectError
+from gpx_stream import GPXStreamReader, GPXSegmentArrays
+from kd_tree import KDTree
+from trail_query import LocalProjection
+
+
+def longest_increasing(values):
+    """ Longest strictly increasing subsequence
+    :values: sequence of numbers
+    :returns: array of indexes, into values, of the subsequence
+    """
+    tails = []              # Smallest tail value of run of each length
+    tail_idx = []
+    prev = np.full(len(values), -1, dtype=np.int64)
+    for i, value in enumerate(values):
+        k = bisect.bisect_left(tails, value)
+        if k > 0:
+            prev[i] = tail_idx[k-1]
+        if k == len(tails):
+            tails.append(value)
+            tail_idx.append(i)
+        else:
+            tails[k] = value
+            tail_idx[k] = i
+    run = []
+    i = tail_idx[-1] if tail_idx else -1
+    while i >= 0:
+        run.append(i)
+        i = prev[i]
+    run.reverse()
+    return np.array(run, dtype=np.int64)
+
+
+class TrailPoints:
+    """ Trail file points, flattened, with segment / index of each
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+        segments = GPXStreamReader(file_name).get_segments()
+        self.nsegments = len(segments)
+        if self.nsegments == 0:
+            segments = [GPXSegmentArrays(np.zeros(0), np.zeros(0))]
+        self.lats = np.concatenate([seg.lat for seg in segments])
+        self.longs = np.concatenate([seg.long for seg in segments])
+        self.seg = np.concatenate([np.full(len(seg), i, dtype=np.int64)
+                                   for i, seg in enumerate(segments)])
+        self.idx = np.concatenate([np.arange(len(seg), dtype=np.int64)
+                                   for seg in segments])
+
+    def __len__(self):
+        return len(self.lats)
+
+    def label(self, i):
+        """ Point label, as SurveyTrail's default label_pattern
+        """
+        return "t%d.%d" % (self.seg[i]+1, self.idx[i]+1)
+
+
+class TrailDiff:
+    def __init__(self, old_file, new_file, match_dist=25., move_tol=.05):
+        """ Compare trail files
+        :old_file: original trail file (.gpx)
+        :new_file: revised trail file
+        :match_dist: points further apart are not matched (meters)
+                default: 25
+        :move_tol: matched points further apart are moved (meters)
+                default: .05
+        """
+        for file_name in (old_file, new_file):
+            if not os.path.exists(file_name):
+                raise SelectError(f"Trail file {file_name} not found")
+        self.old = TrailPoints(old_file)
+        self.new = TrailPoints(new_file)
+        self.match_dist = match_dist
+        self.move_tol = move_tol
+        self.compare()
+
+    def compare(self):
+        """ Match points, setting:
+            old_match - new point index per old point, -1 if deleted
+            new_match - old point index per new point, -1 if added
+            match_dists - distance per old point, nan if deleted
+        """
+        old, new = self.old, self.new
+        self.old_match = np.full(len(old), -1, dtype=np.int64)
+        self.new_match = np.full(len(new), -1, dtype=np.int64)
+        self.match_dists = np.full(len(old), np.nan)
+        if len(old) == 0 or len(new) == 0:
+            return
+
+        proj = LocalProjection(float(np.concatenate([old.lats, new.lats]).mean()),
+                               float(np.concatenate([old.longs, new.longs]).mean()))
+        old_xy = proj.to_xy(old.lats, old.longs)
+        new_xy = proj.to_xy(new.lats, new.longs)
+        dists, near = KDTree(new_xy).query(old_xy, k=1)
+        dists = dists[:, 0]
+        near = near[:, 0]
+        close = dists <= self.match_dist
+
+        new_trees = {}              # KDTree per new segment, when needed
+        pair_old = []
+        pair_new = []
+        for s in range(old.nsegments):
+            in_seg = np.nonzero((old.seg == s) & close)[0]
+            if len(in_seg) == 0:
+                continue
+            new_seg = int(np.bincount(new.seg[near[in_seg]]).argmax())
+            if new_seg not in new_trees:
+                new_idxs = np.nonzero(new.seg == new_seg)[0]
+                new_trees[new_seg] = (new_idxs, KDTree(new_xy[new_idxs]))
+            new_idxs, tree = new_trees[new_seg]
+            seg_old = np.nonzero(old.seg == s)[0]
+            seg_dists, seg_near = tree.query(old_xy[seg_old], k=1)
+            ok = seg_dists[:, 0] <= self.match_dist
+            cand = seg_old[ok]
+            values = new_idxs[seg_near[ok, 0]]
+            run = longest_increasing(values.tolist())
+            run_rev = longest_increasing((-values).tolist())
+            if len(run_rev) > len(run):
+                run = run_rev
+            pair_old.append(cand[run])
+            pair_new.append(values[run])
+        if len(pair_old) == 0:
+            return
+
+        pair_old = np.concatenate(pair_old)
+        pair_new = np.concatenate(pair_new)
+        pair_dist = np.sqrt(((old_xy[pair_old] - new_xy[pair_new])**2).sum(axis=1))
+        self._set_matches(pair_old, pair_new, pair_dist)
+        # Remaining close points, matched out of track order
+        rest = np.nonzero(close & (self.old_match < 0))[0]
+        rest = rest[self.new_match[near[rest]] < 0]
+        if len(rest) > 0:
+            self._set_matches(rest, near[rest], dists[rest])
+
+    def _set_matches(self, pair_old, pair_new, pair_dist):
+        """ Record matches, a new point matched more than once keeps the closest
+        """
+        order = np.lexsort((pair_dist, pair_new))
+        pair_old, pair_new, pair_dist = pair_old[order], pair_new[order], pair_dist[order]
+        first = np.ones(len(pair_new), dtype=bool)
+        first[1:] = pair_new[1:] != pair_new[:-1]
+        pair_old, pair_new, pair_dist = pair_old[first], pair_new[first], pair_dist[first]
+        self.old_match[pair_old] = pair_new
+        self.new_match[pair_new] = pair_old
+        self.match_dists[pair_old] = pair_dist
+
+    def get_moved(self):
+        """ Moved points
+        :returns: (old point idxs, new point idxs, distances)
+        """
+        moved = np.nonzero(self.match_dists > self.move_tol)[0]
+        return moved, self.old_match[moved], self.match_dists[moved]
+
+    def get_deleted(self):
+        """ Old point indexes not in new revision
+        """
+        return np.nonzero(self.old_match < 0)[0]
+
+    def get_added(self):
+        """ New point indexes not in old revision
+        """
+        return np.nonzero(self.new_match < 0)[0]
+
+    def n_unchanged(self):
+        return int(np.count_nonzero(self.match_dists <= self.move_tol))
+
+    def report(self, trace=None, list_points=True):
+        """ Log differences
+        :trace: trace flag default: always log
+        :list_points: list each changed point default: True
+        """
+        moved_old, moved_new, moved_dists = self.get_moved()
+        deleted = self.get_deleted()
+        added = self.get_added()
+        SlTrace.lg(f"Trail diff {os.path.basename(self.old.file_name)}"
+                   f" => {os.path.basename(self.new.file_name)}", trace)
+        SlTrace.lg(f"  points: {len(self.old)} => {len(self.new)}"
+                   f"  unchanged: {self.n_unchanged()} moved: {len(moved_old)}"
+                   f" deleted: {len(deleted)} added: {len(added)}", trace)
+        if not list_points:
+            return
+
+        for oi, ni, dist in zip(moved_old, moved_new, moved_dists):
+            SlTrace.lg(f"  moved {self.old.label(oi)} => {self.new.label(ni)}"
+                       f" {dist:.2f}m", trace)
+        for oi in deleted:
+            SlTrace.lg(f"  deleted {self.old.label(oi)}"
+                       f" lat: {self.old.lats[oi]:.6f} long: {self.old.longs[oi]:.6f}", trace)
+        for ni in added:
+            SlTrace.lg(f"  added {self.new.label(ni)}"
+                       f" lat: {self.new.lats[ni]:.6f} long: {self.new.longs[ni]:.6f}", trace)
+
+    def draw(self, drawer, moved_color="orange", deleted_color="red",
+             added_color="green", radius=4, width=2):
+        """ Draw differences on map
+        :drawer: GeoDraw or ImageOverDraw (getXY, drawLine, drawCircle)
+        :moved_color: color of old to new line for moved points
+        :deleted_color: color of deleted points
+        :added_color: color of added points
+        :radius: point marker radius, in pixels
+        :width: line width, in pixels
+        """
+        moved_old, moved_new, _ = self.get_moved()
+        for oi, ni in zip(moved_old, moved_new):
+            xy1 = drawer.getXY(latLong=(self.old.lats[oi], self.old.longs[oi]))
+            xy2 = drawer.getXY(latLong=(self.new.lats[ni], self.new.longs[ni]))
+            drawer.drawLine(xy1, xy2, color=moved_color, width=width)
+            drawer.drawCircle(xY=xy2, radius=radius, color=moved_color)
+        for oi in self.get_deleted():
+            xy = drawer.getXY(latLong=(self.old.lats[oi], self.old.longs[oi]))
+            drawer.drawCircle(xY=xy, radius=radius, color=deleted_color)
+        for ni in self.get_added():
+            xy = drawer.getXY(latLong=(self.new.lats[ni], self.new.longs[ni]))
+            drawer.drawCircle(xY=xy, radius=radius, color=added_color)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: trail_diff.py <old .gpx> <new .gpx>")
+        sys.exit(1)
+    trail_diff = TrailDiff(sys.argv[1], sys.argv[2])
+    trail_diff.report()
@@ -0,0 +1,182 @@
+# trail_journal.py    19Oct2026  crs
+"""
+Append-only edit journal for a trail file
+
+Trail edits (point moves, deletions, insertions) are appended, one
+line each, to <trail file>.journal and flushed as they are made, so
+saving work is cheap and no edit is lost.  On load the journal is
+replayed over the trail file's points.  The full GPX file is rewritten
+only on an explicit save (export), after which the journal is reset.
+
+Journal lines:
+    # trail journal <version> <mtime_ns> <size>     - header, binding
+                                                    the journal to the
+                                                    trail file version
+    M <seg_no> <index> <lat> <long>     - move point
+    D <seg_no> <index>                  - delete point
+    I <seg_no> <index> <lat> <long>     - insert point before index
+Segment numbers start at 1, point indexes at 0 and are as of the edit.
+"""
+import os
+
+from select_trace import SlTrace
+
+
+class TrailJournal:
+    VERSION = 1                 # Change if the journal format changes
+
+    def __init__(self, trail_file):
+        """ Setup journal for trail file
+        :trail_file: trail (GPX) file name
+        """
+        self.trail_file = trail_file
+        self.journal_name = trail_file + ".journal"
+        self.fout = None
+        self.n_records = 0
+
+    def get_key(self):
+        """ Trail file version key
+        :returns: (mtime_ns, size), None if file not found
+        """
+        try:
+            st = os.stat(self.trail_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def header(self):
+        mtime_ns, size = self.get_key()
+        return f"# trail journal {TrailJournal.VERSION} {mtime_ns} {size}\n"
+
+    def read(self):
+        """ Read journal records
+        A journal not matching the trail file is set aside (renamed .stale)
+        :returns: list of (op, seg_no, index, lat, long) lat, long None for D
+        """
+        if not os.path.exists(self.journal_name):
+            return []
+
+        records = []
+        with open(self.journal_name) as fin:
+            header = fin.readline()
+            if header != self.header():
+                stale_name = self.journal_name + ".stale"
+                SlTrace.lg(f"Trail journal {self.journal_name} does not match"
+                           f" {self.trail_file} - moved to {stale_name}")
+                fin.close()
+                os.replace(self.journal_name, stale_name)
+                return []
+
+            for nline, line in enumerate(fin, start=2):
+                fields = line.split()
+                if len(fields) == 0:
+                    continue
+                try:
+                    op = fields[0]
+                    seg_no = int(fields[1])
+                    index = int(fields[2])
+                    if op == "D":
+                        records.append((op, seg_no, index, None, None))
+                    elif op in ("M", "I"):
+                        records.append((op, seg_no, index,
+                                        float(fields[3]), float(fields[4])))
+                    else:
+                        raise ValueError(f"unrecognized op {op}")
+                except (IndexError, ValueError) as e:
+                    if not line.endswith("\n"):
+                        SlTrace.lg(f"Trail journal {self.journal_name}:"
+                                   f" ignoring incomplete last line {nline}")
+                        break
+                    SlTrace.lg(f"Trail journal {self.journal_name}:"
+                               f" ignoring bad line {nline}: {e}")
+        self.n_records = len(records)
+        return records
+
+    def read_by_segment(self):
+        """ Read journal records, grouped by segment, so each
+        segment's edits can be replayed as it is loaded
+        :returns: dictionary, by seg_no, of record lists, in journal order
+        """
+        edits = {}
+        for record in self.read():
+            edits.setdefault(record[1], []).append(record)
+        return edits
+
+    def replay_segment(self, lats, longs, records):
+        """ Apply segment's journal records to its points
+        :lats: segment's point latitudes (sequence, e.g. array, unchanged)
+        :longs: segment's point longitudes
+        :records: segment's records, as from read_by_segment
+                records for missing points are logged and skipped, so
+                a trail can always be loaded
+        :returns: (lats list, longs list) edited
+        """
+        lats = list(lats)
+        longs = list(longs)
+        for op, seg_no, index, lat, long in records:
+            if op == "I":
+                lats.insert(index, lat)
+                longs.insert(index, long)
+                continue
+
+            if index < 0 or index >= len(lats):
+                SlTrace.lg(f"Trail journal {self.journal_name}: ignoring"
+                           f" {op} of missing point {index} in segment {seg_no}")
+                continue
+
+            if op == "M":
+                lats[index] = lat
+                longs[index] = long
+            else:
+                del lats[index]
+                del longs[index]
+        SlTrace.lg(f"Trail journal: replayed {len(records)} edits"
+                   f" to segment {records[0][1]} from {self.journal_name}")
+        return lats, longs
+
+    def open(self):
+        """ Open journal for appending, starting it if new
+        """
+        if self.fout is not None:
+            return
+
+        is_new = not os.path.exists(self.journal_name)
+        self.fout = open(self.journal_name, "a")
+        if is_new:
+            self.fout.write(self.header())
+            self.fout.flush()
+
+    def append(self, op, seg_no, index, lat=None, long=None):
+        """ Append record, flushed to the journal file
+        """
+        self.open()
+        if op == "D":
+            line = f"D {seg_no} {index}\n"
+        else:
+            line = f"{op} {seg_no} {index} {lat!r} {long!r}\n"
+        self.fout.write(line)
+        self.fout.flush()
+        self.n_records += 1
+
+    def move(self, seg_no, index, lat, long):
+        self.append("M", seg_no, index, lat, long)
+
+    def delete(self, seg_no, index):
+        self.append("D", seg_no, index)
+
+    def insert(self, seg_no, index, lat, long):
+        self.append("I", seg_no, index, lat, long)
+
+    def close(self):
+        if self.fout is not None:
+            self.fout.close()
+            self.fout = None
+
+    def reset(self):
+        """ Start empty journal, for the current trail file version
+        e.g. after the trail is saved (compacted) to the trail file
+        """
+        self.close()
+        if os.path.exists(self.journal_name):
+            os.remove(self.journal_name)
+        self.n_records = 0
@@ -0,0 +1,326 @@
+# trail_network.py    19Oct2026  crs
+"""
+Trail network - trail segments joined where their endpoints meet -
+with shortest path and multi-stop route planning
+
+Segment endpoints are snapped, using a spatial hash of all trail
+points, to trail points of other segments (or distant parts of the
+same segment) within snap_dist meters.  Snapped points become network
+nodes, joined by edges along the segments, weighted by path length.
+Locations off the trail (e.g. sample plots) are attached at their
+nearest trail location (TrailQuery).
+"""
+import heapq
+
+import numpy as np
+
+from select_trace import SlTrace
+from select_error import SelectError
+
+
+class TrailNetwork:
+    def __init__(self, trail, snap_dist=5.):
+        """ Build network
+        :trail: SurveyTrail
+        :snap_dist: endpoints within this distance (meters) of a trail
+                point are joined there default: 5
+        """
+        self.trail = trail
+        self.snap_dist = snap_dist
+        self.query = trail.get_query()
+        self.seg_stats = {}         # by segment_no
+        for segment in trail.get_segments():
+            stats = segment.get_stats()
+            if stats.npoints() > 0:
+                self.seg_stats[segment.segment_no] = stats
+        self.build()
+
+    def build(self):
+        """ Snap endpoints and build node / edge lists
+        """
+        query = self.query
+        vert_xy = query.vert_xy
+        nverts = len(vert_xy)
+        parent = list(range(nverts))        # union-find over trail points
+
+        def find(v):
+            while parent[v] != v:
+                parent[v] = parent[parent[v]]
+                v = parent[v]
+            return v
+
+        def union(v1, v2):
+            r1, r2 = find(v1), find(v2)
+            if r1 != r2:
+                parent[r2] = r1
+
+        # Spatial hash of trail points, cells snap_dist on a side
+        cells = {}
+        cell_ij = np.floor(vert_xy/self.snap_dist).astype(np.int64)
+        for v, (ci, cj) in enumerate(cell_ij.tolist()):
+            cells.setdefault((ci, cj), []).append(v)
+
+        junction = np.zeros(nverts, dtype=bool)
+        seg_first = np.ones(nverts, dtype=bool)
+        seg_first[1:] = query.vert_seg[1:] != query.vert_seg[:-1]
+        seg_last = np.ones(nverts, dtype=bool)
+        seg_last[:-1] = query.vert_seg[:-1] != query.vert_seg[1:]
+        junction[seg_first | seg_last] = True
+        seg_base = np.nonzero(seg_first)[0]     # first vertex of each segment
+        snap2 = self.snap_dist**2
+        for v in np.nonzero(seg_first | seg_last)[0].tolist():
+            ci, cj = cell_ij[v]
+            vx, vy = vert_xy[v]
+            seg = query.vert_seg[v]
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    for w in cells.get((ci+di, cj+dj), ()):
+                        if w == v:
+                            continue
+                        dx = vert_xy[w, 0] - vx
+                        dy = vert_xy[w, 1] - vy
+                        if dx*dx + dy*dy > snap2:
+                            continue
+                        if query.vert_seg[w] == seg:
+                            stats = self._stats(seg)
+                            if stats.length(min(v, w) - seg_base[seg],
+                                            max(v, w) - seg_base[seg]) <= 2*self.snap_dist:
+                                continue    # Neighbor along segment, not a loop
+                        junction[w] = True
+                        union(v, w)
+
+        # Nodes: union-find roots of junction points
+        self.node_of_root = {}
+        self.vert_node = np.full(nverts, -1, dtype=np.int64)
+        node_verts = []
+        for v in np.nonzero(junction)[0].tolist():
+            root = find(v)
+            node = self.node_of_root.get(root)
+            if node is None:
+                node = len(node_verts)
+                self.node_of_root[root] = node
+                node_verts.append(root)
+            self.vert_node[v] = node
+        self.node_xy = vert_xy[np.array(node_verts, dtype=np.int64)] if node_verts else np.zeros((0, 2))
+        # Edges along segments, between consecutive junction points
+        self.adj = [[] for _ in range(len(node_verts))]
+        self.edges = []             # (node1, node2, length, seg, v1, v2)
+        for seg in range(len(seg_base)):
+            base = seg_base[seg]
+            jvs = np.nonzero(junction[base:base+self._stats(seg).npoints()])[0]
+            stats = self._stats(seg)
+            for k in range(len(jvs)-1):
+                i1, i2 = int(jvs[k]), int(jvs[k+1])
+                n1 = int(self.vert_node[base+i1])
+                n2 = int(self.vert_node[base+i2])
+                if n1 == n2:
+                    continue
+                length = stats.length(i1, i2)
+                edge = len(self.edges)
+                self.edges.append((n1, n2, length, seg, i1, i2))
+                self.adj[n1].append((n2, length, edge))
+                self.adj[n2].append((n1, length, edge))
+        self.seg_junctions = [np.nonzero(junction[seg_base[seg]:seg_base[seg]
+                                                  + self._stats(seg).npoints()])[0]
+                              for seg in range(len(seg_base))]
+        SlTrace.lg(f"TrailNetwork: {len(node_verts)} nodes {len(self.edges)} edges",
+                   "trail_network")
+
+    def _stats(self, seg):
+        """ SegmentStats for query segment index
+        """
+        return self.seg_stats[self.query.segment_nos[seg]]
+
+    def nnodes(self):
+        return len(self.adj)
+
+    def shortest_paths(self, sources):
+        """ Dijkstra from one or more sources
+        :sources: list of (node, initial cost)
+        :returns: dists array, prev_edge array (-1 at sources / unreached)
+        """
+        dists = np.full(self.nnodes(), np.inf)
+        prev_edge = np.full(self.nnodes(), -1, dtype=np.int64)
+        heap = []
+        for node, cost in sources:
+            if cost < dists[node]:
+                dists[node] = cost
+                heapq.heappush(heap, (cost, node))
+        while heap:
+            dist, node = heapq.heappop(heap)
+            if dist > dists[node]:
+                continue
+            for nbr, length, edge in self.adj[node]:
+                nd = dist + length
+                if nd < dists[nbr]:
+                    dists[nbr] = nd
+                    prev_edge[nbr] = edge
+                    heapq.heappush(heap, (nd, nbr))
+        return dists, prev_edge
+
+    def shortest_path(self, node1, node2):
+        """ Shortest path between nodes
+        :returns: length, list of edges (None, [] if unreachable)
+        """
+        dists, prev_edge = self.shortest_paths([(node1, 0.)])
+        if not np.isfinite(dists[node2]):
+            return None, []
+        return float(dists[node2]), self.path_edges(prev_edge, node2)
+
+    def path_edges(self, prev_edge, node):
+        """ Edges from source to node
+        """
+        edges = []
+        while prev_edge[node] >= 0:
+            edge = int(prev_edge[node])
+            edges.append(edge)
+            n1, n2 = self.edges[edge][:2]
+            node = n1 if n2 == node else n2
+        edges.reverse()
+        return edges
+
+    def attach(self, lats, longs):
+        """ Attach locations at their nearest trail location
+        :lats, longs: arrays of latitude, longitude
+        :returns: list of attachments, one per location:
+                (off trail distance, seg, position along segment (meters),
+                 [(node, distance along trail to node), ...])
+        """
+        nearest = self.query.nearest(lats, longs)
+        seg_index = {seg_no : i for i, seg_no in enumerate(self.query.segment_nos)}
+        attachments = []
+        for i in range(len(nearest)):
+            if nearest.segment_nos[i] < 0:
+                attachments.append((np.inf, -1, 0., []))
+                continue
+            seg = seg_index[int(nearest.segment_nos[i])]
+            stats = self._stats(seg)
+            point_idx = int(nearest.point_idxs[i])
+            pos = stats.length(0, point_idx)
+            if point_idx+1 < stats.npoints():
+                pos += float(nearest.fracts[i])*stats.get_dist(point_idx+1)
+            jvs = self.seg_junctions[seg]
+            base = np.searchsorted(self.query.vert_seg, seg)
+            k = np.searchsorted(jvs, point_idx, side="right") - 1
+            ends = []
+            for jv in (jvs[max(k, 0)], jvs[min(k+1, len(jvs)-1)]):
+                node = int(self.vert_node[base+jv])
+                ends.append((node, abs(stats.length(0, int(jv)) - pos)))
+            attachments.append((float(nearest.dists[i]), seg, pos, ends))
+        return attachments
+
+    def stop_distances(self, attachments):
+        """ Trail distance between each pair of attached stops
+        :attachments: from attach
+        :returns: array (n x n) of distances, inf if not connected
+                (excluding off trail distance)
+        """
+        n = len(attachments)
+        dmat = np.full((n, n), np.inf)
+        for i, (_, seg_i, pos_i, ends_i) in enumerate(attachments):
+            if len(ends_i) == 0:
+                continue
+            dists, _ = self.shortest_paths(ends_i)
+            for j, (_, seg_j, pos_j, ends_j) in enumerate(attachments):
+                if len(ends_j) == 0:
+                    continue
+                best = min(dists[node] + dist for node, dist in ends_j)
+                if seg_i == seg_j and self._same_edge(seg_i, pos_i, pos_j):
+                    best = min(best, abs(pos_i - pos_j))
+                dmat[i, j] = best
+        np.fill_diagonal(dmat, 0.)
+        return dmat
+
+    def _same_edge(self, seg, pos1, pos2):
+        """ Check if positions along segment are between the same junctions
+        """
+        stats = self._stats(seg)
+        jpos = stats.prefix[self.seg_junctions[seg]]
+        return (np.searchsorted(jpos, pos1, side="right")
+                == np.searchsorted(jpos, pos2, side="right"))
+
+
+class RoutePlanner:
+    """ Order stops (e.g. sample plots) for a short trail route
+    """
+    def __init__(self, network):
+        """
+        :network: TrailNetwork
+        """
+        self.network = network
+
+    def plan(self, lats, longs, start=0, return_to_start=False, max_passes=20):
+        """ Plan route visiting all locations
+        Nearest neighbor ordering, improved by 2-opt
+        :lats, longs: stop latitudes, longitudes
+        :start: index of first stop default: 0
+        :return_to_start: route ends at first stop default: False
+        :max_passes: maximum 2-opt improvement passes
+        :returns: (order list of stop indexes, trail length, off trail length)
+        """
+        attachments = self.network.attach(lats, longs)
+        n = len(attachments)
+        if n == 0:
+            return [], 0., 0.
+        if start < 0 or start >= n:
+            raise SelectError(f"RoutePlanner: start {start} not in 0..{n-1}")
+
+        dmat = self.network.stop_distances(attachments)
+        off = np.array([att[0] for att in attachments])
+        unreached = ~np.isfinite(dmat[start])
+        if unreached.any():
+            SlTrace.lg(f"RoutePlanner: {int(unreached.sum())} stops not"
+                       f" reachable on trail network - skipped")
+        cost = np.where(np.isfinite(dmat), dmat, 1e12)
+        cost = cost + off[:, None] + off[None, :]       # Walk to / from trail
+        np.fill_diagonal(cost, 0.)
+
+        order = [start]
+        visited = unreached.copy()
+        visited[start] = True
+        while not visited.all():
+            row = np.where(visited, np.inf, cost[order[-1]])
+            nxt = int(np.argmin(row))
+            order.append(nxt)
+            visited[nxt] = True
+        order = self.two_opt(order, cost, return_to_start, max_passes)
+        route = order + [order[0]] if return_to_start else order
+        trail_len = sum(float(dmat[route[i], route[i+1]]) for i in range(len(route)-1))
+        off_len = sum(2*float(off[i]) for i in order)
+        SlTrace.lg(f"RoutePlanner: {len(order)} stops trail {trail_len:.0f}m"
+                   f" off trail {off_len:.0f}m", "trail_network")
+        return order, trail_len, off_len
+
+    @staticmethod
+    def two_opt(order, cost, closed=False, max_passes=20):
+        """ Improve order by reversing sub-routes, first stop kept
+        :returns: improved order
+        """
+        order = np.array(order, dtype=np.int64)
+        n = len(order)
+        if n < 4:
+            return order.tolist()
+
+        for _ in range(max_passes):
+            improved = False
+            for i in range(1, n-1):
+                a = order[i-1]
+                b = order[i]
+                js = np.arange(i+1, n)
+                c = order[js]
+                if closed:
+                    d = order[(js+1) % n]
+                    delta = (cost[a, c] + cost[b, d]) - (cost[a, b] + cost[c, d])
+                else:
+                    d_exists = js+1 < n
+                    d = order[np.minimum(js+1, n-1)]
+                    delta = (cost[a, c] + np.where(d_exists, cost[b, d], 0.)
+                             - cost[a, b] - np.where(d_exists, cost[c, d], 0.))
+                k = int(np.argmin(delta))
+                if delta[k] < -1e-9:
+                    j = int(js[k])
+                    order[i:j+1] = order[i:j+1][::-1].copy()
+                    improved = True
+            if not improved:
+                break
+        return order.tolist()
@@ -0,0 +1,254 @@
+# trail_query.py    19Oct2026  crs
+"""
+Spatial queries against a trail - nearest trail location, trail points
+within a radius, k nearest trail points - for many query points at once
+
+Trail points are projected to local x,y meters (LocalProjection) and
+indexed in a KDTree.  Long trail lines are indexed at intermediate
+points too (at most max_piece meters apart), so the nearest indexed
+point bounds the search for the nearest point on a line, which is then
+found by point to line segment projection.  Trail point (vertex)
+queries use a second KDTree of just the trail points.
+"""
+import numpy as np
+
+from select_trace import SlTrace
+from kd_tree import KDTree
+from trail_clean import EARTH_MEAN_RADIUS
+
+
+class LocalProjection:
+    """ Equirectangular projection, in meters, about a reference point
+    Adequate over the extent of a survey area
+    """
+    def __init__(self, lat0, long0):
+        self.lat0 = lat0
+        self.long0 = long0
+        self.x_scale = EARTH_MEAN_RADIUS*np.cos(np.radians(lat0))*np.pi/180.
+        self.y_scale = EARTH_MEAN_RADIUS*np.pi/180.
+
+    def to_xy(self, lats, longs):
+        """ Project
+        :returns: array (n x 2) of x (east), y (north) meters
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        longs = np.asarray(longs, dtype=np.float64)
+        return np.column_stack([(longs - self.long0)*self.x_scale,
+                                (lats - self.lat0)*self.y_scale])
+
+    def to_lat_long(self, xy):
+        """ Inverse projection
+        :returns: lats, longs arrays
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        return (xy[:, 1]/self.y_scale + self.lat0,
+                xy[:, 0]/self.x_scale + self.long0)
+
+
+class TrailNearest:
+    """ Nearest trail locations for query points (arrays, one per query)
+    """
+    def __init__(self, dists, lats, longs, segment_nos, point_idxs, fracts):
+        """
+        :dists: distance to trail (meters), inf if trail is empty
+        :lats, longs: nearest trail location
+        :segment_nos: trail segment number (SurveyTrailSegment.segment_no)
+        :point_idxs: index, in segment, of the start of the nearest line
+        :fracts: fraction along line (0 - at point_idx, 1 - at next point)
+        """
+        self.dists = dists
+        self.lats = lats
+        self.longs = longs
+        self.segment_nos = segment_nos
+        self.point_idxs = point_idxs
+        self.fracts = fracts
+
+    def __len__(self):
+        return len(self.dists)
+
+    def get_point_idx(self, i):
+        """ Index, in segment, of trail point closest to query i's location
+        """
+        return int(self.point_idxs[i]) + (1 if self.fracts[i] > .5 else 0)
+
+
+class TrailQuery:
+    def __init__(self, trail, max_piece=10., leaf_size=16):
+        """ Build index over trail
+        :trail: SurveyTrail
+        :max_piece: maximum spacing, in meters, of indexed points along
+                trail lines default: 10
+        :leaf_size: KDTree leaf size
+        """
+        self.trail = trail
+        self.max_piece = max_piece
+        seg_lats = []
+        seg_longs = []
+        self.segment_nos = []
+        for segment in trail.get_segments():
+            stats = segment.get_stats()
+            if stats.npoints() == 0:
+                continue
+            seg_lats.append(stats.lats)
+            seg_longs.append(stats.longs)
+            self.segment_nos.append(segment.segment_no)
+        self.signature = self.get_signature(trail)
+        if len(seg_lats) == 0:
+            self.proj = LocalProjection(0., 0.)
+            self.vert_xy = np.zeros((0, 2))
+            self.vert_seg = np.zeros(0, dtype=np.int64)
+            self.vert_pi = np.zeros(0, dtype=np.int64)
+            self.line_a = self.line_b = np.zeros((0, 2))
+            self.line_vert = np.zeros(0, dtype=np.int64)
+            self.tree = KDTree(np.zeros((0, 2)), leaf_size=leaf_size)
+            self.vert_tree = self.tree
+            self.index_line = np.zeros(0, dtype=np.int64)
+            return
+
+        lats = np.concatenate(seg_lats)
+        longs = np.concatenate(seg_longs)
+        self.proj = LocalProjection(float(lats.mean()), float(longs.mean()))
+        self.vert_xy = self.proj.to_xy(lats, longs)
+        self.vert_seg = np.concatenate([np.full(len(sl), i, dtype=np.int64)
+                                        for i, sl in enumerate(seg_lats)])
+        self.vert_pi = np.concatenate([np.arange(len(sl)) for sl in seg_lats])
+        # Lines: vertex v to v+1 within a segment, single point segments
+        # are a zero length line
+        nverts = len(lats)
+        last = np.ones(nverts, dtype=bool)
+        last[:-1] = self.vert_seg[:-1] != self.vert_seg[1:]
+        single = last.copy()
+        single[1:] &= self.vert_seg[1:] != self.vert_seg[:-1]
+        self.line_vert = np.nonzero(~last | single)[0]
+        next_vert = np.where(single[self.line_vert], self.line_vert, self.line_vert+1)
+        self.line_a = self.vert_xy[self.line_vert]
+        self.line_b = self.vert_xy[next_vert]
+        # Index points along lines
+        lens = np.sqrt(((self.line_b - self.line_a)**2).sum(axis=1))
+        npieces = np.maximum(1, np.ceil(lens/max_piece)).astype(np.int64)
+        index_line = np.repeat(np.arange(len(self.line_vert)), npieces)
+        starts = np.cumsum(npieces) - npieces
+        tt = (np.arange(len(index_line)) - np.repeat(starts, npieces))/np.repeat(npieces, npieces)
+        index_xy = (self.line_a[index_line]
+                    + tt[:, None]*(self.line_b - self.line_a)[index_line])
+        ends = last & ~single       # Segment ends, on previous line
+        end_line = np.searchsorted(self.line_vert, np.nonzero(ends)[0]) - 1
+        self.index_line = np.concatenate([index_line, end_line])
+        index_xy = np.concatenate([index_xy, self.vert_xy[ends]])
+        self.tree = KDTree(index_xy, leaf_size=leaf_size)
+        self.vert_tree = KDTree(self.vert_xy, leaf_size=leaf_size)
+        SlTrace.lg(f"TrailQuery: {nverts} trail points {len(self.line_vert)} lines"
+                   f" {len(index_xy)} indexed", "trail_query")
+
+    @staticmethod
+    def get_signature(trail):
+        """ Cheap summary of trail point locations, to detect changes
+        """
+        sig = []
+        for segment in trail.get_segments():
+            stats = segment.get_stats()
+            sig.append((segment.segment_no, stats.npoints(),
+                        float(stats.lats.sum()), float(stats.longs.sum())))
+        return tuple(sig)
+
+    def is_current(self):
+        """ Check if trail is unchanged since index was built
+        """
+        return self.get_signature(self.trail) == self.signature
+
+    def _query_xy(self, lats, longs):
+        return self.proj.to_xy(np.atleast_1d(lats), np.atleast_1d(longs))
+
+    def nearest(self, lats, longs):
+        """ Nearest trail location for each query point
+        :lats, longs: arrays of query latitude, longitude
+        :returns: TrailNearest
+        """
+        qxy = self._query_xy(lats, longs)
+        m = len(qxy)
+        dists = np.full(m, np.inf)
+        lines = np.full(m, -1, dtype=np.int64)
+        fracts = np.zeros(m)
+        if len(self.tree) > 0 and m > 0:
+            d0, _ = self.tree.query(qxy, k=1)
+            # Nearest line point is within max_piece/2 of an indexed point
+            qq, ii, _ = self.tree.query_radius(qxy, d0[:, 0] + self.max_piece/2. + 1e-9)
+            cl = self.index_line[ii]
+            prev = cl - 1
+            has_prev = (prev >= 0)
+            has_prev[has_prev] &= (self.vert_seg[self.line_vert[prev[has_prev]]]
+                                   == self.vert_seg[self.line_vert[cl[has_prev]]])
+            qq = np.concatenate([qq, qq[has_prev]])
+            cl = np.concatenate([cl, prev[has_prev]])
+            a = self.line_a[cl]
+            ab = self.line_b[cl] - a
+            ap = qxy[qq] - a
+            ab2 = (ab*ab).sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(ab2 > 0, (ap*ab).sum(axis=1)/ab2, 0.)
+            t = np.clip(t, 0., 1.)
+            diff = ap - t[:, None]*ab
+            dd = np.sqrt((diff*diff).sum(axis=1))
+            order = np.lexsort((dd, qq))
+            qq, cl, t, dd = qq[order], cl[order], t[order], dd[order]
+            first = np.ones(len(qq), dtype=bool)
+            first[1:] = qq[1:] != qq[:-1]
+            dists[qq[first]] = dd[first]
+            lines[qq[first]] = cl[first]
+            fracts[qq[first]] = t[first]
+
+        found = lines >= 0
+        near_xy = np.full((m, 2), np.nan)
+        lf = lines[found]
+        near_xy[found] = (self.line_a[lf]
+                          + fracts[found, None]*(self.line_b[lf] - self.line_a[lf]))
+        near_lats, near_longs = self.proj.to_lat_long(near_xy)
+        segment_nos = np.full(m, -1, dtype=np.int64)
+        point_idxs = np.full(m, -1, dtype=np.int64)
+        verts = self.line_vert[lf]
+        segment_nos[found] = np.asarray(self.segment_nos, dtype=np.int64)[self.vert_seg[verts]]
+        point_idxs[found] = self.vert_pi[verts]
+        return TrailNearest(dists, near_lats, near_longs, segment_nos,
+                            point_idxs, fracts)
+
+    def _vertex_results(self, qq, ii, dd):
+        """ Map trail point tree results to segment, point index
+        """
+        segment_nos = np.asarray(self.segment_nos, dtype=np.int64)
+        return qq, segment_nos[self.vert_seg[ii]], self.vert_pi[ii], dd
+
+    def within_radius(self, lats, longs, radius):
+        """ Trail points within radius of query points
+        :lats, longs: arrays of query latitude, longitude
+        :radius: distance in meters (or array, one per query)
+        :returns: (query idxs, segment_nos, point idxs, dists) arrays,
+                ordered by query then distance
+        """
+        qxy = self._query_xy(lats, longs)
+        qq, ii, dd = self.vert_tree.query_radius(qxy, radius)
+        return self._vertex_results(qq, ii, dd)
+
+    def k_nearest(self, lats, longs, k=1):
+        """ k nearest trail points to each query point
+        :lats, longs: arrays of query latitude, longitude
+        :k: number of trail points default: 1
+        :returns: dists, segment_nos, point idxs arrays (m x k),
+                inf / -1 where fewer than k points
+        """
+        qxy = self._query_xy(lats, longs)
+        dists, ii = self.vert_tree.query(qxy, k=k)
+        found = ii >= 0
+        segment_nos = np.full(ii.shape, -1, dtype=np.int64)
+        point_idxs = np.full(ii.shape, -1, dtype=np.int64)
+        segment_nos[found] = np.asarray(self.segment_nos, dtype=np.int64)[self.vert_seg[ii[found]]]
+        point_idxs[found] = self.vert_pi[ii[found]]
+        return dists, segment_nos, point_idxs
+
+    def nearest_to_points(self, points):
+        """ Nearest trail location for each point e.g. SamplePoint
+        :points: list of points, with lat, long
+        :returns: TrailNearest
+        """
+        lats = [point.lat for point in points]
+        longs = [point.long for point in points]
+        return self.nearest(lats, longs)